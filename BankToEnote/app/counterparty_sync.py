@@ -0,0 +1,136 @@
+# app/counterparty_sync.py
+from __future__ import annotations
+
+import os
+import json
+import time
+import logging
+
+from enote_odata import EnoteClient, Query, guid_in
+
+from app.db import get_conn
+from app.enote_client import get_client
+from app.metrics import METRICS
+
+log = logging.getLogger("cnt_sync")
+
+TABLE = "et_x_Catalog_Контрагенты"
+ENTITY = "Catalog_Контрагенты"
+
+# Питання анкети (Состав) → поля
+Q_EDRPOU = "c53d792c-4ef4-11ef-87da-2ae983d8a0f0"
+Q_IBAN1  = "f61f85c6-4ef4-11ef-87da-2ae983d8a0f0"
+Q_IBAN2  = "42667dea-4ef5-11ef-87da-2ae983d8a0f0"
+
+SQL_UPSERT = f"""
+    INSERT INTO `{TABLE}`
+    (Ref_Key, DataVersion, DeletionMark, Parent_Key, IsFolder, Code, Description,
+     ТипЦен_Key, ВалютаВзаиморасчетов_Key, КонтактнаяИнформация, Комментарий,
+     ОтсрочкаПлатежа, КодВнешнейБазы, Менеджер_Key, ПремияПолучена, АнкетаЗаполнена,
+     ЭтоВнешняяЛаборатория, ЭтоПоставщик, ЭтоРеферент, ИНН, ЕДРПОУ, IBAN1, IBAN2)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        DataVersion = VALUES(DataVersion),
+        Description = VALUES(Description),
+        ЕДРПОУ      = VALUES(ЕДРПОУ),
+        IBAN1       = VALUES(IBAN1),
+        IBAN2       = VALUES(IBAN2)
+"""
+
+# Податковий номер рядка — як у пуші (enote_push): AUT_CNTR_INN, якщо не порожній, інакше AUT_CNTR_CRF
+_TAX_EXPR = "COALESCE(NULLIF(TRIM(b.AUT_CNTR_INN), ''), TRIM(b.AUT_CNTR_CRF))"
+
+# Податкові номери з рядків, що чекають на пуш, яких ще немає в довіднику
+SQL_UNRESOLVED = f"""
+    SELECT DISTINCT {_TAX_EXPR}
+    FROM bnk_trazact_prvt_ekv b
+    WHERE b.TRANTYPE='D'
+      AND (b.enote_ref IS NULL OR b.enote_ref = '')
+      AND (b.err_code IS NULL OR b.err_code IN ('', 'NO_CNT', 'counterparty_not_found'))
+      AND COALESCE({_TAX_EXPR}, '') <> ''
+      AND NOT EXISTS (
+        SELECT 1 FROM `{TABLE}` c
+        WHERE c.ИНН = {_TAX_EXPR} OR c.ЕДРПОУ = {_TAX_EXPR}
+      )
+"""
+
+
+def _row_from_entry(entry: dict) -> tuple:
+    sklad = {}
+    for q in entry.get("Состав", []) or []:
+        if isinstance(q, dict):
+            sklad[q.get("Вопрос_Key")] = q.get("Ответ")
+
+    contact_info = entry.get("КонтактнаяИнформация")
+    if contact_info is not None and not isinstance(contact_info, str):
+        try:
+            contact_info = json.dumps(contact_info, ensure_ascii=False)
+        except Exception:
+            contact_info = str(contact_info)
+
+    return (
+        entry.get("Ref_Key"), entry.get("DataVersion"), entry.get("DeletionMark"), entry.get("Parent_Key"),
+        entry.get("IsFolder"), entry.get("Code"), entry.get("Description"),
+        entry.get("ТипЦен_Key"), entry.get("ВалютаВзаиморасчетов_Key"),
+        contact_info, entry.get("Комментарий"),
+        entry.get("ОтсрочкаПлатежа"), entry.get("КодВнешнейБазы"),
+        entry.get("Менеджер_Key"), entry.get("ПремияПолучена"), entry.get("АнкетаЗаполнена"),
+        entry.get("ЭтоВнешняяЛаборатория"), entry.get("ЭтоПоставщик"), entry.get("ЭтоРеферент"),
+        entry.get("ИНН"), sklad.get(Q_EDRPOU), sklad.get(Q_IBAN1), sklad.get(Q_IBAN2),
+    )
+
+
+def _remote_versions(client: EnoteClient, top: int = 5000) -> dict[str, str]:
+    """Лише Ref_Key + DataVersion — крихітний payload замість повного довідника."""
+    q = Query(ENTITY).select("Ref_Key", "DataVersion")
+    return {e["Ref_Key"]: e.get("DataVersion")
+            for page in client.iter_keyset(q, ("Ref_Key",), page_size=top) for e in page}
+
+
+def _fetch_full(client: EnoteClient, keys: list[str], chunk: int = 20) -> list[dict]:
+    out: list[dict] = []
+    for i in range(0, len(keys), chunk):
+        data = client.get(Query(ENTITY).filter(guid_in("Ref_Key", keys[i:i + chunk]))) or {}
+        out.extend(data.get("value", []) or [])
+    return out
+
+
+def sync_counterparties(force: bool = False) -> tuple[int, int]:
+    """
+    Дельта-синхронізація et_x_Catalog_Контрагенты у процесі пайплайна:
+      1) якщо немає рядків з нерозпізнаним податковим номером — нічого не робимо (якщо не force);
+      2) тягнемо з OData лише Ref_Key/DataVersion, порівнюємо з локальними;
+      3) повні записи — тільки для нових/змінених ключів, пачками `Ref_Key eq guid'..' or ...`.
+    Повертає (upserted, checked).
+    """
+    t0 = time.monotonic()
+
+    with get_conn() as cn, cn.cursor() as cur:
+        if not force:
+            cur.execute(SQL_UNRESOLVED)
+            pending = [r[0] for r in cur.fetchall()]
+            if not pending:
+                log.info("🔄 Немає нерозпізнаних контрагентів у черзі — синхронізацію пропущено.")
+                return 0, 0
+            log.info("🔄 Нерозпізнаних податкових номерів: %s", len(pending))
+
+        cur.execute(f"SELECT Ref_Key, DataVersion FROM `{TABLE}`")
+        local = {k: v for k, v in cur.fetchall()}
+
+        client = get_client()
+        remote = _remote_versions(client)
+        changed = [k for k, v in remote.items() if local.get(k) != v]
+        entries = _fetch_full(client, changed) if changed else []
+
+        if entries:
+            cur.executemany(SQL_UPSERT, [_row_from_entry(e) for e in entries])
+            cn.commit()
+
+    METRICS.rows("counterparties", rows_in=len(remote), rows_out=len(entries))
+    log.info("✅ Контрагенти: перевірено=%s, змінено=%s, за %.1fs",
+             len(remote), len(entries), time.monotonic() - t0)
+    return len(entries), len(remote)
+
+
+if __name__ == "__main__":
+    sync_counterparties(force=bool(os.getenv("FORCE")))
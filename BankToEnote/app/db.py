@@ -2,6 +2,7 @@
 import mysql.connector
 from mysql.connector.pooling import MySQLConnectionPool
 from app.env_loader import load_settings
+from app.metrics import METRICS
 _pool: MySQLConnectionPool | None = None
 def get_pool() -> MySQLConnectionPool:
     global _pool
@@ -11,5 +12,37 @@ def get_pool() -> MySQLConnectionPool:
             host=s.db_host, port=s.db_port, user=s.db_user, password=s.db_password,
             database=s.db_database, autocommit=True)
     return _pool
+
+class _CountingCursor:
+    """Курсор-обгортка: рахує execute/executemany у METRICS.db_queries."""
+    def __init__(self, cur):
+        self._cur = cur
+    def execute(self, *a, **kw):
+        METRICS.db_query()
+        return self._cur.execute(*a, **kw)
+    def executemany(self, *a, **kw):
+        METRICS.db_query()
+        return self._cur.executemany(*a, **kw)
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+    def __iter__(self):
+        return iter(self._cur)
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return self._cur.__exit__(*exc)
+
+class _CountingConn:
+    def __init__(self, cn):
+        self._cn = cn
+    def cursor(self, *a, **kw):
+        return _CountingCursor(self._cn.cursor(*a, **kw))
+    def __getattr__(self, name):
+        return getattr(self._cn, name)
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return self._cn.__exit__(*exc)
+
 def get_conn():
-    return get_pool().get_connection()
+    return _CountingConn(get_pool().get_connection())
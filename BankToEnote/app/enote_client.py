@@ -1,31 +1,31 @@
 # enote_client.py
 
 from __future__ import annotations
-import logging, requests
+import logging
+from enote_odata import EnoteClient, EnoteConfig
 from app.env_loader import load_settings
+from app.metrics import METRICS
 log = logging.getLogger("enote")
-_session: requests.Session | None = None
-_base: str | None = None
-_auth: tuple[str,str] | None = None
-def _ensure():
-    global _session, _base, _auth
-    if _session is None:
+_client: EnoteClient | None = None
+
+def _on_response(endpoint: str, seconds: float, status: int | None) -> None:
+    METRICS.http("odata", seconds, status if status is not None else "exc")
+
+def get_client(pool_size: int = 8) -> EnoteClient:
+    """Один EnoteClient (keep-alive пул, повтори на 429/5xx) на процес."""
+    global _client
+    if _client is None:
         s = load_settings()
-        _session = requests.Session()
-        _session.headers.update({"Content-Type":"application/json; charset=utf-8"})
-        _session.auth = (s.odata_user, s.odata_password)
-        _base = s.enote_base_url
-        _auth = (s.odata_user, s.odata_password)
+        cfg = EnoteConfig(base_url=s.enote_base_url, user=s.odata_user, password=s.odata_password,
+                          pool_size=pool_size)
+        _client = EnoteClient(cfg, on_response=_on_response)
+    return _client
 def create_cashcheck(payload: dict) -> tuple[str,str]:
-    _ensure()
-    r = _session.post(f"{_base}Document_ДенежныйЧек", json=payload, timeout=60)
-    r.raise_for_status()
-    data = r.json()
+    data = get_client().post("Document_ДенежныйЧек", json=payload) or {}
     ref = data.get("Ref_Key") or data.get("d",{}).get("Ref_Key")
     num = data.get("Number")  or data.get("d",{}).get("Number") or ""
     if not ref: raise RuntimeError(f"ENOTE: no Ref_Key in response: {data}")
     return ref, num
 def post_cashcheck(ref_key: str) -> None:
-    _ensure()
-    r = _session.post(f"{_base}Document_ДенежныйЧек(guid'{ref_key}')/Post?PostingModeOperational=false", timeout=60)
-    r.raise_for_status()
\ No newline at end of file
+    get_client().request("POST", f"Document_ДенежныйЧек(guid'{ref_key}')/Post",
+                         params={"PostingModeOperational": "false"})
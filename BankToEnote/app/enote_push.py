@@ -2,15 +2,19 @@
 from __future__ import annotations
 
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from typing import Optional
 
-import requests
-from requests.auth import HTTPBasicAuth
+from enote_odata import EnoteClient, EnoteConfig
 
 from app.db import get_conn
 from app.env_loader import load_settings
+from app.metrics import METRICS
+from app.resolver import Resolver
+from app.retry_policy import RetryPolicy
 
 log = logging.getLogger("enote_push")
 
@@ -59,16 +63,106 @@ def _global_dry_run() -> bool:
     raw = (os.getenv("DRY_RUN", "") or "").strip().lower()
     return raw not in ("", "0", "false", "no", "off")
 
-def _post_enote_document(base_url: str, auth: HTTPBasicAuth, payload: dict) -> requests.Response:
-    url = f"{base_url}/Document_ДенежныйЧек"
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    return requests.post(url, headers=headers, auth=auth, json=payload, timeout=60)
 
-def _post_enote_post_action(base_url: str, auth: HTTPBasicAuth, ref_key: str) -> requests.Response:
-    url = f"{base_url}/Document_ДенежныйЧек(guid'{ref_key}')/Post"
+def _make_client(base_url: str, user: str, pwd: str, pool_size: int) -> EnoteClient:
+    """
+    Один keep-alive клієнт на весь прогін. Пул з'єднань не менший за кількість воркерів,
+    інакше потоки чекатимуть вільний сокет. POST не повторюється на 5xx (документ міг створитись).
+    """
+    cfg = EnoteConfig(base_url=base_url, user=user, password=pwd, pool_size=max(pool_size, 1))
+    return EnoteClient(cfg, on_response=lambda ep, sec, st: METRICS.http("odata", sec, st if st is not None else "exc"))
+
+def _post_enote_document(client: EnoteClient, payload: dict):
+    return client.request("POST", "Document_ДенежныйЧек", json=payload, check=False)
+
+def _post_enote_post_action(client: EnoteClient, ref_key: str):
     params = {"PostingModeOperational": "false"}
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    return requests.post(url, headers=headers, auth=auth, params=params, timeout=60)
+    return client.request("POST", f"Document_ДенежныйЧек(guid'{ref_key}')/Post", params=params, check=False)
+
+def _send_one(client: EnoteClient, payload: dict) -> tuple[str, str | None, str | None]:
+    """
+    Створення + проведення одного чека. Виконується у воркері, БД не чіпає.
+    Повертає ("ok", ref_key, number) або ("err", err_code, err_msg).
+    """
+    try:
+        resp = _post_enote_document(client, payload)
+    except Exception as e:
+        return "err", "HTTP_EXC", f"{type(e).__name__}: {e}"
+
+    if resp.status_code not in (200, 201):
+        return "err", f"HTTP_{resp.status_code}", resp.text[:1024]
+
+    try:
+        data = resp.json()
+    except Exception:
+        data = {}
+
+    ref_key = (data or {}).get("Ref_Key")
+    number  = (data or {}).get("Number")
+    if not ref_key:
+        return "err", "NO_REF", f"Відповідь без Ref_Key: {resp.text[:1024]}"
+
+    # POST проведення (не фейлимо рядок, якщо не вдалось)
+    try:
+        post_resp = _post_enote_post_action(client, ref_key)
+        if post_resp.status_code not in (200, 204):
+            log.warning("Post failed for %s: %s %s", ref_key, post_resp.status_code, post_resp.text)
+    except Exception as e:
+        log.warning("Post exception for %s: %s", ref_key, e)
+
+    return "ok", ref_key, number
+
+# ───────────────────────────── marks buffer ─────────────────────────────
+
+SQL_MARK_ERR = """
+    UPDATE bnk_trazact_prvt_ekv
+    SET err_code=%s, err_msg=%s, try_count=COALESCE(try_count,0)+1, ts_last_try=NOW()
+    WHERE NUM_DOC=%s AND DATE_TIME_DAT_OD_TIM_P=%s AND AUT_CNTR_MFO=%s AND TRANTYPE=%s
+      AND (enote_ref IS NULL OR enote_ref = '')
+"""
+SQL_MARK_OK = """
+    UPDATE bnk_trazact_prvt_ekv
+    SET enote_ref=%s, enote_check=%s, err_code=NULL, err_msg=NULL,
+        try_count=COALESCE(try_count,0)+1, ts_last_try=NOW()
+    WHERE NUM_DOC=%s AND DATE_TIME_DAT_OD_TIM_P=%s AND AUT_CNTR_MFO=%s AND TRANTYPE=%s
+      AND (enote_ref IS NULL OR enote_ref = '')
+"""
+
+class _MarkBuffer:
+    """
+    Накопичує mark_ok/mark_err і пише їх пачками через executemany.
+    Умова `enote_ref IS NULL` в UPDATE не дає перезаписати вже проведений рядок.
+    """
+    def __init__(self, cn, cur, flush_every: int):
+        self.cn = cn
+        self.cur = cur
+        self.flush_every = max(flush_every, 1)
+        self.ok: list[tuple] = []
+        self.err: list[tuple] = []
+
+    def add_ok(self, key: tuple, ref_key: str, number: str | None) -> None:
+        self.ok.append((ref_key, number, *key))
+        self._maybe_flush()
+
+    def add_err(self, key: tuple, code: str, msg: str) -> None:
+        self.err.append((code, (msg or "")[:1024], *key))
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self.ok) + len(self.err) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.ok and not self.err:
+            return
+        if self.ok:
+            self.cur.executemany(SQL_MARK_OK, self.ok)
+        if self.err:
+            self.cur.executemany(SQL_MARK_ERR, self.err)
+        self.cn.commit()
+        log.debug("marks flushed: ok=%s err=%s", len(self.ok), len(self.err))
+        self.ok.clear()
+        self.err.clear()
 
 # ───────────────────────────── main ─────────────────────────────
 
@@ -76,12 +170,13 @@ def push_to_enote(limit: Optional[int] = None, dry_run: Optional[bool] = None) -
     """
     Беремо з bnk_trazact_prvt_ekv всі TRANTYPE='D' без enote_ref/err_code.
     Створюємо Document_ДенежныйЧек і проводимо.
+    HTTP іде пулом воркерів (ENOTE_PUSH_WORKERS) через один keep-alive EnoteClient,
+    відмітки в БД пишуться пачками (ENOTE_PUSH_FLUSH_EVERY).
     DRY_RUN (глобальний, з .env): нічого не шле і не змінює БД.
     """
     s = load_settings()
     base_url = _od_base_url(s)
     user, pwd = _od_creds(s)
-    auth = HTTPBasicAuth(user, pwd)
 
     # GUID-и за замовчанням
     CURRENCY = _guid_env("DEFAULT_CURRENCY_GUID_UAH", s)
@@ -96,11 +191,15 @@ def push_to_enote(limit: Optional[int] = None, dry_run: Optional[bool] = None) -
     if limit is None:
         limit = _env_int_pos("ENOTE_PUSH_LIMIT")
 
-    log.info("ENOTE_ENV=%s | base=%s | DRY_RUN=%s | LIMIT=%s",
+    workers = _env_int_pos("ENOTE_PUSH_WORKERS") or 4
+    flush_every = _env_int_pos("ENOTE_PUSH_FLUSH_EVERY") or 50
+
+    log.info("ENOTE_ENV=%s | base=%s | DRY_RUN=%s | LIMIT=%s | WORKERS=%s",
              (getattr(s, 'enote_env', None) or os.getenv('ENOTE_ENV', 'prod')),
-             base_url, dry_run, (limit if limit is not None else "∞"))
+             base_url, dry_run, (limit if limit is not None else "∞"), workers)
 
-    # 1) Кандидати
+    # 1) Кандидати: нові рядки + помилкові, яким настав час повтору (не більше drain_limit)
+    policy = RetryPolicy.from_env()
     sql_sel = """
         SELECT *
         FROM bnk_trazact_prvt_ekv
@@ -111,35 +210,42 @@ def push_to_enote(limit: Optional[int] = None, dry_run: Optional[bool] = None) -
     """
     if limit is not None:
         sql_sel += f" LIMIT {int(limit)}"
+    sql_retry = f"""
+        SELECT *
+        FROM bnk_trazact_prvt_ekv
+        WHERE TRANTYPE='D'
+          AND (enote_ref IS NULL OR enote_ref = '')
+          AND {policy.due_sql()}
+        ORDER BY ts_last_try ASC
+        LIMIT {int(policy.drain_limit)}
+    """
 
-    # 2) Пошук рахунку/контрагента
-    sql_find_acc = "SELECT Ref_Key FROM et_Catalog_ДенежныеСчета WHERE НомерСчета=%s"
-    sql_find_cnt_inn    = "SELECT Ref_Key FROM et_x_Catalog_Контрагенты WHERE ИНН=%s"
-    sql_find_cnt_edrpou = "SELECT Ref_Key FROM et_x_Catalog_Контрагенты WHERE ЕДРПОУ=%s"
+    # 2) Пошук рахунку/контрагента — з індексів у пам'яті
+    resolver = Resolver()
 
-    # 3) Маркування
-    sql_mark_err = """
-        UPDATE bnk_trazact_prvt_ekv
-        SET err_code=%s, err_msg=%s, try_count=COALESCE(try_count,0)+1, ts_last_try=NOW()
-        WHERE NUM_DOC=%s AND DATE_TIME_DAT_OD_TIM_P=%s AND AUT_CNTR_MFO=%s AND TRANTYPE=%s
-    """
-    sql_mark_ok = """
-        UPDATE bnk_trazact_prvt_ekv
-        SET enote_ref=%s, enote_check=%s, err_code=NULL, err_msg=NULL,
-            try_count=COALESCE(try_count,0)+1, ts_last_try=NOW()
-        WHERE NUM_DOC=%s AND DATE_TIME_DAT_OD_TIM_P=%s AND AUT_CNTR_MFO=%s AND TRANTYPE=%s
-    """
+    t0 = time.monotonic()
 
     with get_conn() as cn, cn.cursor(dictionary=True) as cur:
         cur.execute(sql_sel)
         rows = cur.fetchall()
+        retry_room = policy.drain_limit if limit is None else min(policy.drain_limit, int(limit) - len(rows))
+        if retry_room > 0:
+            cur.execute(sql_retry)
+            retries = cur.fetchall()[:retry_room]
+            if retries:
+                log.info("push_to_enote: retry due=%s (max attempts=%s)", len(retries), policy.max_attempts)
+            rows += retries
 
         if not rows:
             log.info("push_to_enote: nothing to push.")
             return
 
+        marks = _MarkBuffer(cn, cur, flush_every)
         done, errs = 0, 0
+        seen: set[tuple] = set()
+        jobs: list[tuple[tuple, dict]] = []
 
+        # 3) Підготовка payload-ів (послідовно, без запитів у БД)
         for r in rows:
             num_doc   = r["NUM_DOC"]
             dt        = r["DATE_TIME_DAT_OD_TIM_P"]
@@ -147,6 +253,12 @@ def push_to_enote(limit: Optional[int] = None, dry_run: Optional[bool] = None) -
             trantype  = r["TRANTYPE"]
             aut_myacc = r["AUT_MY_ACC"]
 
+            key = (num_doc, dt, aut_mfo, trantype)
+            if key in seen:
+                log.warning("Duplicate key in candidates, skip: %s", key)
+                continue
+            seen.add(key)
+
             tax = (str(r.get("AUT_CNTR_INN") or r.get("AUT_CNTR_CRF") or "")).strip()
             aut_cnt_n = (r.get("AUT_CNTR_NAM") or "").strip()
 
@@ -155,39 +267,27 @@ def push_to_enote(limit: Optional[int] = None, dry_run: Optional[bool] = None) -
             dat_od = r.get("DAT_OD")
 
             # рахунок
-            cur.execute(sql_find_acc, (aut_myacc,))
-            acc = cur.fetchone()
-            if not acc:
+            acc_ref = resolver.account_by_number(aut_myacc)
+            if not acc_ref:
                 msg = f"Немає рахунку в et_Catalog_ДенежныеСчета для {aut_myacc}"
                 if dry_run:
                     log.warning("DRY-RUN NO_ACC: %s | %s", num_doc, msg)
                 else:
-                    cur.execute(sql_mark_err, ("NO_ACC", msg[:1024], num_doc, dt, aut_mfo, trantype))
-                    cn.commit()
+                    marks.add_err(key, "NO_ACC", msg)
                 errs += 1
                 continue
-            acc_ref = acc["Ref_Key"]
 
             # контрагент
-            cnt = None
-            if tax:
-                cur.execute(sql_find_cnt_inn, (tax,))
-                cnt = cur.fetchone()
-                if not cnt:
-                    cur.execute(sql_find_cnt_edrpou, (tax,))
-                    cnt = cur.fetchone()
-
-            if not cnt:
+            cnt_ref = resolver.counterparty_by_tax(tax)
+            if not cnt_ref:
                 msg = (f"Немає контрагента для tax='{tax}' "
                        f"(INN/ЄДРПОУ у et_x_Catalog_Контрагенты); name='{aut_cnt_n}'")
                 if dry_run:
                     log.warning("DRY-RUN NO_CNT: %s | %s", num_doc, msg)
                 else:
-                    cur.execute(sql_mark_err, ("NO_CNT", msg[:1024], num_doc, dt, aut_mfo, trantype))
-                    cn.commit()
+                    marks.add_err(key, "NO_CNT", msg)
                 errs += 1
                 continue
-            cnt_ref = cnt["Ref_Key"]
 
             # документ
             dt_iso = (dt if isinstance(dt, datetime) else datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%S")
@@ -220,48 +320,32 @@ def push_to_enote(limit: Optional[int] = None, dry_run: Optional[bool] = None) -
                 log.debug("DRY-RUN payload: %s", payload)
                 continue
 
-            # POST створення
-            try:
-                resp = _post_enote_document(base_url, auth, payload)
-            except Exception as e:
-                cur.execute(sql_mark_err, ("HTTP_EXC", f"{type(e).__name__}: {e}", num_doc, dt, aut_mfo, trantype))
-                cn.commit()
-                errs += 1
-                continue
-
-            if resp.status_code not in (200, 201):
-                cur.execute(sql_mark_err, (f"HTTP_{resp.status_code}", resp.text[:1024],
-                                           num_doc, dt, aut_mfo, trantype))
-                cn.commit()
-                errs += 1
-                continue
-
-            try:
-                data = resp.json()
-            except Exception:
-                data = {}
-
-            ref_key = (data or {}).get("Ref_Key")
-            number  = (data or {}).get("Number")
-            if not ref_key:
-                cur.execute(sql_mark_err, ("NO_REF", f"Відповідь без Ref_Key: {resp.text[:1024]}",
-                                           num_doc, dt, aut_mfo, trantype))
-                cn.commit()
-                errs += 1
-                continue
+            jobs.append((key, payload))
 
-            # POST проведення (не фейлимо цикл, якщо не вдалось)
+        # 4) Відправка пулом воркерів; відмітки пише лише цей потік
+        if jobs:
+            client = _make_client(base_url, user, pwd, workers)
             try:
-                post_resp = _post_enote_post_action(base_url, auth, ref_key)
-                if post_resp.status_code not in (200, 204):
-                    log.warning("Post failed for %s: %s %s", ref_key, post_resp.status_code, post_resp.text)
-            except Exception as e:
-                log.warning("Post exception for %s: %s", ref_key, e)
-
-            # OK
-            cur.execute(sql_mark_ok, (ref_key, number, num_doc, dt, aut_mfo, trantype))
-            cn.commit()
-            done += 1
-
-        log.info("push_to_enote: done=%s, errors=%s%s",
-                 done, errs, " (DRY-RUN)" if dry_run else "")
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enote") as ex:
+                    futures = {ex.submit(_send_one, client, payload): key for key, payload in jobs}
+                    for fut in as_completed(futures):
+                        key = futures[fut]
+                        status, a, b = fut.result()
+                        if status == "ok":
+                            marks.add_ok(key, a, b)
+                            done += 1
+                        else:
+                            marks.add_err(key, a, b)
+                            errs += 1
+            finally:
+                marks.flush()
+                client.close()
+        else:
+            marks.flush()
+
+        resolver.log_stats()
+        METRICS.rows("push", rows_in=len(rows), rows_out=done)
+        elapsed = time.monotonic() - t0
+        rate = (len(jobs) / elapsed) if elapsed > 0 else 0.0
+        log.info("push_to_enote: done=%s, errors=%s, sent=%s in %.1fs (%.2f docs/s)%s",
+                 done, errs, len(jobs), elapsed, rate, " (DRY-RUN)" if dry_run else "")
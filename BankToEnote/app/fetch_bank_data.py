@@ -1,15 +1,21 @@
 # app/fetch_bank_data.py
 from __future__ import annotations
 
+import os
+import json
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, date
-from typing import Iterable, Dict, Any, Optional
+from typing import Iterable, Iterator, Dict, Any, Optional
 
 import requests
 
 from app.env_loader import load_settings
 from app.logging_setup import setup_logging
 from app.db import get_conn
+from app.metrics import METRICS
 
 log = logging.getLogger("fetch")
 
@@ -83,88 +89,155 @@ def _get_last_tran_date(iban: str) -> Optional[date]:
         return row[0] if row and row[0] else None
 
 
-def _insert_or_update_raw(rows: Iterable[Dict[str, Any]]) -> tuple[int, int, int]:
+RAW_COLS = (
+    "NUM_DOC", "UETR", "DATE_TIME_DAT_OD_TIM_P", "DAT_OD", "AUT_MY_CRF", "SUM_E", "CCY",
+    "AUT_CNTR_NAM", "AUT_MY_MFO_CITY", "AUT_CNTR_CRF", "DOC_TYP", "SUM", "AUT_CNTR_MFO",
+    "OSND", "TIM_P", "STRUCT_CODE", "AUT_CNTR_ACC", "REFN", "AUT_MY_MFO", "PR_PR", "DLR",
+    "AUT_CNTR_MFO_CITY", "ULTMT", "FL_REAL", "AUT_MY_NAM", "AUT_MY_MFO_NAME", "REF",
+    "DAT_KL", "ID", "AUT_MY_ACC", "TRANTYPE", "TECHNICAL_TRANSACTION_ID",
+    "AUT_CNTR_MFO_NAME", "PAYER_ULTMT_NCEO", "PAYER_ULTMT_NAME",
+)
+RAW_PK = ("NUM_DOC", "DATE_TIME_DAT_OD_TIM_P", "AUT_CNTR_MFO", "TRANTYPE")
+
+_RAW_UPSERT_SET = ("UETR", "SUM_E", "CCY", "AUT_CNTR_NAM", "AUT_CNTR_CRF", "SUM", "OSND", "AUT_CNTR_ACC")
+
+# updated_at — першим: праворуч ще старі значення колонок. Рядок без змін лишається
+# незмінним (rowcount 0), тож лічильник «незмінені» в _upsert_raw_chunk справжній
+_RAW_UPSERT_TAIL = (
+    "\n    ON DUPLICATE KEY UPDATE\n"
+    "      updated_at=IF(" + " OR ".join(f"NOT ({c} <=> VALUES({c}))" for c in _RAW_UPSERT_SET)
+    + ", CURRENT_TIMESTAMP, updated_at),\n"
+    + ",\n".join(f"      {c}=VALUES({c})" for c in _RAW_UPSERT_SET) + "\n"
+)
+
+
+def _trantype_of(r: Dict[str, Any]) -> str:
+    if r.get("TRANTYPE"):
+        return r["TRANTYPE"]
+    try:
+        return "D" if float(r.get("SUM") or 0) < 0 else "C"
+    except Exception:
+        return "C"
+
+
+def _prepare_raw(rows: list[Dict[str, Any]]) -> tuple[list[tuple], int]:
     """
-    Пише прямо в bnk_trazact_prvt. ON DUPLICATE за PK таблиці.
-    Повертає (insert, update, skip).
+    Один прохід по всій пачці: TRANTYPE/AUT_CNTR_MFO, перевірка PK, дедуп за PK
+    (останній рядок виграє). Повертає (кортежі у порядку RAW_COLS, skipped).
     """
-    rows = list(rows)
-    if not rows:
-        return (0, 0, 0)
+    for r in rows:
+        r["TRANTYPE"] = _trantype_of(r)
+        if r.get("AUT_CNTR_MFO") is None:
+            r["AUT_CNTR_MFO"] = ""
+
+    bad = [r for r in rows if not r.get("NUM_DOC") or not r.get("DATE_TIME_DAT_OD_TIM_P")]
+    for r in bad[:10]:
+        log.warning("Skip row (missing PK fields): %s", {k: r.get(k) for k in RAW_PK})
+
+    uniq: dict[tuple, tuple] = {}
+    for r in rows:
+        if r.get("NUM_DOC") and r.get("DATE_TIME_DAT_OD_TIM_P"):
+            uniq[tuple(r[k] for k in RAW_PK)] = tuple(r.get(c) for c in RAW_COLS)
+
+    return list(uniq.values()), len(rows) - len(uniq)
+
+
+def _ensure_quarantine_table(cur) -> None:
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS bnk_trazact_prvt_quarantine (
+      id          BIGINT AUTO_INCREMENT PRIMARY KEY,
+      NUM_DOC     VARCHAR(255) NULL,
+      DATE_TIME_DAT_OD_TIM_P DATETIME NULL,
+      AUT_CNTR_MFO VARCHAR(64) NULL,
+      TRANTYPE    VARCHAR(8) NULL,
+      payload     JSON NULL,
+      error       TEXT NULL,
+      created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
 
-    sql = """
-    INSERT INTO bnk_trazact_prvt
-      (NUM_DOC, UETR, DATE_TIME_DAT_OD_TIM_P, DAT_OD, AUT_MY_CRF, SUM_E, CCY,
-       AUT_CNTR_NAM, AUT_MY_MFO_CITY, AUT_CNTR_CRF, DOC_TYP, SUM, AUT_CNTR_MFO,
-       OSND, TIM_P, STRUCT_CODE, AUT_CNTR_ACC, REFN, AUT_MY_MFO, PR_PR, DLR,
-       AUT_CNTR_MFO_CITY, ULTMT, FL_REAL, AUT_MY_NAM, AUT_MY_MFO_NAME, REF,
-       DAT_KL, ID, AUT_MY_ACC, TRANTYPE, TECHNICAL_TRANSACTION_ID,
-       AUT_CNTR_MFO_NAME, PAYER_ULTMT_NCEO, PAYER_ULTMT_NAME)
-    VALUES
-      (%(NUM_DOC)s, %(UETR)s, %(DATE_TIME_DAT_OD_TIM_P)s, %(DAT_OD)s, %(AUT_MY_CRF)s, %(SUM_E)s, %(CCY)s,
-       %(AUT_CNTR_NAM)s, %(AUT_MY_MFO_CITY)s, %(AUT_CNTR_CRF)s, %(DOC_TYP)s, %(SUM)s, %(AUT_CNTR_MFO)s,
-       %(OSND)s, %(TIM_P)s, %(STRUCT_CODE)s, %(AUT_CNTR_ACC)s, %(REFN)s, %(AUT_MY_MFO)s, %(PR_PR)s, %(DLR)s,
-       %(AUT_CNTR_MFO_CITY)s, %(ULTMT)s, %(FL_REAL)s, %(AUT_MY_NAM)s, %(AUT_MY_MFO_NAME)s, %(REF)s,
-       %(DAT_KL)s, %(ID)s, %(AUT_MY_ACC)s, %(TRANTYPE)s, %(TECHNICAL_TRANSACTION_ID)s,
-       %(AUT_CNTR_MFO_NAME)s, %(PAYER_ULTMT_NCEO)s, %(PAYER_ULTMT_NAME)s)
-    ON DUPLICATE KEY UPDATE
-      UETR=VALUES(UETR),
-      SUM_E=VALUES(SUM_E),
-      CCY=VALUES(CCY),
-      AUT_CNTR_NAM=VALUES(AUT_CNTR_NAM),
-      AUT_CNTR_CRF=VALUES(AUT_CNTR_CRF),
-      SUM=VALUES(SUM),
-      OSND=VALUES(OSND),
-      AUT_CNTR_ACC=VALUES(AUT_CNTR_ACC),
-      updated_at=CURRENT_TIMESTAMP
+
+def _quarantine(cn, cur, tup: tuple, err: Exception) -> None:
+    row = dict(zip(RAW_COLS, tup))
+    log.error("Quarantine row %s: %s", {k: row.get(k) for k in RAW_PK}, err)
+    try:
+        _ensure_quarantine_table(cur)
+        cur.execute(
+            "INSERT INTO bnk_trazact_prvt_quarantine "
+            "(NUM_DOC, DATE_TIME_DAT_OD_TIM_P, AUT_CNTR_MFO, TRANTYPE, payload, error) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            (*(row.get(k) for k in RAW_PK), json.dumps(row, ensure_ascii=False, default=str), str(err)[:2000]),
+        )
+        cn.commit()
+    except Exception as e:
+        log.error("Quarantine write failed: %s", e)
+        cn.rollback()
+
+
+def _upsert_raw_chunk(cur, chunk: list[tuple]) -> tuple[int, int, int]:
+    """
+    Один multi-row INSERT ... ON DUPLICATE KEY UPDATE.
+    rowcount = 1*inserted + 2*updated (+0 незмінені), тому спершу рахуємо,
+    скільки ключів пачки вже є в таблиці.
     """
+    pk_idx = [RAW_COLS.index(k) for k in RAW_PK]
+    pk_ph = "(" + ", ".join(["%s"] * len(RAW_PK)) + ")"
+    cur.execute(
+        f"SELECT COUNT(*) FROM bnk_trazact_prvt WHERE ({', '.join(RAW_PK)}) IN ({', '.join([pk_ph] * len(chunk))})",
+        [t[i] for t in chunk for i in pk_idx],
+    )
+    existing = int(cur.fetchone()[0])
 
-    ins = upd = skp = 0
-    logged = 0
+    row_ph = "(" + ", ".join(["%s"] * len(RAW_COLS)) + ")"
+    sql = (f"INSERT INTO bnk_trazact_prvt ({', '.join(RAW_COLS)}) VALUES "
+           + ", ".join([row_ph] * len(chunk)) + _RAW_UPSERT_TAIL)
+    cur.execute(sql, [v for t in chunk for v in t])
 
-    with get_conn() as cn, cn.cursor() as cur:
-        for r in rows:
-            # Мінімальна нормалізація
-            if not r.get("TRANTYPE"):
-                try:
-                    amt = float(r.get("SUM") or 0)
-                    r["TRANTYPE"] = "D" if amt < 0 else "C"
-                except Exception:
-                    r["TRANTYPE"] = "C"
-
-            if r.get("AUT_CNTR_MFO") is None:
-                r["AUT_CNTR_MFO"] = ""
-
-            # Контроль PK
-            if (not r.get("NUM_DOC")
-                    or not r.get("DATE_TIME_DAT_OD_TIM_P")
-                    or r.get("AUT_CNTR_MFO") is None
-                    or not r.get("TRANTYPE")):
-                if logged < 10:
-                    log.warning(
-                        "Skip row (missing PK fields): %s",
-                        {k: r.get(k) for k in ("NUM_DOC", "DATE_TIME_DAT_OD_TIM_P", "AUT_CNTR_MFO", "TRANTYPE")}
-                    )
-                    logged += 1
-                skp += 1
-                continue
+    ins = len(chunk) - existing
+    upd = max(cur.rowcount - ins, 0) // 2
+    return ins, upd, existing - upd
 
-            try:
-                cur.execute(sql, r)
-                if cur.rowcount == 1:
-                    ins += 1
-                elif cur.rowcount == 2:
-                    upd += 1
-                else:
-                    skp += 1
-            except Exception as e:
-                if logged < 10:
-                    log.exception("Skip row due to DB error: %s", e)
-                    log.debug("Row data: %s", r)
-                    logged += 1
-                skp += 1
 
+def _load_raw_chunk(cn, cur, chunk: list[tuple]) -> tuple[int, int, int]:
+    """
+    Пачка — окрема транзакція (пул з autocommit=True, тож явний start_transaction:
+    інакше COUNT і upsert не атомарні, а rollback нічого не відкочує);
+    якщо падає — ділимо навпіл, поки не знайдемо зіпсовані рядки.
+    """
+    try:
+        cn.start_transaction()
+        res = _upsert_raw_chunk(cur, chunk)
         cn.commit()
+        return res
+    except Exception as e:
+        cn.rollback()
+        if len(chunk) == 1:
+            _quarantine(cn, cur, chunk[0], e)
+            return 0, 0, 1
+        mid = len(chunk) // 2
+        a = _load_raw_chunk(cn, cur, chunk[:mid])
+        b = _load_raw_chunk(cn, cur, chunk[mid:])
+        return a[0] + b[0], a[1] + b[1], a[2] + b[2]
+
+
+def _insert_or_update_raw(rows: Iterable[Dict[str, Any]]) -> tuple[int, int, int]:
+    """
+    Пише прямо в bnk_trazact_prvt пачками по BANK_UPSERT_CHUNK рядків. ON DUPLICATE за PK таблиці.
+    Повертає (insert, update, skip); skip = без PK, дублікати в пачці,
+    незмінені та відправлені в bnk_trazact_prvt_quarantine.
+    """
+    rows = list(rows)
+    if not rows:
+        return (0, 0, 0)
+
+    tuples, skp = _prepare_raw(rows)
+    chunk_size = max(int(_env_num("BANK_UPSERT_CHUNK", 500)), 1)
+
+    ins = upd = 0
+    with get_conn() as cn, cn.cursor() as cur:
+        for i in range(0, len(tuples), chunk_size):
+            a, b, c = _load_raw_chunk(cn, cur, tuples[i:i + chunk_size])
+            ins += a; upd += b; skp += c
 
     return ins, upd, skp
 
@@ -174,7 +247,7 @@ def _rebuild_ekv_for_range(date_from: date, date_to: date) -> None:
     Перекладаємо в bnk_trazact_prvt_ekv спільні колонки за діапазоном дат.
     """
     sql = """
-    INSERT INTO bnk_trazact_prvt_екv (
+    INSERT INTO bnk_trazact_prvt_ekv (
       NUM_DOC, UETR, DATE_TIME_DAT_OD_TIM_P, DAT_OD, AUT_MY_CRF, SUM_E, CCY,
       AUT_CNTR_NAM, AUT_MY_MFO_CITY, AUT_CNTR_CRF, DOC_TYP, SUM, AUT_CNTR_MFO,
       OSND, TIM_P, STRUCT_CODE, AUT_CNTR_ACC, REFN, AUT_MY_MFO, PR_PR, DLR,
@@ -203,13 +276,121 @@ def _rebuild_ekv_for_range(date_from: date, date_to: date) -> None:
 
 # ─────────────────────────── Privat API fetch ───────────────────────────
 
-def privat_fetch_statements(iban: str, d_from: date, d_to: date, token: str) -> list[dict]:
+PRIVAT_URL = "https://acp.privatbank.ua/api/statements/transactions"
+PRIVAT_PAGE_MAX = 500  # максимальний limit, який приймає API
+
+
+def _env_num(name: str, default: float) -> float:
+    raw = (os.getenv(name, "") or "").strip()
+    try:
+        v = float(raw) if raw else default
+        return v if v > 0 else default
+    except Exception:
+        return default
+
+
+class _RateLimiter:
+    """Не частіше ніж rps запитів на секунду — спільний для всіх потоків одного токена."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+_limiters: dict[str, _RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limiter_for(token: str) -> _RateLimiter:
+    with _limiters_lock:
+        lim = _limiters.get(token)
+        if lim is None:
+            lim = _limiters[token] = _RateLimiter(_env_num("PRIVAT_TOKEN_RPS", 2.0))
+        return lim
+
+
+def _map_tx(t: dict, iban: str) -> Optional[dict]:
+    """Рядок API → рядок bnk_trazact_prvt (або None, якщо без PK)."""
+    dt_parsed = _parse_dt(t.get("DATE_TIME_DAT_OD_TIM_P"), "%d.%m.%Y %H:%M:%S")
+    d_parsed  = _parse_d(t.get("DAT_OD"), "%d.%m.%Y")
+    kl_parsed = _parse_d(t.get("DAT_KL"), "%d.%m.%Y")
+
+    row = {
+        "NUM_DOC": t.get("NUM_DOC") or t.get("REF") or t.get("ID"),
+        "UETR": t.get("UETR"),
+        "DATE_TIME_DAT_OD_TIM_P": dt_parsed,
+        "DAT_OD": d_parsed,
+        "AUT_MY_CRF": t.get("AUT_MY_CRF"),
+        "SUM_E": t.get("SUM_E"),
+        "CCY": t.get("CCY"),
+        "AUT_CNTR_NAM": t.get("AUT_CNTR_NAM"),
+        "AUT_MY_MFO_CITY": t.get("AUT_MY_MFO_CITY"),
+        "AUT_CNTR_CRF": t.get("AUT_CNTR_CRF"),
+        "DOC_TYP": t.get("DOC_TYP"),
+        "SUM": t.get("SUM"),
+        "AUT_CNTR_MFO": t.get("AUT_CNTR_MFO") if t.get("AUT_CNTR_MFO") is not None else "",
+        "OSND": t.get("OSND"),
+        "TIM_P": t.get("TIM_P"),
+        "STRUCT_CODE": t.get("STRUCT_CODE"),
+        "AUT_CNTR_ACC": t.get("AUT_CNTR_ACC"),
+        "REFN": t.get("REFN"),
+        "AUT_MY_MFO": t.get("AUT_MY_MFO"),
+        "PR_PR": t.get("PR_PR"),
+        "DLR": t.get("DLR"),
+        "AUT_CNTR_MFO_CITY": t.get("AUT_CNTR_MFO_CITY"),
+        "ULTMT": t.get("ULTMT"),
+        "FL_REAL": t.get("FL_REAL"),
+        "AUT_MY_NAM": t.get("AUT_MY_NAM"),
+        "AUT_MY_MFO_NAME": t.get("AUT_MY_MFO_NAME"),
+        "REF": t.get("REF"),
+        "DAT_KL": kl_parsed,
+        "ID": t.get("ID"),
+        "AUT_MY_ACC": iban,
+        "TRANTYPE": t.get("TRANTYPE"),
+        "TECHNICAL_TRANSACTION_ID": t.get("TECHNICAL_TRANSACTION_ID"),
+        "AUT_CNTR_MFO_NAME": t.get("AUT_CNTR_MFO_NAME"),
+        "PAYER_ULTMT_NCEO": t.get("PAYER_ULTMT_NCEO"),
+        "PAYER_ULTMT_NAME": t.get("PAYER_ULTMT_NAME"),
+    }
+
+    if not row["TRANTYPE"]:
+        try:
+            amt = float(row.get("SUM") or 0)
+            row["TRANTYPE"] = "D" if amt < 0 else "C"
+        except Exception:
+            row["TRANTYPE"] = "C"
+
+    # PK контроль
+    if (not row["NUM_DOC"]
+            or not row["DATE_TIME_DAT_OD_TIM_P"]
+            or row["AUT_CNTR_MFO"] is None
+            or not row["TRANTYPE"]):
+        log.warning(
+            "Skip API row (missing PK): NUM_DOC=%s, DT=%s, MFO=%s, TT=%s",
+            row.get("NUM_DOC"), row.get("DATE_TIME_DAT_OD_TIM_P"),
+            row.get("AUT_CNTR_MFO"), row.get("TRANTYPE"),
+        )
+        return None
+    return row
+
+
+def privat_iter_pages(iban: str, d_from: date, d_to: date, token: str,
+                      follow_id: Optional[str] = None,
+                      session: Optional[requests.Session] = None) -> Iterator[tuple[list[dict], Optional[str]]]:
     """
-    Тягнемо виписки по API. Парсимо дати одразу у date/datetime.
+    Сторінки виписки по одній: yield (rows, next_follow_id).
+    next_follow_id=None — це остання сторінка. follow_id дозволяє продовжити з checkpoint.
     ASCII-заголовки, щоб не ловити UnicodeEncodeError у http.client.
     """
-    url = "https://acp.privatbank.ua/api/statements/transactions"
-
     # ВСЕ ASCII! Жодних «лапок», кирилиці тощо.
     headers = _ascii_headers({
         "User-Agent": "BankToEnote/1.0",
@@ -218,172 +399,263 @@ def privat_fetch_statements(iban: str, d_from: date, d_to: date, token: str) ->
         "token": token,  # токен — ASCII
     })
 
+    page_limit = min(int(_env_num("PRIVAT_PAGE_LIMIT", 100)), PRIVAT_PAGE_MAX)
     params = {
         "acc": iban,
         "startDate": d_from.strftime("%d-%m-%Y"),
         "endDate": d_to.strftime("%d-%m-%Y"),
-        "limit": "50",
+        "limit": str(page_limit),
     }
 
-    out: list[dict] = []
-    next_page_id: Optional[str] = None
+    http = session or requests
+    limiter = _limiter_for(token)
+    next_page_id = follow_id
 
     while True:
         if next_page_id:
             params["followId"] = next_page_id
 
-        r = requests.get(url, headers=headers, params=params, timeout=60)
+        limiter.wait()
+        r = http.get(PRIVAT_URL, headers=headers, params=params, timeout=60)
         if r.status_code != 200:
-            log.error("Privat HTTP %s: %s", r.status_code, r.text)
-            break
+            raise RuntimeError(f"Privat HTTP {r.status_code}: {r.text[:500]}")
 
         data = r.json()
         if data.get("status") != "SUCCESS":
-            log.error("Privat error: %s", data.get("message"))
-            break
+            raise RuntimeError(f"Privat error: {data.get('message')}")
 
         txs = data.get("transactions", []) or []
-        if not txs:
-            log.info("No new transactions for %s", iban)
-        else:
-            for t in txs:
-                dt_parsed = _parse_dt(t.get("DATE_TIME_DAT_OD_TIM_P"), "%d.%m.%Y %H:%M:%S")
-                d_parsed  = _parse_d(t.get("DAT_OD"), "%d.%m.%Y")
-                kl_parsed = _parse_d(t.get("DAT_KL"), "%d.%m.%Y")
-
-                row = {
-                    "NUM_DOC": t.get("NUM_DOC") or t.get("REF") or t.get("ID"),
-                    "UETR": t.get("UETR"),
-                    "DATE_TIME_DAT_OD_TIM_P": dt_parsed,
-                    "DAT_OD": d_parsed,
-                    "AUT_MY_CRF": t.get("AUT_MY_CRF"),
-                    "SUM_E": t.get("SUM_E"),
-                    "CCY": t.get("CCY"),
-                    "AUT_CNTR_NAM": t.get("AUT_CNTR_NAM"),
-                    "AUT_MY_MFO_CITY": t.get("AUT_MY_MFO_CITY"),
-                    "AUT_CNTR_CRF": t.get("AUT_CNTR_CRF"),
-                    "DOC_TYP": t.get("DOC_TYP"),
-                    "SUM": t.get("SUM"),
-                    "AUT_CNTR_MFO": t.get("AUT_CNTR_MFO") if t.get("AUT_CNTR_MFO") is not None else "",
-                    "OSND": t.get("OSND"),
-                    "TIM_P": t.get("TIM_P"),
-                    "STRUCT_CODE": t.get("STRUCT_CODE"),
-                    "AUT_CNTR_ACC": t.get("AUT_CNTR_ACC"),
-                    "REFN": t.get("REFN"),
-                    "AUT_MY_MFO": t.get("AUT_MY_MFO"),
-                    "PR_PR": t.get("PR_PR"),
-                    "DLR": t.get("DLR"),
-                    "AUT_CNTR_MFO_CITY": t.get("AUT_CNTR_MFO_CITY"),
-                    "ULTMT": t.get("ULTMT"),
-                    "FL_REAL": t.get("FL_REAL"),
-                    "AUT_MY_NAM": t.get("AUT_MY_NAM"),
-                    "AUT_MY_MFO_NAME": t.get("AUT_MY_MFO_NAME"),
-                    "REF": t.get("REF"),
-                    "DAT_KL": kl_parsed,
-                    "ID": t.get("ID"),
-                    "AUT_MY_ACC": iban,
-                    "TRANTYPE": t.get("TRANTYPE"),
-                    "TECHNICAL_TRANSACTION_ID": t.get("TECHNICAL_TRANSACTION_ID"),
-                    "AUT_CNTR_MFO_NAME": t.get("AUT_CNTR_MFO_NAME"),
-                    "PAYER_ULTMT_NCEO": t.get("PAYER_ULTMT_NCEO"),
-                    "PAYER_ULTMT_NAME": t.get("PAYER_ULTMT_NAME"),
-                }
-
-                if not row["TRANTYPE"]:
-                    try:
-                        amt = float(row.get("SUM") or 0)
-                        row["TRANTYPE"] = "D" if amt < 0 else "C"
-                    except Exception:
-                        row["TRANTYPE"] = "C"
-
-                # PK контроль
-                if (not row["NUM_DOC"]
-                        or not row["DATE_TIME_DAT_OD_TIM_P"]
-                        or row["AUT_CNTR_MFO"] is None
-                        or not row["TRANTYPE"]):
-                    log.warning(
-                        "Skip API row (missing PK): NUM_DOC=%s, DT=%s, MFO=%s, TT=%s",
-                        row.get("NUM_DOC"), row.get("DATE_TIME_DAT_OD_TIM_P"),
-                        row.get("AUT_CNTR_MFO"), row.get("TRANTYPE"),
-                    )
-                    continue
-
-                out.append(row)
+        rows = [row for row in (_map_tx(t, iban) for t in txs) if row is not None]
 
         if data.get("exist_next_page"):
             next_page_id = data.get("next_page_id")
             log.debug("Next page for %s: %s", iban, next_page_id)
+            yield rows, next_page_id
+            if not next_page_id:
+                return
         else:
-            break
+            yield rows, None
+            return
+
 
+def privat_fetch_statements(iban: str, d_from: date, d_to: date, token: str) -> list[dict]:
+    """Вся виписка за діапазон одним списком (для разових викликів/дебагу)."""
+    out: list[dict] = []
+    try:
+        for rows, _ in privat_iter_pages(iban, d_from, d_to, token):
+            out.extend(rows)
+    except RuntimeError as e:
+        log.error("%s", e)
+    if not out:
+        log.info("No new transactions for %s", iban)
     return out
 
 
-# ───────────────────── еквайринг — рядки комісій (_ek) ─────────────────────
+# ─────────────────────────── checkpoints ───────────────────────────
 
-import re
-def create_acquiring_commission_rows():
-    sql_select = """
-        SELECT *
-        FROM bnk_trazact_prvt_ekv
-        WHERE TRANTYPE='C'
-          AND AUT_CNTR_NAM LIKE 'Розрахунки з еквайринг%'
-          AND OSND REGEXP 'Ком[[:space:]]*бан[[:space:]]*[0-9]'
-    """
-    sql_insert = """
-        INSERT INTO bnk_trazact_prvt_ekв (
-            NUM_DOC, UETR, DATE_TIME_DAT_OD_TIM_P, DAT_OD, AUT_MY_CRF, SUM_E, CCY,
-            AUT_CNTR_NAM, AUT_MY_MFO_CITY, AUT_CNTR_CRF, DOC_TYP, SUM, AUT_CNTR_MFO,
-            OSND, TIM_P, STRUCT_CODE, AUT_CNТР_ACC, REFN, AUT_MY_MFO, PR_PR, DLR,
-            AUT_CNTR_MFO_CITY, ULTMT, FL_REAL, AUT_MY_NAM, AUT_MY_MFO_NAME, REF,
-            DAT_KL, ID, AUT_MY_ACC, TRANTYPE, TECHNICAL_TRANSACTION_ID,
-            AUT_CNTR_MFO_NAME, created_at, updated_at
-        )
-        VALUES (
-            %(NUM_DOC)s, %(UETR)s, %(DATE_TIME_DAT_OD_TIM_P)s, %(DAT_OD)s, %(AUT_MY_CRF)s,
-            %(SUM_E)s, %(CCY)s, %(AUT_CNTR_NAM)s, %(AUT_MY_MFO_CITY)s, %(AUT_CNTR_CRF)s,
-            %(DOC_TYP)s, %(SUM)s, %(AUT_CNTR_MFO)s, %(OSND)s, %(TIM_P)s, %(STRUCT_CODE)s,
-            %(AUT_CNTR_ACC)s, %(REFN)s, %(AUT_MY_MFO)s, %(PR_PR)s, %(DLR)s,
-            %(AUT_CNTR_MFO_CITY)s, %(ULTMT)s, %(FL_REAL)s, %(AUT_MY_NAM)s,
-            %(AUT_MY_MFO_NAME)s, %(REF)s, %(DAT_KL)s, %(ID)s, %(AUT_MY_ACC)s,
-            %(TRANTYPE)s, %(TECHNICAL_TRANSACTION_ID)s, %(AUT_CNTR_MFO_NAME)s,
-            NOW(), NOW()
-        )
-        ON DUPLICATE KEY UPDATE updated_at=VALUES(updated_at)
+def _ensure_checkpoint_table() -> None:
+    sql = """
+    CREATE TABLE IF NOT EXISTS bnk_fetch_checkpoint (
+      iban        VARCHAR(64) NOT NULL PRIMARY KEY,
+      d_from      DATE NOT NULL,
+      d_to        DATE NOT NULL,
+      follow_id   VARCHAR(255) NULL,
+      done        TINYINT(1) NOT NULL DEFAULT 0,
+      pages       INT NOT NULL DEFAULT 0,
+      errors      INT NOT NULL DEFAULT 0,
+      updated_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
     """
+    with get_conn() as cn, cn.cursor() as cur:
+        cur.execute(sql)
+        # таблиця з першої версії — без errors
+        cur.execute("SELECT 1 FROM information_schema.columns WHERE table_schema=DATABASE() "
+                    "AND table_name='bnk_fetch_checkpoint' AND column_name='errors' LIMIT 1")
+        if cur.fetchone() is None:
+            cur.execute("ALTER TABLE bnk_fetch_checkpoint ADD COLUMN errors INT NOT NULL DEFAULT 0 AFTER pages")
+
 
+def _get_checkpoint(iban: str) -> Optional[dict]:
+    sql = """
+    SELECT d_from, d_to, follow_id, done, pages, errors,
+           TIMESTAMPDIFF(MINUTE, updated_at, NOW()) AS age_min
+    FROM bnk_fetch_checkpoint WHERE iban=%s
+    """
     with get_conn() as cn, cn.cursor(dictionary=True) as cur:
-        cur.execute(sql_select)
-        rows = cur.fetchall()
+        cur.execute(sql, (iban,))
+        return cur.fetchone()
 
-        if not rows:
-            log.info("No base rows found for acquiring commissions.")
-            return
 
-        inserted = 0
-        for r in rows:
-            m = re.search(r"Ком\s*бан\s*([0-9]+[.,]?[0-9]*)", r.get("OSND", ""), flags=re.IGNORECASE)
-            if not m:
-                continue
-            fee = float(m.group(1).replace(",", "."))
-            new_row = dict(r)
-            new_row["NUM_DOC"] = f"{r['NUM_DOC']}_ek"
-            new_row["SUM"] = round(fee, 2)
-            new_row["SUM_E"] = new_row["SUM"]
-            new_row["TRANTYPE"] = "D"
-            new_row["OSND"] = "Розрахунки з еквайрингом"
-            try:
-                cur.execute(sql_insert, new_row)
-                inserted += 1
-            except Exception as e:
-                log.warning("Skip insert _ek for %s: %s", r["NUM_DOC"], e)
+def _save_checkpoint(iban: str, d_from: date, d_to: date, follow_id: Optional[str],
+                     done: bool, pages: int) -> None:
+    sql = """
+    INSERT INTO bnk_fetch_checkpoint (iban, d_from, d_to, follow_id, done, pages, errors)
+    VALUES (%s, %s, %s, %s, %s, %s, 0)
+    ON DUPLICATE KEY UPDATE
+      d_from=VALUES(d_from), d_to=VALUES(d_to), follow_id=VALUES(follow_id),
+      done=VALUES(done), pages=VALUES(pages), errors=0
+    """
+    with get_conn() as cn, cn.cursor() as cur:
+        cur.execute(sql, (iban, d_from, d_to, follow_id, int(done), pages))
+        cn.commit()
+
 
+def _checkpoint_failed(iban: str, d_from: date, d_to: date) -> None:
+    """Прогін рахунку впав: +1 до errors, щоб наступний почав діапазон заново, без followId."""
+    sql = """
+    INSERT INTO bnk_fetch_checkpoint (iban, d_from, d_to, follow_id, done, pages, errors)
+    VALUES (%s, %s, %s, NULL, 0, 0, 1)
+    ON DUPLICATE KEY UPDATE errors=errors+1
+    """
+    with get_conn() as cn, cn.cursor() as cur:
+        cur.execute(sql, (iban, d_from, d_to))
         cn.commit()
-        log.info("Created %s commission (_ek) rows for acquiring.", inserted)
+
+
+def _plan_range(iban: str, days_back: int, today: date) -> tuple[date, date, Optional[str], int]:
+    """
+    (d_from, d_to, follow_id, pages_done) для рахунку:
+      - незавершений checkpoint → той самий діапазон з followId;
+        якщо checkpoint старший за BANK_CHECKPOINT_MAX_AGE_MIN (followId банку вже міг протухнути)
+        або прогін з ним уже падав — той самий діапазон з першої сторінки
+        (upsert сирих рядків ідемпотентний, повтор сторінок нічого не дублює);
+      - завершений → від його d_to (останній день перечитуємо, бо він міг бути неповним);
+      - немає checkpoint → MAX(DATE)+1 або today-days_back, як раніше.
+    """
+    cp = _get_checkpoint(iban)
+    if cp and not cp["done"]:
+        max_age = int(_env_num("BANK_CHECKPOINT_MAX_AGE_MIN", 360))
+        if cp["follow_id"] and (int(cp["errors"] or 0) > 0 or (cp["age_min"] or 0) > max_age):
+            log.warning("Checkpoint for %s is stale or failed (age=%s min, errors=%s): restart %s..%s from page 1",
+                        iban, cp["age_min"], cp["errors"], cp["d_from"], cp["d_to"])
+            return cp["d_from"], cp["d_to"], None, 0
+        return cp["d_from"], cp["d_to"], cp["follow_id"], int(cp["pages"] or 0)
+    if cp and cp["done"]:
+        return min(cp["d_to"], today), today, None, 0
+    last = _get_last_tran_date(iban)
+    d_from = (last + timedelta(days=1)) if last else (today - timedelta(days=days_back))
+    return min(d_from, today), today, None, 0
+
+
+# ───────────────────── еквайринг — рядки комісій (_ek) ─────────────────────
+
+# Сума комісії з OSND ("... Ком бан 12,34 ...") — витягується в самому MySQL
+_EK_FEE_EXPR = (
+    "CAST(REPLACE(REGEXP_SUBSTR("
+    "REGEXP_SUBSTR(b.OSND, 'Ком[[:space:]]*бан[[:space:]]*[0-9]+[.,]?[0-9]*', 1, 1, 'i'),"
+    " '[0-9]+[.,]?[0-9]*'), ',', '.') AS DECIMAL(15,2))"
+)
+_EK_COLS = (
+    "NUM_DOC", "UETR", "DATE_TIME_DAT_OD_TIM_P", "DAT_OD", "AUT_MY_CRF", "SUM_E", "CCY",
+    "AUT_CNTR_NAM", "AUT_MY_MFO_CITY", "AUT_CNTR_CRF", "DOC_TYP", "SUM", "AUT_CNTR_MFO",
+    "OSND", "TIM_P", "STRUCT_CODE", "AUT_CNTR_ACC", "REFN", "AUT_MY_MFO", "PR_PR", "DLR",
+    "AUT_CNTR_MFO_CITY", "ULTMT", "FL_REAL", "AUT_MY_NAM", "AUT_MY_MFO_NAME", "REF",
+    "DAT_KL", "ID", "AUT_MY_ACC", "TRANTYPE", "TECHNICAL_TRANSACTION_ID",
+    "AUT_CNTR_MFO_NAME", "created_at", "updated_at",
+)
+_EK_OVERRIDES = {
+    "NUM_DOC": "CONCAT(b.NUM_DOC, '_ek')",
+    "SUM": _EK_FEE_EXPR,
+    "SUM_E": _EK_FEE_EXPR,
+    "TRANTYPE": "'D'",
+    "OSND": "'Розрахунки з еквайрингом'",
+    "created_at": "NOW()",
+    "updated_at": "NOW()",
+}
+
+
+def create_acquiring_commission_rows(date_from: Optional[date] = None,
+                                     date_to: Optional[date] = None) -> tuple[int, int]:
+    """
+    Рядки комісій еквайрингу (<NUM_DOC>_ek, TRANTYPE='D') одним INSERT ... SELECT.
+    Працює лише на діапазоні дат щойно завантаженої виписки; без діапазону —
+    на рядках, новіших за останній створений _ek.
+    Повертає (created, unchanged).
+    """
+    where = ["b.TRANTYPE='C'",
+             "b.AUT_CNTR_NAM LIKE 'Розрахунки з еквайринг%%'",
+             "b.OSND REGEXP 'Ком[[:space:]]*бан[[:space:]]*[0-9]'"]
+    params: list = []
+
+    with get_conn() as cn, cn.cursor() as cur:
+        if date_from and date_to:
+            where.append("b.DATE_TIME_DAT_OD_TIM_P >= %s AND b.DATE_TIME_DAT_OD_TIM_P < %s")
+            params += [date_from, date_to + timedelta(days=1)]
+        else:
+            cur.execute("SELECT MAX(DATE_TIME_DAT_OD_TIM_P) FROM bnk_trazact_prvt_ekv WHERE NUM_DOC LIKE '%\\_ek'")
+            row = cur.fetchone()
+            if row and row[0]:
+                where.append("b.DATE_TIME_DAT_OD_TIM_P >= %s")
+                params.append(row[0])
+
+        base_from = f"""
+            FROM bnk_trazact_prvt_ekv b
+            WHERE {' AND '.join(where)}
+        """
+        cur.execute(f"SELECT COUNT(*) {base_from}", params)
+        candidates = int(cur.fetchone()[0])
+        if not candidates:
+            log.info("No base rows found for acquiring commissions.")
+            return 0, 0
+
+        select_list = ", ".join(_EK_OVERRIDES.get(c, f"b.{c}") for c in _EK_COLS)
+        sql_insert = f"""
+            INSERT INTO bnk_trazact_prvt_ekv ({', '.join(_EK_COLS)})
+            SELECT {select_list}
+            {base_from}
+              AND NOT EXISTS (
+                SELECT 1 FROM bnk_trazact_prvt_ekv e
+                WHERE e.NUM_DOC = CONCAT(b.NUM_DOC, '_ek')
+                  AND e.DATE_TIME_DAT_OD_TIM_P = b.DATE_TIME_DAT_OD_TIM_P
+                  AND e.AUT_CNTR_MFO = b.AUT_CNTR_MFO
+                  AND e.TRANTYPE = 'D'
+              )
+        """
+        cur.execute(sql_insert, params)
+        created = max(cur.rowcount, 0)
+        cn.commit()
+
+    unchanged = candidates - created
+    log.info("Acquiring commissions (_ek): created=%s unchanged=%s", created, unchanged)
+    return created, unchanged
 
 
 # ─────────────────────────────── runner ───────────────────────────────
 
+def _fetch_account(iban: str, alias: str, env_key: str, token: str,
+                   days_back: int, today: date) -> tuple[int, int, int, Optional[date], Optional[date]]:
+    """
+    Один рахунок: сторінки з API одразу йдуть в upsert, після кожної — checkpoint.
+    Повертає (ins, upd, skp, d_from, d_to); d_from/d_to=None, якщо рядків не було.
+    """
+    d_from, d_to, follow_id, pages = _plan_range(iban, days_back, today)
+    log.info("Pulling %s (%s) IBAN=%s from %s to %s%s", alias, env_key, iban, d_from, d_to,
+             f" (resume after page {pages})" if follow_id else "")
+
+    ins = upd = skp = 0
+    got_rows = False
+    with requests.Session() as sess:
+        sess.hooks["response"].append(METRICS.hook("privat"))
+        try:
+            for rows, next_id in privat_iter_pages(iban, d_from, d_to, token, follow_id, sess):
+                if rows:
+                    got_rows = True
+                    i, u, k = _insert_or_update_raw(rows)
+                    ins += i; upd += u; skp += k
+                    METRICS.rows("fetch", rows_in=len(rows), rows_out=i + u)
+                pages += 1
+                _save_checkpoint(iban, d_from, d_to, next_id, next_id is None, pages)
+        except Exception:
+            _checkpoint_failed(iban, d_from, d_to)
+            raise
+
+    log.info("Loaded: inserted=%s updated=%s skipped=%s pages=%s for %s", ins, upd, skp, pages, iban)
+    if not got_rows:
+        log.info("No new transactions for %s", iban)
+        return ins, upd, skp, None, None
+    return ins, upd, skp, d_from, d_to
+
+
 def run() -> None:
     s = load_settings()
     setup_logging(s.log_level, s.log_file)
@@ -394,11 +666,14 @@ def run() -> None:
         log.warning("No active Privat accounts in config.")
         return
 
+    _ensure_checkpoint_table()
+
     total_ins = total_upd = total_skp = 0
     min_date: Optional[date] = None
     max_date: Optional[date] = None
     today = date.today()
 
+    jobs = []
     for acc in accounts:
         iban = (acc["iban"] or "").replace(" ", "")
         alias = acc["alias"]
@@ -416,32 +691,29 @@ def run() -> None:
             acc_days_back = None
         days_back = acc_days_back if acc_days_back is not None else int(getattr(s, "bank_days_back", 7) or 7)
 
-        last = _get_last_tran_date(iban)
-        d_from = (last + timedelta(days=1)) if last else (today - timedelta(days=days_back))
-        d_to = today
-
-        log.info("Pulling %s (%s) IBAN=%s from %s to %s", alias, env_key, iban, d_from, d_to)
+        jobs.append((iban, alias, env_key, token, days_back))
 
-        try:
-            rows = privat_fetch_statements(iban, d_from, d_to, token)
-        except Exception as e:
-            log.error("Fetch failed for %s: %s", iban, e)
-            continue
-
-        ins, upd, skp = _insert_or_update_raw(rows)
-        log.info("Loaded: inserted=%s updated=%s skipped=%s for %s", ins, upd, skp, iban)
-        total_ins += ins
-        total_upd += upd
-        total_skp += skp
-
-        if rows:
-            min_date = min(min_date or d_to, d_from)
-            max_date = max(max_date or d_from, d_to)
+    workers = max(int(_env_num("BANK_FETCH_WORKERS", 4)), 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="privat") as ex:
+        futures = {ex.submit(_fetch_account, *job, today): job[0] for job in jobs}
+        for fut in as_completed(futures):
+            iban = futures[fut]
+            try:
+                ins, upd, skp, d_from, d_to = fut.result()
+            except Exception as e:
+                log.error("Fetch failed for %s: %s", iban, e)
+                continue
+            total_ins += ins
+            total_upd += upd
+            total_skp += skp
+            if d_from and d_to:
+                min_date = min(min_date or d_from, d_from)
+                max_date = max(max_date or d_to, d_to)
 
     if min_date and max_date:
         _rebuild_ekv_for_range(min_date, max_date)
         log.info("EKV updated for range: %s..%s", min_date, max_date)
-        create_acquiring_commission_rows()
+        create_acquiring_commission_rows(min_date, max_date)
 
     log.info("Done fetch_bank_data. total inserted=%s updated=%s skipped=%s", total_ins, total_upd, total_skp)
 
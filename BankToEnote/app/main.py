@@ -5,11 +5,13 @@ import sys
 import signal
 import traceback
 import os
-import subprocess
+import json
+import hashlib
 import mysql.connector
 
 from app.env_loader import load_settings
 from app.logging_setup import setup_logging
+from app.metrics import METRICS
 
 # push
 try:
@@ -53,99 +55,50 @@ def _env_int_pos(name: str) -> int | None:
 
 # STEP 1: fetch PrivatBank
 def fetch_privat_transactions():
-    try:
-        from app import fetch_bank_data  # type: ignore
-        log.info("🏦 Отримую транзакції з Привату (import app.fetch_bank_data)...")
-        if hasattr(fetch_bank_data, "main"):
-            fetch_bank_data.main()  # type: ignore
-        elif hasattr(fetch_bank_data, "fetch_bank_data"):
-            fetch_bank_data.fetch_bank_data()  # type: ignore
-        else:
-            raise RuntimeError("app.fetch_bank_data: немає ні main(), ні fetch_bank_data()")
-        log.info("✅ Отримано транзакції (через import).")
-        return
-    except Exception as e:
-        log.warning("Не вдалось через import: %s. Пробую subprocess -m ...", e)
-
-    cmd = [sys.executable, "-m", "app.fetch_bank_data"]
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # .../BankToEnote
-    env = os.environ.copy()
-    env["PYTHONPATH"] = project_root + (os.pathsep + env["PYTHONPATH"] if "PYTHONPATH" in env else "")
-    log.info("🏦 Отримую транзакції з Привату (subprocess: %s)...", " ".join(cmd))
-    res = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root, env=env)
-    if res.returncode != 0:
-        log.error("Помилка при отриманні транзакцій:\nSTDOUT:\n%s\nSTDERR:\n%s", res.stdout, res.stderr)
-        raise SystemExit(1)
-    log.info("✅ Отримано транзакції (через subprocess -m).\n%s", res.stdout.strip()[-500:])
+    from app import fetch_bank_data
+    log.info("🏦 Отримую транзакції з Привату...")
+    fetch_bank_data.run()
+    log.info("✅ Отримано транзакції.")
 
 
 # STEP 2: commission table
-def build_commission_table():
-    s = load_settings()
-    conn = mysql.connector.connect(
-        host=s.db_host, port=s.db_port, user=s.db_user, password=s.db_password, database=s.db_database
-    )
-    cur = conn.cursor()
-
-    def column_exists(db: str, table: str, col: str) -> bool:
-        cur.execute("""
-            SELECT 1
-            FROM information_schema.columns
-            WHERE table_schema=%s AND table_name=%s AND LOWER(column_name)=LOWER(%s)
-            LIMIT 1
-        """, (db, table, col))
-        return cur.fetchone() is not None
-
-    base_table = "bnk_trazact_prvt_ekv"
-    ext_table  = "bnk_trazact_prvt_ekv_ext"
+COMMISSION_BASE = "bnk_trazact_prvt_ekv"
+COMMISSION_EXT = "bnk_trazact_prvt_ekv_ext"
+COMMISSION_STATE = "commission_ext"
 
-    cur.execute("""
-        SELECT 1 FROM information_schema.tables
-        WHERE table_schema=%s AND table_name=%s LIMIT 1
-    """, (s.db_database, base_table))
-    if cur.fetchone() is None:
-        log.warning("⚠️  Таблиця %s.%s не знайдена — пропускаю крок комісій.", s.db_database, base_table)
-        cur.close(); conn.close(); return
 
+def _state_get(cur, name: str) -> dict:
     cur.execute("""
-        SELECT 1 FROM information_schema.tables
-        WHERE table_schema=%s AND table_name=%s LIMIT 1
-    """, (s.db_database, ext_table))
-    if cur.fetchone() is None:
-        cur.execute(f"CREATE TABLE `{ext_table}` LIKE `{base_table}`")
+        CREATE TABLE IF NOT EXISTS bnk_pipeline_state (
+          name       VARCHAR(64) NOT NULL PRIMARY KEY,
+          value      JSON NULL,
+          updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT value FROM bnk_pipeline_state WHERE name=%s", (name,))
+    row = cur.fetchone()
+    try:
+        return json.loads(row[0]) if row and row[0] else {}
+    except Exception:
+        return {}
 
-    if not column_exists(s.db_database, ext_table, "bank_fee"):
-        cur.execute(f"ALTER TABLE `{ext_table}` ADD COLUMN `bank_fee` DOUBLE NOT NULL DEFAULT 0")
-    if not column_exists(s.db_database, ext_table, "amount_with_fee"):
-        cur.execute(f"ALTER TABLE `{ext_table}` ADD COLUMN `amount_with_fee` DOUBLE NULL")
 
+def _state_set(cur, name: str, value: dict) -> None:
     cur.execute("""
-        SELECT LOWER(column_name)
-        FROM information_schema.columns
-        WHERE table_schema=%s AND table_name=%s
-    """, (s.db_database, base_table))
-    cols = {r[0] for r in cur.fetchall()}
-
-    amount_col = None
-    for cand in ("amount", "сумма", "summa", "amount_uah"):
-        if cand in cols:
-            amount_col = cand
-            break
-    if amount_col is None:
-        log.error("❌ Не знайдено колонку суми (amount/Сумма/...) у %s.%s — пропускаю крок комісій.",
-                  s.db_database, base_table)
-        cur.close(); conn.close(); return
-
-    fee_col = None
-    for cand in ("bank_fee", "fee", "commission", "comis", "комиссия"):
-        if cand in cols:
-            fee_col = cand
-            break
-    fee_expr = f"`{fee_col}`" if fee_col else "0"
+        INSERT INTO bnk_pipeline_state (name, value) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE value=VALUES(value)
+    """, (name, json.dumps(value, ensure_ascii=False, default=str)))
+
+
+def _resolve_commission_cols(cols: list[str]) -> tuple[str | None, str | None]:
+    amount_col = next((c for c in ("amount", "сумма", "summa", "amount_uah") if c in cols), None)
+    fee_col = next((c for c in ("bank_fee", "fee", "commission", "comis", "комиссия") if c in cols), None)
+    return amount_col, fee_col
 
-    cur.execute(f"TRUNCATE `{ext_table}`")
-    insert_sql = f"""
-        INSERT INTO `{ext_table}`
+
+def _commission_select(amount_col: str, fee_col: str | None) -> str:
+    fee_expr = f"`{fee_col}`" if fee_col else "0"
+    return f"""
         SELECT
             t.*,
             {fee_expr} AS bank_fee,
@@ -153,32 +106,154 @@ def build_commission_table():
                 WHEN `{amount_col}` < 0 THEN `{amount_col}` - ABS({fee_expr})
                 ELSE `{amount_col}`
             END AS amount_with_fee
-        FROM `{base_table}` t
+        FROM `{COMMISSION_BASE}` t
+    """
+
+
+def _rebuild_commission_full(cur, amount_col: str, fee_col: str | None) -> None:
+    """Повна перебудова у тіньову таблицю + атомарний RENAME — читачі не бачать порожньої ext."""
+    new, old = f"{COMMISSION_EXT}__new", f"{COMMISSION_EXT}__old"
+    cur.execute(f"DROP TABLE IF EXISTS `{new}`")
+    cur.execute(f"DROP TABLE IF EXISTS `{old}`")
+    cur.execute(f"CREATE TABLE `{new}` LIKE `{COMMISSION_BASE}`")
+    cur.execute(f"ALTER TABLE `{new}` "
+                f"ADD COLUMN `bank_fee` DOUBLE NOT NULL DEFAULT 0, "
+                f"ADD COLUMN `amount_with_fee` DOUBLE NULL")
+    cur.execute(f"INSERT INTO `{new}` {_commission_select(amount_col, fee_col)}")
+
+    cur.execute("SELECT 1 FROM information_schema.tables WHERE table_schema=DATABASE() AND table_name=%s LIMIT 1",
+                (COMMISSION_EXT,))
+    if cur.fetchone() is None:
+        cur.execute(f"RENAME TABLE `{new}` TO `{COMMISSION_EXT}`")
+    else:
+        cur.execute(f"RENAME TABLE `{COMMISSION_EXT}` TO `{old}`, `{new}` TO `{COMMISSION_EXT}`")
+        cur.execute(f"DROP TABLE `{old}`")
+
+
+def _primary_key(cur, table: str) -> list[str]:
+    cur.execute(f"SHOW KEYS FROM `{table}` WHERE Key_name = 'PRIMARY'")
+    rows = cur.fetchall()
+    return [r[4] for r in sorted(rows, key=lambda r: r[3])]   # Column_name за Seq_in_index
+
+
+def _upsert_commission_since(cur, cols: list[str], amount_col: str, fee_col: str | None,
+                             watermark) -> tuple[int, int, int]:
     """
-    cur.execute(insert_sql)
-    conn.commit()
+    Лише рядки з updated_at >= watermark (>=, бо в межах секунди могли бути ще зміни).
+    Рядки ext, яких уже немає в базовій таблиці, — видаляються всі, без межі watermark:
+    anti-join по PK індексний і дешевий, а видалений рядок міг востаннє змінитись давно.
+    rowcount ON DUPLICATE = 1*inserted + 2*updated (+0 незмінені), тому спершу рахуємо,
+    скільки ключів вікна вже є в ext. Повертає (inserted, updated, deleted).
+    """
+    pk = _primary_key(cur, COMMISSION_BASE)
+    on = " AND ".join(f"e.`{c}` = t.`{c}`" for c in pk)
+    cur.execute(f"""
+        SELECT COUNT(*), COUNT(e.`{pk[0]}`)
+        FROM `{COMMISSION_BASE}` t LEFT JOIN `{COMMISSION_EXT}` e ON {on}
+        WHERE t.updated_at >= %s
+    """, (watermark,))
+    candidates, existing = cur.fetchone()
+
+    assignments = ", ".join(f"`{c}`=VALUES(`{c}`)" for c in [*cols, "bank_fee", "amount_with_fee"])
+    cur.execute(f"""
+        INSERT INTO `{COMMISSION_EXT}`
+        {_commission_select(amount_col, fee_col)}
+        WHERE t.updated_at >= %s
+        ON DUPLICATE KEY UPDATE {assignments}
+    """, (watermark,))
+    ins = int(candidates) - int(existing)
+    upd = max(cur.rowcount - ins, 0) // 2
+
+    cur.execute(f"""
+        DELETE e FROM `{COMMISSION_EXT}` e
+        LEFT JOIN `{COMMISSION_BASE}` t ON {on}
+        WHERE t.`{pk[0]}` IS NULL
+    """)
+    return ins, upd, max(cur.rowcount, 0)
 
-    log.info("✅ Commission table rebuilt: %s.%s (amount=%s, fee=%s)",
-             s.db_database, ext_table, amount_col, (fee_col or "0 (not found)"))
 
-    cur.close(); conn.close()
+def build_commission_table():
+    """
+    bnk_trazact_prvt_ekv → bnk_trazact_prvt_ekv_ext з bank_fee/amount_with_fee.
+    Звичайний прогін — інкрементальний upsert по updated_at від watermark.
+    Мапінг колонок суми/комісії і watermark лежать у bnk_pipeline_state;
+    повна перебудова (shadow + RENAME) — лише коли змінився набір колонок
+    базової таблиці, немає стану або COMMISSION_FULL_REBUILD=1.
+    Видалення з базової таблиці інкремент прибирає з ext повністю (anti-join по PK).
+    """
+    from app.db import get_conn
+    s = load_settings()
+    with get_conn() as conn, conn.cursor() as cur:
+        try:
+            cur.execute(f"SELECT * FROM `{COMMISSION_BASE}` LIMIT 0")
+            cur.fetchall()
+        except mysql.connector.Error:
+            log.warning("⚠️  Таблиця %s.%s не знайдена — пропускаю крок комісій.", s.db_database, COMMISSION_BASE)
+            return
+        cols = [d[0] for d in cur.description]
+        cols_lower = [c.lower() for c in cols]
+        sig = hashlib.sha1("|".join(cols).encode("utf-8")).hexdigest()
+
+        state = _state_get(cur, COMMISSION_STATE)
+        if state.get("sig") == sig:
+            amount_col, fee_col = state.get("amount_col"), state.get("fee_col")
+        else:
+            amount_col, fee_col = _resolve_commission_cols(cols_lower)
+
+        if amount_col is None:
+            log.error("❌ Не знайдено колонку суми (amount/Сумма/...) у %s.%s — пропускаю крок комісій.",
+                      s.db_database, COMMISSION_BASE)
+            return
+
+        has_updated_at = "updated_at" in cols_lower
+        cur.execute(f"SELECT MAX(updated_at) FROM `{COMMISSION_BASE}`" if has_updated_at else "SELECT NULL")
+        new_wm = cur.fetchone()[0]
+
+        full = (_env_bool("COMMISSION_FULL_REBUILD", False)
+                or state.get("sig") != sig
+                or not state.get("watermark")
+                or not has_updated_at)
+
+        counts = None
+        try:
+            if full:
+                # DDL комітить сам; RENAME підміняє ext атомарно
+                _rebuild_commission_full(cur, amount_col, fee_col)
+                mode = "full"
+            else:
+                # пул з autocommit=True: upsert, DELETE і новий watermark — однією транзакцією
+                conn.start_transaction()
+                counts = _upsert_commission_since(cur, cols, amount_col, fee_col, state["watermark"])
+                mode = "incremental"
+            _state_set(cur, COMMISSION_STATE, {
+                "sig": sig,
+                "amount_col": amount_col,
+                "fee_col": fee_col,
+                "watermark": new_wm if new_wm is not None else state.get("watermark"),
+            })
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        if counts:
+            METRICS.rows("commission", rows_out=sum(counts))
+        log.info("✅ Commission table %s: %s.%s (amount=%s, fee=%s%s)",
+                 mode, s.db_database, COMMISSION_EXT, amount_col, (fee_col or "0 (not found)"),
+                 ", inserted=%s updated=%s deleted=%s" % counts if counts else "")
 
 
 # STEP 3: counterparties refresh
 def refresh_counterparties():
-    path = _env("PATH_ENOTE_COUNTERPARTY_SCRIPT")
+    """
+    Дельта-синхронізація контрагентів у цьому ж процесі (app.counterparty_sync):
+    пропускається, якщо в черзі немає нерозпізнаних податкових номерів.
+    """
     if not _env_bool("COUNTERPARTY_REFRESH_BEFORE_RUN", True):
         log.info("🔄 Оновлення контрагентів вимкнено прапором.")
         return
-    if not path or not os.path.isfile(path):
-        log.warning("⚠️  Скрипт оновлення контрагентів не знайдено — пропускаю.")
-        return
-    log.info("🔄 Оновлюю контрагентів (%s)...", os.path.basename(path))
-    res = subprocess.run([sys.executable, path], capture_output=True, text=True)
-    if res.returncode != 0:
-        log.error("Помилка при оновленні контрагентів:\n%s\n%s", res.stdout, res.stderr)
-        raise SystemExit(1)
-    log.info("✅ Контрагенти оновлені.")
+    from app.counterparty_sync import sync_counterparties
+    sync_counterparties(force=_env_bool("COUNTERPARTY_SYNC_FORCE", False))
 
 
 # STEP 4: push to Enote
@@ -192,6 +267,23 @@ def push_to_enote_wrapper():
     log.info("✅ Чеки створено.")
 
 
+def _export_metrics(status: str) -> None:
+    """Підсумок прогону: .prom для node_exporter (METRICS_PROM_FILE) + рядок у bnk_pipeline_runs."""
+    prom = _env("METRICS_PROM_FILE")
+    if prom:
+        try:
+            METRICS.write_prom(prom, status)
+        except Exception as e:
+            log.warning("Не вдалось записати %s: %s", prom, e)
+    if _env_bool("METRICS_SAVE_RUN", True):
+        try:
+            from app.db import get_conn
+            with get_conn() as cn:
+                METRICS.save_run(cn, status)
+        except Exception as e:
+            log.warning("Не вдалось записати bnk_pipeline_runs: %s", e)
+
+
 def main() -> int:
     _setup_signals()
     s = load_settings()
@@ -204,19 +296,28 @@ def main() -> int:
     log.info("🚀 Запуск повного циклу Bank→Enote")
     log.info("ENV=%s | DRY_RUN=%s | LIMIT=%s", getattr(s, "enote_env", "?"), dry, lim_text)
 
+    status = "error"
     try:
-        fetch_privat_transactions()
-        build_commission_table()
-        refresh_counterparties()
-        push_to_enote_wrapper()
+        with METRICS.stage("fetch"):
+            fetch_privat_transactions()
+        with METRICS.stage("commission"):
+            build_commission_table()
+        with METRICS.stage("counterparties"):
+            refresh_counterparties()
+        with METRICS.stage("push"):
+            push_to_enote_wrapper()
         log.info("🏁 Успішне завершення повного циклу.")
+        status = "ok"
         return 0
     except KeyboardInterrupt:
         log.warning("Перервано користувачем.")
+        status = "interrupted"
         return 130
     except Exception:
         log.error("❌ Помилка:\n%s", traceback.format_exc())
         return 1
+    finally:
+        _export_metrics(status)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+# app/metrics.py
+from __future__ import annotations
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+log = logging.getLogger("metrics")
+
+HTTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIX = "bank2enote"
+
+
+class Metrics:
+    """
+    Лічильники одного прогону пайплайна: час і рядки по етапах,
+    HTTP (кількість + гістограма латентності по клієнтах), запити в БД.
+    Потокобезпечно — пишуть і воркери push/fetch.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = datetime.now()
+        self.t0 = time.monotonic()
+        self.stages: dict[str, dict] = {}
+        self.http_count: dict[tuple[str, str], int] = defaultdict(int)
+        self.http_sum: dict[str, float] = defaultdict(float)
+        self.http_buckets: dict[str, list[int]] = defaultdict(lambda: [0] * len(HTTP_BUCKETS))
+        self.http_total: dict[str, int] = defaultdict(int)
+        self.db_queries = 0
+
+    # ───────────── collectors ─────────────
+
+    @contextmanager
+    def stage(self, name: str):
+        st = self.stages.setdefault(name, {"seconds": 0.0, "rows_in": 0, "rows_out": 0, "ok": None})
+        t = time.monotonic()
+        try:
+            yield st
+            st["ok"] = True
+        except BaseException:
+            st["ok"] = False
+            raise
+        finally:
+            st["seconds"] += time.monotonic() - t
+            log.info("⏱  stage %s: %.2fs (in=%s, out=%s)", name, st["seconds"], st["rows_in"], st["rows_out"])
+
+    def rows(self, stage: str, rows_in: int = 0, rows_out: int = 0) -> None:
+        with self.lock:
+            st = self.stages.setdefault(stage, {"seconds": 0.0, "rows_in": 0, "rows_out": 0, "ok": None})
+            st["rows_in"] += int(rows_in or 0)
+            st["rows_out"] += int(rows_out or 0)
+
+    def http(self, client: str, seconds: float, status: int | str) -> None:
+        with self.lock:
+            self.http_count[(client, str(status))] += 1
+            self.http_total[client] += 1
+            self.http_sum[client] += seconds
+            buckets = self.http_buckets[client]
+            for i, le in enumerate(HTTP_BUCKETS):
+                if seconds <= le:
+                    buckets[i] += 1
+
+    def db_query(self, n: int = 1) -> None:
+        with self.lock:
+            self.db_queries += n
+
+    def hook(self, client: str):
+        """requests response-hook: session.hooks["response"].append(METRICS.hook("odata"))."""
+        def _on_response(resp, *args, **kwargs):
+            self.http(client, resp.elapsed.total_seconds(), resp.status_code)
+        return _on_response
+
+    # ───────────── exporters ─────────────
+
+    def summary(self, status: str) -> dict:
+        with self.lock:
+            return {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "seconds": round(time.monotonic() - self.t0, 3),
+                "status": status,
+                "stages": {k: dict(v, seconds=round(v["seconds"], 3)) for k, v in self.stages.items()},
+                "http": {c: {"count": self.http_total[c], "seconds_sum": round(self.http_sum[c], 3)}
+                         for c in self.http_total},
+                "http_status": {f"{c}:{st}": n for (c, st), n in self.http_count.items()},
+                "db_queries": self.db_queries,
+            }
+
+    def render_prom(self, status: str) -> str:
+        out: list[str] = []
+
+        def metric(name: str, kind: str, help_: str, samples: list[tuple[str, float]]):
+            out.append(f"# HELP {PREFIX}_{name} {help_}")
+            out.append(f"# TYPE {PREFIX}_{name} {kind}")
+            out.extend(f"{PREFIX}_{name}{labels} {value}" for labels, value in samples)
+
+        with self.lock:
+            metric("stage_seconds", "gauge", "Wall time per pipeline stage.",
+                   [(f'{{stage="{k}"}}', round(v["seconds"], 3)) for k, v in self.stages.items()])
+            metric("stage_rows_in", "gauge", "Rows read per stage.",
+                   [(f'{{stage="{k}"}}', v["rows_in"]) for k, v in self.stages.items()])
+            metric("stage_rows_out", "gauge", "Rows written per stage.",
+                   [(f'{{stage="{k}"}}', v["rows_out"]) for k, v in self.stages.items()])
+            metric("http_requests_total", "counter", "HTTP requests by client and status.",
+                   [(f'{{client="{c}",status="{st}"}}', n) for (c, st), n in sorted(self.http_count.items())])
+
+            hist: list[tuple[str, float]] = []
+            for c in sorted(self.http_total):
+                for le, n in zip(HTTP_BUCKETS, self.http_buckets[c]):
+                    hist.append((f'_bucket{{client="{c}",le="{le}"}}', n))
+                hist.append((f'_bucket{{client="{c}",le="+Inf"}}', self.http_total[c]))
+                hist.append((f'_sum{{client="{c}"}}', round(self.http_sum[c], 3)))
+                hist.append((f'_count{{client="{c}"}}', self.http_total[c]))
+            out.append(f"# HELP {PREFIX}_http_request_duration_seconds HTTP latency by client.")
+            out.append(f"# TYPE {PREFIX}_http_request_duration_seconds histogram")
+            out.extend(f"{PREFIX}_http_request_duration_seconds{suffix} {v}" for suffix, v in hist)
+
+            metric("db_queries_total", "counter", "DB statements executed.", [("", self.db_queries)])
+            metric("run_seconds", "gauge", "Total run wall time.", [("", round(time.monotonic() - self.t0, 3))])
+            metric("run_success", "gauge", "1 if the last run succeeded.", [("", 1 if status == "ok" else 0)])
+            metric("run_timestamp_seconds", "gauge", "Unix time of the last run end.", [("", int(time.time()))])
+        return "\n".join(out) + "\n"
+
+    def write_prom(self, path: str, status: str) -> None:
+        """Атомарно (tmp + rename), як чекає textfile collector node_exporter."""
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(p.suffix + ".tmp")
+        tmp.write_text(self.render_prom(status), encoding="utf-8")
+        os.replace(tmp, p)
+
+    def save_run(self, cn, status: str) -> None:
+        with cn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS bnk_pipeline_runs (
+                  id          BIGINT AUTO_INCREMENT PRIMARY KEY,
+                  started_at  DATETIME NOT NULL,
+                  finished_at DATETIME NOT NULL,
+                  status      VARCHAR(16) NOT NULL,
+                  seconds     DOUBLE NOT NULL,
+                  summary     JSON NULL,
+                  KEY ix_started (started_at)
+                )
+            """)
+            s = self.summary(status)
+            cur.execute("""
+                INSERT INTO bnk_pipeline_runs (started_at, finished_at, status, seconds, summary)
+                VALUES (%s, NOW(), %s, %s, %s)
+            """, (self.started_at, status, s["seconds"], json.dumps(s, ensure_ascii=False)))
+        cn.commit()
+
+
+METRICS = Metrics()
+
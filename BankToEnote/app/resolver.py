@@ -0,0 +1,151 @@
+# app/resolver.py
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+
+from app.db import get_conn
+
+log = logging.getLogger("resolver")
+
+
+def clean_acc(v: str | None) -> str:
+    """Те саме, що UPPER(TRIM(REPLACE(... ' ', '\\t', '\\n'))) у bnk_v_accounts_norm."""
+    return (v or "").replace(" ", "").replace("\t", "").replace("\n", "").strip().upper()
+
+
+def ci_key(v) -> str:
+    """
+    Ключ індексу з тією ж семантикою, що й `col = %s` у старих запитах: колонки довідників
+    у *_ci PAD SPACE, тож регістр і пробіли в кінці не враховуються.
+    """
+    return str(v).rstrip(" ").upper()
+
+
+class Resolver:
+    """
+    Пошук рахунку/контрагента без запитів на кожен рядок.
+    Довідники вантажаться один раз за прогін (ліниво, при першому зверненні)
+    у хеш-індекси; далі всі пошуки — в пам'яті.
+
+    Джерела:
+      - et_Catalog_ДенежныеСчета      → by НомерСчета          (enote_push)
+      - bnk_v_accounts_norm           → by acc_clean           (runner_post)
+      - et_x_Catalog_Контрагенты      → by ИНН / ЕДРПОУ        (enote_push)
+      - bnk_v_counterparties_norm     → by edrpou / iban / name (runner_post)
+    Ключі й шукані значення — через ci_key, як порівнював MySQL у колишніх `col = %s`.
+    """
+
+    def __init__(self):
+        self._acc_by_num: dict[str, str] | None = None
+        self._acc_by_clean: dict[str, str] | None = None
+        self._cnt_by_inn: dict[str, str] | None = None
+        self._cnt_by_edrpou: dict[str, str] | None = None
+        self._norm_by_edrpou: dict[str, list[str]] | None = None
+        self._norm_by_iban: dict[str, list[str]] | None = None
+        self._norm_by_name: dict[str, list[str]] | None = None
+        self.stats: dict[str, int] = defaultdict(int)
+
+    # ───────────── loaders ─────────────
+
+    @staticmethod
+    def _fetch(sql: str) -> list[tuple]:
+        with get_conn() as cn, cn.cursor() as cur:
+            cur.execute(sql)
+            return cur.fetchall()
+
+    def _load_accounts(self) -> None:
+        self._acc_by_num = {}
+        for num, ref in self._fetch("SELECT НомерСчета, Ref_Key FROM et_Catalog_ДенежныеСчета"):
+            if num:
+                self._acc_by_num.setdefault(ci_key(num), ref)
+        log.info("Resolver: loaded %s accounts (et_Catalog_ДенежныеСчета)", len(self._acc_by_num))
+
+    def _load_accounts_norm(self) -> None:
+        self._acc_by_clean = {}
+        for acc, ref in self._fetch("SELECT acc_clean, Ref_Key FROM bnk_v_accounts_norm"):
+            if acc:
+                self._acc_by_clean.setdefault(ci_key(acc), ref)
+        log.info("Resolver: loaded %s accounts (bnk_v_accounts_norm)", len(self._acc_by_clean))
+
+    def _load_counterparties(self) -> None:
+        self._cnt_by_inn, self._cnt_by_edrpou = {}, {}
+        rows = self._fetch("SELECT ИНН, ЕДРПОУ, Ref_Key FROM et_x_Catalog_Контрагенты")
+        for inn, edrpou, ref in rows:
+            if inn:
+                self._cnt_by_inn.setdefault(ci_key(inn), ref)
+            if edrpou:
+                self._cnt_by_edrpou.setdefault(ci_key(edrpou), ref)
+        log.info("Resolver: loaded %s counterparties (et_x_Catalog_Контрагенты)", len(rows))
+
+    def _load_counterparties_norm(self) -> None:
+        self._norm_by_edrpou = defaultdict(list)
+        self._norm_by_iban = defaultdict(list)
+        self._norm_by_name = defaultdict(list)
+        rows = self._fetch("""
+            SELECT Ref_Key, edrpou_digits, iban1_clean, iban2_clean, name_norm
+            FROM bnk_v_counterparties_norm
+        """)
+        for ref, edrpou, iban1, iban2, name in rows:
+            if edrpou:
+                self._norm_by_edrpou[ci_key(edrpou)].append(ref)
+            # як і в SQL `iban1_clean=%s OR iban2_clean=%s`: один рядок рахується один раз
+            for iban in {ci_key(i) for i in (iban1, iban2) if i}:
+                self._norm_by_iban[iban].append(ref)
+            if name:
+                self._norm_by_name[ci_key(name)].append(ref)
+        log.info("Resolver: loaded %s counterparties (bnk_v_counterparties_norm)", len(rows))
+
+    # ───────────── lookups ─────────────
+
+    def _count(self, name: str, found: bool) -> None:
+        self.stats[f"{name}_{'hit' if found else 'miss'}"] += 1
+
+    def account_by_number(self, num: str | None) -> str | None:
+        if self._acc_by_num is None:
+            self._load_accounts()
+        ref = self._acc_by_num.get(ci_key(num)) if num else None
+        self._count("acc", ref is not None)
+        return ref
+
+    def account_by_clean(self, acc: str | None) -> str | None:
+        if self._acc_by_clean is None:
+            self._load_accounts_norm()
+        ref = self._acc_by_clean.get(clean_acc(acc)) if acc else None
+        self._count("acc_norm", ref is not None)
+        return ref
+
+    def counterparty_by_tax(self, tax: str | None) -> str | None:
+        """ИНН, потім ЄДРПОУ — як у старому enote_push."""
+        if self._cnt_by_inn is None:
+            self._load_counterparties()
+        ref = None
+        if tax:
+            key = ci_key(tax)
+            ref = self._cnt_by_inn.get(key) or self._cnt_by_edrpou.get(key)
+        self._count("cnt", ref is not None)
+        return ref
+
+    def find_counterparty(self, edrpou_digits: str | None, iban_clean: str | None,
+                          name_norm: str | None) -> tuple[str | None, str | None]:
+        """Семантика sql_repo.find_counterparty: edrpou → iban → name, >1 збіг = ambiguous."""
+        if self._norm_by_edrpou is None:
+            self._load_counterparties_norm()
+        for value, index in ((edrpou_digits, self._norm_by_edrpou),
+                             (iban_clean, self._norm_by_iban),
+                             (name_norm, self._norm_by_name)):
+            if not value:
+                continue
+            refs = index.get(ci_key(value)) or []
+            if len(refs) == 1:
+                self._count("cnt_norm", True)
+                return refs[0], None
+            if len(refs) > 1:
+                self.stats["cnt_norm_ambiguous"] += 1
+                return None, "ambiguous_counterparty"
+        self._count("cnt_norm", False)
+        return None, "counterparty_not_found"
+
+    def log_stats(self) -> None:
+        if self.stats:
+            log.info("Resolver stats: %s", ", ".join(f"{k}={v}" for k, v in sorted(self.stats.items())))
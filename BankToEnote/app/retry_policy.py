@@ -0,0 +1,82 @@
+# app/retry_policy.py
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+
+from app.env_loader import load_settings
+
+# Класи помилок у bnk_trazact_prvt_ekv.err_code
+# transient — лише відмови сервера, після яких документа точно немає: 429/408 і HTTP_5xx
+TRANSIENT_CODES = ("HTTP_429", "HTTP_408")  # + усі HTTP_5xx
+DATA_CODES = ("NO_ACC", "NO_CNT", "account_not_found", "counterparty_not_found", "ambiguous_counterparty")
+# HTTP_EXC (обрив/таймаут після відправки), NO_REF (2xx без Ref_Key), unexpected — документ
+# міг створитись у Єноті: автоповтор дав би дубль Document_ДенежныйЧек, тож лише вручну
+MANUAL_CODES = ("HTTP_EXC", "NO_REF", "unexpected")
+# решта (HTTP_400, HTTP_403, ...) — теж постійні, вручну
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.getenv(name, "") or "").strip()
+    try:
+        return int(raw) if raw else default
+    except Exception:
+        return default
+
+
+def classify(code: str | None) -> str:
+    """'transient' | 'data' | 'permanent' | 'none'."""
+    if not code:
+        return "none"
+    if code in TRANSIENT_CODES or (code.startswith("HTTP_5") and len(code) == 8):
+        return "transient"
+    if code in DATA_CODES:
+        return "data"
+    return "permanent"
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Повтори на основі try_count/ts_last_try: затримка = base * 2^(try_count-1), не більше cap.
+      transient — сервер відхилив запит до створення (HTTP_5xx, HTTP_429, HTTP_408), короткий base;
+      data      — немає рахунку/контрагента, довгий base (чекаємо оновлення довідників).
+    MANUAL_CODES і решта кодів не повторюються ніколи.
+    Після max_attempts рядок лишається з err_code і більше не береться.
+    drain_limit — скільки повторів максимум за прогін, щоб після аварії не завалити сервер.
+    """
+    max_attempts: int
+    transient_base_min: int
+    data_base_min: int
+    cap_min: int
+    drain_limit: int
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        s = load_settings()
+        return cls(
+            max_attempts=_env_int("ENOTE_RETRY_MAX_ATTEMPTS", max(s.max_retries, 1)),
+            transient_base_min=_env_int("ENOTE_RETRY_TRANSIENT_BASE_MIN", 5),
+            data_base_min=_env_int("ENOTE_RETRY_DATA_BASE_MIN", 60),
+            cap_min=_env_int("ENOTE_RETRY_CAP_MIN", 24 * 60),
+            drain_limit=_env_int("ENOTE_RETRY_DRAIN_LIMIT", 50),
+        )
+
+    def _delay_sql(self, base_min: int, alias: str) -> str:
+        p = f"{alias}." if alias else ""
+        return (f"LEAST({int(base_min)} * POW(2, GREATEST(COALESCE({p}try_count,1)-1, 0)), {int(self.cap_min)})")
+
+    def due_sql(self, alias: str = "") -> str:
+        """WHERE-фрагмент: рядок з помилкою, якому вже час на повтор (лише літерали, без параметрів)."""
+        p = f"{alias}." if alias else ""
+        transient_in = ", ".join(f"'{c}'" for c in TRANSIENT_CODES)
+        data_in = ", ".join(f"'{c}'" for c in DATA_CODES)
+        return f"""(
+            COALESCE({p}try_count,0) < {int(self.max_attempts)}
+            AND (
+              (({p}err_code IN ({transient_in}) OR {p}err_code REGEXP '^HTTP_5[0-9][0-9]$')
+                AND {p}ts_last_try <= NOW() - INTERVAL {self._delay_sql(self.transient_base_min, alias)} MINUTE)
+              OR ({p}err_code IN ({data_in})
+                AND {p}ts_last_try <= NOW() - INTERVAL {self._delay_sql(self.data_base_min, alias)} MINUTE)
+            )
+        )"""
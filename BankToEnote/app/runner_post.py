@@ -5,6 +5,7 @@ import logging
 from app.env_loader import load_settings
 from app.logging_setup import setup_logging
 from app import sql_repo as repo
+from app.resolver import Resolver
 from app.enote_client import create_cashcheck, post_cashcheck
 log = logging.getLogger("runner")
 
@@ -22,11 +23,12 @@ def run():
         log.info("No rows to post.")
         return
 
+    resolver = Resolver()
     ok, err = 0, 0
     for r in rows:
         pk = (r["NUM_DOC"], str(r["DATE_TIME_DAT_OD_TIM_P"]), r["AUT_CNTR_MFO"], r["TRANTYPE"])
         try:
-            acc_ref = repo.map_our_account_to_enote_ref(r.get("AUT_MY_ACC") or "")
+            acc_ref = resolver.account_by_clean(r.get("AUT_MY_ACC") or "")
             if not acc_ref:
                 repo.mark_error(pk, "account_not_found", f"AUT_MY_ACC={r.get('AUT_MY_ACC')}")
                 err += 1; continue
@@ -36,7 +38,7 @@ def run():
             iban_clean = (r.get("AUT_CNTR_ACC") or "").replace(" ","").replace("\t","").replace("\n","").upper() or None
             name_norm = _norm_name(r.get("AUT_CNTR_NAM"))
 
-            c_ref, c_err = repo.find_counterparty(edrpou_digits, iban_clean, name_norm)
+            c_ref, c_err = resolver.find_counterparty(edrpou_digits, iban_clean, name_norm)
             if c_err:
                 repo.mark_error(pk, c_err, f"EDRPOU={edrpou_digits}, IBAN={iban_clean}, NAME={name_norm}")
                 err += 1; continue
@@ -67,6 +69,7 @@ def run():
         except Exception as e:
             repo.mark_error(pk, "unexpected", str(e)); err += 1
 
+    resolver.log_stats()
     log.info("Done. OK=%s ERR=%s", ok, err)
 
 if __name__ == "__main__":
@@ -4,13 +4,35 @@ from __future__ import annotations
 from typing import Any
 import logging
 from app.db import get_conn
+from app.retry_policy import RetryPolicy
 log = logging.getLogger("sql_repo")
 
 def fetch_ready_rows(limit: int) -> list[dict]:
-    sql = "SELECT * FROM bnk_v_ready_to_post ORDER BY DATE_TIME_DAT_OD_TIM_P LIMIT %s"
+    """Рядки без помилки + помилкові, у яких минула пауза бекофу (див. retry_policy)."""
+    policy = RetryPolicy.from_env()
+    sql = """
+        SELECT * FROM bnk_v_ready_to_post
+        WHERE (err_code IS NULL OR err_code = '')
+        ORDER BY DATE_TIME_DAT_OD_TIM_P LIMIT %s
+    """
+    # через ту саму вьюху (TRANTYPE та інші її фільтри, той самий набір колонок);
+    # try_count/ts_last_try — з базової таблиці по ключу
+    sql_retry = f"""
+        SELECT v.* FROM bnk_v_ready_to_post v
+        JOIN bnk_trazact_prvt_ekv e
+          ON e.NUM_DOC = v.NUM_DOC AND e.DATE_TIME_DAT_OD_TIM_P = v.DATE_TIME_DAT_OD_TIM_P
+         AND e.AUT_CNTR_MFO = v.AUT_CNTR_MFO AND e.TRANTYPE = v.TRANTYPE
+        WHERE (e.enote_ref IS NULL OR e.enote_ref = '') AND {policy.due_sql("e")}
+        ORDER BY e.ts_last_try LIMIT %s
+    """
     with get_conn() as cn, cn.cursor(dictionary=True) as cur:
         cur.execute(sql, (limit,))
-        return cur.fetchall()
+        rows = cur.fetchall()
+        room = min(policy.drain_limit, limit - len(rows))
+        if room > 0:
+            cur.execute(sql_retry, (room,))
+            rows += cur.fetchall()
+        return rows
 
 def map_our_account_to_enote_ref(aut_my_acc: str) -> str | None:
     sql = """
@@ -0,0 +1,8 @@
+# BankToEnote/tests/conftest.py
+# Пакет app лежить у BankToEnote/ (запуск — з цієї теки), тож для тестів додаємо її в sys.path
+import sys
+from pathlib import Path
+
+_PROJECT = str(Path(__file__).resolve().parents[1])
+if _PROJECT not in sys.path:
+    sys.path.insert(0, _PROJECT)
@@ -0,0 +1,78 @@
+# BankToEnote/tests/test_resolver.py
+import pytest
+
+from app.resolver import Resolver, ci_key
+
+ACCOUNTS = [("UA123000000000000000000000001 ", "acc-1"), ("ua456000000000000000000000002", "acc-2"), (None, "x")]
+COUNTERPARTIES = [("1234567890  ", None, "cnt-inn"), (None, "ab12345", "cnt-edrpou"), ("", "", "empty")]
+NORM = [("n-1", "12345678", "UA11", None, "тов ромашка"),
+        ("n-2", None, "UA22", "UA22", None),
+        ("n-3", None, "UA33", None, "ТОВ ДУБЛЬ"),
+        ("n-4", None, None, "ua33", "тов дубль")]
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    def fetch(sql):
+        if "et_Catalog_ДенежныеСчета" in sql:
+            return ACCOUNTS
+        if "et_x_Catalog_Контрагенты" in sql:
+            return COUNTERPARTIES
+        if "bnk_v_counterparties_norm" in sql:
+            return NORM
+        raise AssertionError(sql)
+    monkeypatch.setattr(Resolver, "_fetch", staticmethod(fetch))
+    return Resolver()
+
+
+@pytest.mark.parametrize("a, b, equal", [
+    # `a = b` у *_ci PAD SPACE: регістр і пробіли в кінці не важать, на початку — важать
+    ("UA12", "ua12", True),
+    ("UA12", "UA12   ", True),
+    ("ua12 ", "Ua12", True),
+    ("UA12", " UA12", False),
+    ("UA12", "UA1", False),
+    ("UA12", "UA12\t", False),
+])
+def test_ci_key_matches_collation(a, b, equal):
+    assert (ci_key(a) == ci_key(b)) is equal
+
+
+@pytest.mark.parametrize("num, ref", [
+    ("UA123000000000000000000000001", "acc-1"),
+    ("ua123000000000000000000000001", "acc-1"),
+    ("UA456000000000000000000000002  ", "acc-2"),
+    (" UA456000000000000000000000002", None),
+    ("", None),
+    (None, None),
+])
+def test_account_by_number(resolver, num, ref):
+    assert resolver.account_by_number(num) == ref
+
+
+@pytest.mark.parametrize("tax, ref", [
+    ("1234567890", "cnt-inn"),
+    ("1234567890 ", "cnt-inn"),
+    ("AB12345", "cnt-edrpou"),
+    ("ab12345", "cnt-edrpou"),
+    ("0000000000", None),
+    ("", None),
+])
+def test_counterparty_by_tax(resolver, tax, ref):
+    assert resolver.counterparty_by_tax(tax) == ref
+
+
+def test_find_counterparty(resolver):
+    assert resolver.find_counterparty("12345678", None, None) == ("n-1", None)
+    # iban1 = iban2 в одному рядку — один збіг, не два
+    assert resolver.find_counterparty(None, "ua22", None) == ("n-2", None)
+    assert resolver.find_counterparty(None, "UA33", None) == (None, "ambiguous_counterparty")
+    assert resolver.find_counterparty(None, None, "ТОВ РОМАШКА ") == ("n-1", None)
+    assert resolver.find_counterparty(None, "UA99", "нема") == (None, "counterparty_not_found")
+
+
+def test_catalogs_loaded_once(resolver, monkeypatch):
+    resolver.account_by_number("x")
+    monkeypatch.setattr(Resolver, "_fetch", staticmethod(lambda sql: pytest.fail("reloaded")))
+    resolver.account_by_number("y")
+    assert resolver.stats["acc_miss"] == 2
@@ -0,0 +1,76 @@
+# BankToEnote/tests/test_retry_policy.py
+import re
+
+import pytest
+
+from app.retry_policy import DATA_CODES, MANUAL_CODES, TRANSIENT_CODES, RetryPolicy, classify
+
+POLICY = RetryPolicy(max_attempts=5, transient_base_min=5, data_base_min=60, cap_min=24 * 60, drain_limit=50)
+
+# SQL-функції з _delay_sql → Python, щоб перевірити саму криву затримок, а не лише текст
+_SQL_FUNCS = {
+    "LEAST": min,
+    "GREATEST": max,
+    "POW": pow,
+    "COALESCE": lambda *a: next((x for x in a if x is not None), None),
+}
+
+
+def delay_min(policy: RetryPolicy, base_min: int, try_count: int | None) -> int:
+    expr = policy._delay_sql(base_min, "e").replace("e.try_count", "try_count")
+    return eval(expr, {"__builtins__": {}}, {**_SQL_FUNCS, "try_count": try_count})
+
+
+@pytest.mark.parametrize("code", [*TRANSIENT_CODES, "HTTP_500", "HTTP_502", "HTTP_503", "HTTP_599"])
+def test_transient(code):
+    assert classify(code) == "transient"
+
+
+@pytest.mark.parametrize("code", DATA_CODES)
+def test_data(code):
+    assert classify(code) == "data"
+
+
+@pytest.mark.parametrize("code", MANUAL_CODES)
+def test_manual_codes_never_retried(code):
+    # документ міг створитись у Єноті — повтор дав би дубль
+    assert classify(code) == "permanent"
+
+
+@pytest.mark.parametrize("code", ["HTTP_400", "HTTP_403", "HTTP_404", "HTTP_5000", "HTTP_5", "SOMETHING"])
+def test_other_codes_permanent(code):
+    assert classify(code) == "permanent"
+
+
+@pytest.mark.parametrize("code", [None, ""])
+def test_no_error(code):
+    assert classify(code) == "none"
+
+
+def test_backoff_doubles_up_to_cap():
+    assert [delay_min(POLICY, 5, n) for n in (1, 2, 3, 4)] == [5, 10, 20, 40]
+    assert delay_min(POLICY, 60, 5) == 960
+    assert delay_min(POLICY, 60, 6) == 24 * 60
+    assert delay_min(POLICY, 60, 30) == 24 * 60
+
+
+def test_backoff_without_tries():
+    # try_count NULL/0 — перша затримка, не дробова
+    assert delay_min(POLICY, 5, None) == 5
+    assert delay_min(POLICY, 5, 0) == 5
+
+
+def test_due_sql_classes():
+    sql = POLICY.due_sql("e")
+    assert "COALESCE(e.try_count,0) < 5" in sql
+    assert "e.err_code REGEXP '^HTTP_5[0-9][0-9]$'" in sql
+    assert all(f"'{c}'" in sql for c in TRANSIENT_CODES + DATA_CODES)
+    assert not any(f"'{c}'" in sql for c in MANUAL_CODES)
+    assert POLICY._delay_sql(5, "e") in sql and POLICY._delay_sql(60, "e") in sql
+
+
+def test_due_sql_literals_only():
+    # фрагмент вставляється в запити з власними %s — своїх параметрів мати не може
+    sql = POLICY.due_sql()
+    assert "%s" not in sql
+    assert not re.search(r"\b\w+\.(try_count|err_code|ts_last_try)", sql)
@@ -8,12 +8,18 @@ UPSERT по Ref_Key з оновленням DataVersion, Description, ЕДРПО
 """
 
 import os
+import sys
 import json
-import time
-import requests
 import mysql.connector
+from pathlib import Path
 from dotenv import load_dotenv
 
+_REPO_ROOT = str(Path(__file__).resolve().parents[1])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from enote_odata import EnoteClient, EnoteConfig, Query
+
 # ---------------------------------------------------------
 # 1️⃣ Завантаження .env (Hetzner)
 # ---------------------------------------------------------
@@ -41,7 +47,6 @@ TABLE = "et_x_Catalog_Контрагенты"
 if not all([ODATA_URL_BASE, ODATA_USER, ODATA_PASSWORD]):
     raise RuntimeError("❌ Не задані ODATA_URL / ODATA_USER / ODATA_PASSWORD у .env")
 
-ODATA_URL = f"{ODATA_URL_BASE}Catalog_Контрагенты?$format=json"
 
 # ---------------------------------------------------------
 # 4️⃣ Підключення до БД
@@ -55,31 +60,22 @@ conn = mysql.connector.connect(
 cursor = conn.cursor()
 
 # ---------------------------------------------------------
-# 5️⃣ Допоміжна функція для пагінації OData
+# 5️⃣ Пагінація OData: keyset по Ref_Key (Ref_Key gt guid'...') замість $skip
 # ---------------------------------------------------------
-def fetch_all(session, base_url, auth, top=1000, delay=0.5):
-    results, skip = [], 0
-    while True:
-        url = f"{base_url}&$top={top}&$skip={skip}"
-        r = session.get(url, auth=auth)
-        r.raise_for_status()
-        batch = r.json().get("value", [])
-        if not batch:
-            break
+def fetch_all(client, top=1000):
+    results = []
+    for batch in client.iter_keyset(Query("Catalog_Контрагенты"), ("Ref_Key",), page_size=top):
         results.extend(batch)
-        skip += top
-        if delay:
-            time.sleep(delay)
     return results
 
 # ---------------------------------------------------------
 # 6️⃣ Основна логіка
 # ---------------------------------------------------------
-session = requests.Session()
 added_count = 0
 updated_count = 0
 
-entries = fetch_all(session, ODATA_URL, (ODATA_USER, ODATA_PASSWORD), top=1000, delay=0.0)
+with EnoteClient(EnoteConfig(base_url=ODATA_URL_BASE, user=ODATA_USER, password=ODATA_PASSWORD)) as client:
+    entries = fetch_all(client, top=1000)
 
 for entry in entries:
     sklad = {}
@@ -1,19 +1,32 @@
 #!/usr/bin/env python3
 # /root/Python/E-Note/et_x_InformationRegister_ЦеныНоменклатуры_RecordType.py
+#
+# Зведення цін: et_InformationRegister_ЦеныНоменклатуры_RecordType + Номенклатура + ЕдиницыИзмерения
+# → et+_InformationRegister_ЦеныНоменклатуры_RecordType. Усе рахує MySQL:
+#   1) довідник коефіцієнтів et+_НоменклатураЕдиницы (пара номенклатура+одиниця → базова?,
+#      коефіцієнт, назви) — оновлюються лише пари з нових цін і зі змінених довідників;
+#   2) один INSERT ... SELECT ... ON DUPLICATE KEY UPDATE по реєстраторах, де щось змінилось.
+# Межі змін — watermark по updated_at джерел (etl_watermarks), а не MAX(Period) - DAYS_BACK.
 import os
 import sys
-import time
-import subprocess
-import mysql.connector
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 from pathlib import Path
+
+import mysql.connector
 from dotenv import load_dotenv
 
+_REPO_ROOT = str(Path(__file__).resolve().parents[1])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from enote_etl import run_script
+from enote_etl.db import ensure_index, odku_if_changed
+from enote_etl.watermarks import ensure_watermarks, get_watermark, set_watermark, source_mark
+
 # ===== Налаштування =====
-RUN_SOURCES = True   # ← запускати оновлення джерел перед агрегацією
-BATCH_SIZE  = 1000   # вставка/апдейт за раз
-DAYS_BACK   = 14     # відмотка від MAX(Period) цільової
-SLEEP_SEC   = 0.0    # пауза між батчами
+RUN_SOURCES = True   # ← оновити джерела (у цьому ж процесі) перед агрегацією
+FULL_REFRESH = os.getenv("LOAD_MODE", "incremental").strip().lower() == "full"  # ігнорувати watermark
+OVERLAP_SECONDS = int(os.getenv("WATERMARK_OVERLAP_SECONDS", "120"))
 
 BASE_DIR = Path(__file__).resolve().parent
 load_dotenv(BASE_DIR / ".env")
@@ -33,59 +46,96 @@ SRC_SCRIPTS = [
     "et_InformationRegister_ЦеныНоменклатуры_RecordType.py",
 ]
 
-def sh(script_path: Path) -> None:
-    """Запустити підскрипт тим самим інтерпретатором, з .env у цій папці."""
-    print(f"[RUN] {script_path.name} …")
-    proc = subprocess.run(
-        [sys.executable, str(script_path)],
-        cwd=str(BASE_DIR),
-        env={**os.environ},          # .env вже підхоплений load_dotenv
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-    if proc.returncode != 0:
-        # Показуємо хвіст помилки для діагностики
-        print(proc.stdout)
-        print(proc.stderr)
-        raise RuntimeError(f"FAIL: {script_path.name} (rc={proc.returncode})")
-    # Короткий релевантний хвіст stdout
-    tail = "\n".join(proc.stdout.strip().splitlines()[-10:])
-    if tail:
-        print(tail)
-    print(f"[OK ] {script_path.name}")
+TARGET = "et+_InformationRegister_ЦеныНоменклатуры_RecordType"
+LOOKUP = "et+_НоменклатураЕдиницы"
+PRICES = "et_InformationRegister_ЦеныНоменклатуры_RecordType"
+NOMENCLATURE = "et_Catalog_Номенклатура"
+UNITS = "et_Catalog_ЕдиницыИзмерения"
+
+# Колонки цілі, що можуть змінитись (Recorder + LineNumber — ключ)
+TARGET_VALUES = (
+    "Period", "Recorder_Type", "Active", "ТипЦен_Key", "Номенклатура_Key", "ЕдиницаИзмерения_Key",
+    "Валюта_Key", "Цена", "Is_БазоваяЕдиница", "Коэффициент", "Одиниця", "БазОДНазва",
+)
+LOOKUP_VALUES = ("Is_БазоваяЕдиница", "Коэффициент", "Одиниця", "БазОДНазва")
+
 
 def get_conn():
     return mysql.connector.connect(**DB_CONFIG)
 
-def clamp_future(dt: datetime) -> datetime:
-    now = datetime.now(timezone.utc)
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    return dt if dt <= now else now
-
-def get_cutoff(conn_w):
-    """Визначити старт по MAX(Period) у цілій (з клемпом майбутнього) і відмоткою."""
-    cur = conn_w.cursor()
-    cur.execute("SELECT MAX(Period) FROM `et+_InformationRegister_ЦеныНоменклатуры_RecordType`")
-    row = cur.fetchone()
+
+def ensure_lookup(conn):
+    cur = conn.cursor()
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{LOOKUP}` (
+            `Номенклатура_Key` CHAR(36) NOT NULL,
+            `ЕдиницаИзмерения_Key` CHAR(36) NOT NULL,
+            `Is_БазоваяЕдиница` TINYINT(1) NOT NULL DEFAULT 0,
+            `Коэффициент` DECIMAL(18,6) NULL,
+            `Одиниця` VARCHAR(150) NULL,
+            `БазОДНазва` VARCHAR(150) NULL,
+            `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (`Номенклатура_Key`, `ЕдиницаИзмерения_Key`),
+            KEY `ix_updated_at` (`updated_at`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
     cur.close()
-    last = row[0] if row and row[0] else datetime(2024, 1, 1, tzinfo=timezone.utc)
-    if last.tzinfo is None:
-        last = last.replace(tzinfo=timezone.utc)
-    last = clamp_future(last)
-    start = last - timedelta(days=DAYS_BACK)
-    return start, last
 
-def aggregate():
-    """Зведення з трьох таблиць-джерел у цільову."""
-    conn_r = get_conn()  # SELECT
-    conn_w = get_conn()  # INSERT/UPDATE
 
-    start_from, last_in_target = get_cutoff(conn_w)
-    print(f"[INFO] Цільова MAX(Period): {last_in_target}; стартуємо з: {start_from}")
+def refresh_lookup(cur, prices_since, nomenclature_since, units_since):
+    """
+    Пари (номенклатура, одиниця) з нових/змінених цін + уже відомі пари, чия номенклатура,
+    одиниця або базова одиниця змінились. ЕдиницыИзмерения тут джойниться один раз на пару,
+    а не двічі на кожен рядок цін.
+    """
+    cur.execute(f"""
+        INSERT INTO `{LOOKUP}` (Номенклатура_Key, ЕдиницаИзмерения_Key, {", ".join(LOOKUP_VALUES)})
+        SELECT
+            k.nk, k.uk,
+            CASE WHEN k.uk = n.ЕдиницаХраненияОстатков_Key THEN 1 ELSE 0 END,
+            eu.Коэффициент,
+            eu.Description,
+            eu_base.Description
+        FROM (
+            SELECT DISTINCT Номенклатура_Key AS nk, ЕдиницаИзмерения_Key AS uk
+            FROM {PRICES}
+            WHERE updated_at >= %s AND Номенклатура_Key IS NOT NULL AND ЕдиницаИзмерения_Key IS NOT NULL
+            UNION
+            SELECT l.Номенклатура_Key, l.ЕдиницаИзмерения_Key
+            FROM `{LOOKUP}` l JOIN {NOMENCLATURE} n ON n.Ref_Key = l.Номенклатура_Key
+            WHERE n.updated_at >= %s
+            UNION
+            SELECT l.Номенклатура_Key, l.ЕдиницаИзмерения_Key
+            FROM `{LOOKUP}` l JOIN {UNITS} eu ON eu.Ref_Key = l.ЕдиницаИзмерения_Key
+            WHERE eu.updated_at >= %s
+            UNION
+            SELECT l.Номенклатура_Key, l.ЕдиницаИзмерения_Key
+            FROM `{LOOKUP}` l
+            JOIN {NOMENCLATURE} n ON n.Ref_Key = l.Номенклатура_Key
+            JOIN {UNITS} eu_base ON eu_base.Ref_Key = n.ЕдиницаХраненияОстатков_Key
+            WHERE eu_base.updated_at >= %s
+        ) k
+        LEFT JOIN {NOMENCLATURE} n ON n.Ref_Key = k.nk
+        LEFT JOIN {UNITS} eu ON eu.Ref_Key = k.uk
+        LEFT JOIN {UNITS} eu_base ON eu_base.Ref_Key = n.ЕдиницаХраненияОстатков_Key
+        ON DUPLICATE KEY UPDATE
+            {odku_if_changed(LOOKUP, LOOKUP_VALUES)}
+    """, (prices_since, nomenclature_since, units_since, units_since))
+    return cur.rowcount
+
 
-    select_sql = """
+def aggregate_prices(cur, prices_since, lookup_since):
+    """
+    Один INSERT ... SELECT у ціль, обмежений реєстраторами, де змінились ціни
+    або коефіцієнти одиниць їхніх рядків (зміни довідника в lookup — з lookup_since).
+    """
+    cur.execute(f"""
+        INSERT INTO `{TARGET}` (
+            Period, Recorder, Recorder_Type, LineNumber, Active,
+            ТипЦен_Key, Номенклатура_Key, ЕдиницаИзмерения_Key, Валюта_Key, Цена,
+            Is_БазоваяЕдиница, Коэффициент, Одиниця, БазОДНазва,
+            created_at, updated_at
+        )
         SELECT
             p.Period,
             p.Recorder,
@@ -97,96 +147,79 @@ def aggregate():
             p.ЕдиницаИзмерения_Key,
             p.Валюта_Key,
             p.Цена,
-            CASE WHEN p.ЕдиницаИзмерения_Key = n.ЕдиницаХраненияОстатков_Key THEN 1 ELSE 0 END AS Is_БазоваяЕдиница,
-            eu.Коэффициент AS Коэффициент,
-            eu.Description AS Одиниця,
-            eu_base.Description AS БазОДНазва
-        FROM et_InformationRegister_ЦеныНоменклатуры_RecordType p
-        LEFT JOIN et_Catalog_Номенклатура n
-               ON p.Номенклатура_Key = n.Ref_Key
-        LEFT JOIN et_Catalog_ЕдиницыИзмерения eu
-               ON p.ЕдиницаИзмерения_Key = eu.Ref_Key
-        LEFT JOIN et_Catalog_ЕдиницыИзмерения eu_base
-               ON n.ЕдиницаХраненияОстатков_Key = eu_base.Ref_Key
-        WHERE p.Period >= %s
-        ORDER BY p.Period
-    """
-
-    insert_sql = """
-        INSERT INTO `et+_InformationRegister_ЦеныНоменклатуры_RecordType` (
-            Period, Recorder, Recorder_Type, LineNumber, Active,
-            ТипЦен_Key, Номенклатура_Key, ЕдиницаИзмерения_Key, Валюта_Key, Цена,
-            Is_БазоваяЕдиница, Коэффициент, Одиниця, БазОДНазва,
-            created_at, updated_at
-        ) VALUES (
-            %(Period)s, %(Recorder)s, %(Recorder_Type)s, %(LineNumber)s, %(Active)s,
-            %(ТипЦен_Key)s, %(Номенклатура_Key)s, %(ЕдиницаИзмерения_Key)s, %(Валюта_Key)s, %(Цена)s,
-            %(Is_БазоваяЕдиница)s, %(Коэффициент)s, %(Одиниця)s, %(БазОДНазва)s,
+            COALESCE(l.Is_БазоваяЕдиница, 0),
+            l.Коэффициент,
+            l.Одиниця,
+            l.БазОДНазва,
             NOW(), NOW()
-        )
+        FROM (
+            SELECT Recorder FROM {PRICES} WHERE updated_at >= %s
+            UNION
+            SELECT p2.Recorder
+            FROM `{LOOKUP}` l2
+            JOIN {PRICES} p2 ON p2.Номенклатура_Key = l2.Номенклатура_Key
+                            AND p2.ЕдиницаИзмерения_Key = l2.ЕдиницаИзмерения_Key
+            WHERE l2.updated_at >= %s
+        ) r
+        JOIN {PRICES} p ON p.Recorder = r.Recorder
+        LEFT JOIN `{LOOKUP}` l ON l.Номенклатура_Key = p.Номенклатура_Key
+                              AND l.ЕдиницаИзмерения_Key = p.ЕдиницаИзмерения_Key
         ON DUPLICATE KEY UPDATE
-            Recorder = VALUES(Recorder),
-            Recorder_Type = VALUES(Recorder_Type),
-            LineNumber = VALUES(LineNumber),
-            Active = VALUES(Active),
-            ТипЦен_Key = VALUES(ТипЦен_Key),
-            Номенклатура_Key = VALUES(Номенклатура_Key),
-            ЕдиницаИзмерения_Key = VALUES(ЕдиницаИзмерения_Key),
-            Валюта_Key = VALUES(Валюта_Key),
-            Цена = VALUES(Цена),
-            Is_БазоваяЕдиница = VALUES(Is_БазоваяЕдиница),
-            Коэффициент = VALUES(Коэффициент),
-            Одиниця = VALUES(Одиниця),
-            БазОДНазва = VALUES(БазОДНазва),
-            updated_at = NOW()
-    """
+            {odku_if_changed(TARGET, TARGET_VALUES)}
+    """, (prices_since, lookup_since))
+    return cur.rowcount
+
+
+def aggregate():
+    """Зведення з трьох таблиць-джерел у цільову — двома запитами на боці MySQL."""
+    conn = get_conn()
+    try:
+        ensure_watermarks(conn)
+        ensure_lookup(conn)
+        ensure_index(conn, PRICES, "updated_at")
+        ensure_index(conn, PRICES, "Номенклатура_Key", "ЕдиницаИзмерения_Key")
+        conn.commit()
+
+        # межі — до запису: зміни джерел, що прийдуть пізніше, потраплять у наступний запуск
+        since, marks = {}, {}
+        for src in (PRICES, NOMENCLATURE, UNITS):
+            mark = None if FULL_REFRESH else get_watermark(conn, TARGET, src)
+            since[src] = mark - timedelta(seconds=OVERLAP_SECONDS) if mark else datetime(1970, 1, 1)
+            marks[src] = source_mark(conn, src)
+            print(f"[INFO] {src}: updated_at >= {since[src]} (watermark={mark}, new={marks[src]})")
+
+        cur = conn.cursor()
+        cur.execute("SELECT NOW()")
+        (run_started,) = cur.fetchone()
+
+        cur.execute("START TRANSACTION")
+        try:
+            pairs = refresh_lookup(cur, since[PRICES], since[NOMENCLATURE], since[UNITS])
+            print(f"[INFO] {LOOKUP}: affected={pairs}")
+            # усі змінені в lookup пари мають updated_at >= run_started; на повному прогоні — усі
+            lookup_since = datetime(1970, 1, 1) if FULL_REFRESH else run_started
+            affected = aggregate_prices(cur, since[PRICES], lookup_since)
+            for src, mark in marks.items():
+                if mark:
+                    set_watermark(conn, TARGET, src, mark)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+        print(f"[OK] Готово. {TARGET}: affected={affected}")
+    finally:
+        conn.close()
 
-    cur_r = conn_r.cursor(dictionary=True, buffered=False)
-    cur_r.execute(select_sql, (start_from,))
-    cur_w = conn_w.cursor()
-
-    total = 0
-    while True:
-        rows = cur_r.fetchmany(BATCH_SIZE)
-        if not rows:
-            break
-
-        params = [{
-            "Period": r["Period"],
-            "Recorder": r["Recorder"],
-            "Recorder_Type": r["Recorder_Type"],
-            "LineNumber": r["LineNumber"],
-            "Active": r["Active"],
-            "ТипЦен_Key": r["ТипЦен_Key"],
-            "Номенклатура_Key": r["Номенклатура_Key"],
-            "ЕдиницаИзмерения_Key": r["ЕдиницаИзмерения_Key"],
-            "Валюта_Key": r["Валюта_Key"],
-            "Цена": r["Цена"],
-            "Is_БазоваяЕдиница": r["Is_БазоваяЕдиница"],
-            "Коэффициент": r["Коэффициент"],
-            "Одиниця": r["Одиниця"],
-            "БазОДНазва": r["БазОДНазва"],
-        } for r in rows]
-
-        cur_w.executemany(insert_sql, params)
-        conn_w.commit()
-
-        total += len(rows)
-        print(f"[INFO] Оброблено {total} записів...")
-        if SLEEP_SEC:
-            time.sleep(SLEEP_SEC)
-
-    cur_r.close()
-    cur_w.close()
-    conn_r.close()
-    conn_w.close()
-    print(f"[OK] Готово. Всього оброблено: {total}")
 
 def main():
     # 0) (необов'язково) оновити джерела
     if RUN_SOURCES:
         for fname in SRC_SCRIPTS:
-            sh(BASE_DIR / fname)
+            print(f"[RUN] {fname} …")
+            run_script(BASE_DIR / fname)
+            print(f"[OK ] {fname}")
 
     # 1) агрегація
     aggregate()
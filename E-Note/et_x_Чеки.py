@@ -4,29 +4,46 @@
 """
 Union ETL: et_Document_ДенежныйЧек + et_Document_РозничныйЧек -> et_x_Чеки
 
-- Вікно інкремента: [max(Date) у цілі - DAYS_BACK; now()], якщо таблиця порожня — з DEFAULT_START.
-- RUN_CHILD_UPDATES=true: перед union виконує et_Document_ДенежныйЧек.py та et_Document_РозничныйЧек.py з цієї ж папки.
-- LOAD_MODE: rewrite_range | upsert
+- Інкремент за watermark: у union ідуть лише рядки джерел з updated_at після останнього
+  обробленого (окремо для кожного джерела, таблиця etl_watermarks) — O(змін), а не O(вікна).
+- Union рахує сам MySQL: один INSERT ... SELECT ... UNION ALL ... ON DUPLICATE KEY UPDATE,
+  без вивантаження рядків у Python.
+- RUN_CHILD_UPDATES=true: перед union виконує завантажувачі et_Document_ДенежныйЧек та
+  et_Document_РозничныйЧек з цієї ж папки — у цьому ж процесі.
+- LOAD_MODE: incremental | full (full — ігнорує watermark і перераховує всі рядки джерел)
 - DataVersion: оновлення лише якщо змінилась.
+- Видалені в джерелах чеки прибираються anti-join'ом у вікні, яке джерела переписали з
+  останнього успішного union (window_start їхніх прогонів у журналі etl_runs); раз на
+  DEEP_EVERY_HOURS (або ETL_DEEP=1) — глибоке вікно [max(Date) - DAYS_BACK; ...].
 """
 
 import os
 import sys
 import time
 import datetime as dt
-import subprocess
 
 import pymysql
+from pathlib import Path
 from dotenv import load_dotenv
 
+_REPO_ROOT = str(Path(__file__).resolve().parents[1])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from enote_etl import run_script
+from enote_etl.db import ensure_index, odku_if_changed
+from enote_etl.runs import begin_run, changed_since, ensure_runs, fail_run, finish_run, last_success, plan_window
+from enote_etl.watermarks import ensure_watermarks, get_watermark, set_watermark, source_mark
+
 # ------------------ CONFIG ------------------
 DEFAULT_START = dt.datetime(2024, 7, 1, 0, 0, 0)
 
 load_dotenv()
 DAYS_BACK = int(os.getenv("DAYS_BACK", "15"))
-LOAD_MODE = os.getenv("LOAD_MODE", "rewrite_range").strip().lower()  # rewrite_range | upsert
-BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))
-SLEEP_SECONDS = float(os.getenv("SLEEP_SECONDS", "0.0"))
+DEEP_EVERY_HOURS = int(os.getenv("DEEP_EVERY_HOURS", "168"))
+LOAD_MODE = os.getenv("LOAD_MODE", "incremental").strip().lower()  # incremental | full
+# перекриття watermark: рядки, записані в ту ж секунду, що й MAX(updated_at), не губляться
+OVERLAP_SECONDS = int(os.getenv("WATERMARK_OVERLAP_SECONDS", "120"))
 RUN_CHILD_UPDATES = os.getenv("RUN_CHILD_UPDATES", "true").strip().lower() == "true"
 
 TARGET_TABLE = "et_x_Чеки"
@@ -42,6 +59,47 @@ DB_DATABASE = os.getenv("DB_DATABASE") or os.getenv("DB_DATABASE_Serv")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+COLUMNS = (
+    "Ref_Key", "DataVersion", "DeletionMark", "Number", "Date", "Posted",
+    "ВидДвижения", "ДенежныйСчет", "ДенежныйСчетБезнал_Key", "НаправлениеДвижения",
+    "Организация_Key", "Ответственный_Key", "Подразделение_Key",
+    "Сумма", "СуммаБезнал", "ФискальныйНомерЧека", "Джерело",
+)
+
+# Джерело → SELECT у колонки COLUMNS (той самий мапінг, що раніше робився в Python);
+# назви колонок union бере з першого SELECT, тому аліаси — рівно як у COLUMNS
+SOURCES = {
+    SRC_CASH: """
+        SELECT
+            Ref_Key, DataVersion, DeletionMark, Number, Date, Posted,
+            ВидДвижения,
+            ДенежныйСчет,
+            ДенежныйСчетБезнал_Key,
+            НаправлениеДвижения,
+            Организация_Key, Ответственный_Key, Подразделение_Key,
+            Сумма, СуммаБезнал,
+            ФискальныйНомерЧека,
+            'ДенежныйЧек' AS Джерело
+        FROM et_Document_ДенежныйЧек
+        WHERE updated_at >= %s
+    """,
+    SRC_RETAIL: """
+        SELECT
+            Ref_Key, DataVersion, DeletionMark, Number, Date, Posted,
+            'Роздріб' AS ВидДвижения,
+            ДенежныйСчет_Key AS ДенежныйСчет,
+            ДенежныйСчетБезнал_Key,
+            CASE ВидОперации WHEN 'Продажа' THEN 'Приход' WHEN 'Возврат' THEN 'Расход'
+                 ELSE ВидОперации END AS НаправлениеДвижения,
+            Организация_Key, Ответственный_Key, Подразделение_Key,
+            СуммаОплатыНал AS Сумма, СуммаОплатыБезнал AS СуммаБезнал,
+            ФискальныйНомерЧека,
+            'РозничныйЧек' AS Джерело
+        FROM et_Document_РозничныйЧек
+        WHERE updated_at >= %s
+    """,
+}
+
 def db():
     return pymysql.connect(
         host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASSWORD,
@@ -55,9 +113,10 @@ def run_child(script_name: str) -> bool:
         print(f"[WARN] Child script not found: {script_name}")
         return True
     print(f"[INFO] Running child: {script_name}")
-    proc = subprocess.run([sys.executable, path], cwd=BASE_DIR)
-    if proc.returncode != 0:
-        print(f"[ERROR] Child failed: {script_name} (exit={proc.returncode})")
+    try:
+        run_script(path)
+    except Exception as e:
+        print(f"[ERROR] Child failed: {script_name} ({e!r})")
         return False
     return True
 
@@ -67,165 +126,37 @@ def get_target_max_date(conn):
         row = cur.fetchone()
         return row["mx"]
 
-def get_window():
-    conn = db()
-    try:
-        mx = get_target_max_date(conn)
-    finally:
-        conn.close()
-    if not mx:
-        start = DEFAULT_START
-    else:
-        start = mx - dt.timedelta(days=DAYS_BACK)
-    end = dt.datetime.now()
-    print(f"[INFO] Window: {start} .. {end}")
-    return start, end
-
-def paged_fetch(conn, sql, params, batch_size=BATCH_SIZE, sleep=SLEEP_SECONDS):
-    off = 0
-    total = 0
-    while True:
-        with conn.cursor() as cur:
-            cur.execute(sql, (*params, batch_size, off))
-            rows = cur.fetchall()
-        if not rows:
-            break
-        yield rows
-        cnt = len(rows)
-        total += cnt
-        off += batch_size
-        if sleep:
-            time.sleep(sleep)
-    # print total outside if needed
-
-def fetch_cash(conn, start, end):
-    sql = f"""
-        SELECT
-            Ref_Key, DataVersion, DeletionMark, Number, Date, Posted,
-            ВидДвижения,
-            ДенежныйСчет,
-            ДенежныйСчетБезнал_Key,
-            НаправлениеДвижения,
-            Организация_Key, Ответственный_Key, Подразделение_Key,
-            Сумма, СуммаБезнал,
-            ФискальныйНомерЧека
-        FROM {SRC_CASH}
-        WHERE Date >= %s AND Date <= %s
-        ORDER BY Date, Ref_Key
-        LIMIT %s OFFSET %s
-    """
-    res = []
-    total = 0
-    for chunk in paged_fetch(conn, sql, (start, end)):
-        for r in chunk:
-            r["Джерело"] = "ДенежныйЧек"
-        res.extend(chunk)
-        total += len(chunk)
-    print(f"[INFO] Cash fetched: {total}")
-    return res
-
-def map_vid_oper_to_napr(v):
-    if v == "Продажа":
-        return "Приход"
-    if v == "Возврат":
-        return "Расход"
-    return v  # інші значення — залишаємо як є
-
-def fetch_retail(conn, start, end):
-    sql = f"""
-        SELECT
-            Ref_Key, DataVersion, DeletionMark, Number, Date, Posted,
-            ДенежныйСчет_Key,
-            ДенежныйСчетБезнал_Key,
-            ВидОперации,
-            Организация_Key, Ответственный_Key, Подразделение_Key,
-            СуммаОплатыНал, СуммаОплатыБезнал,
-            ФискальныйНомерЧека
-        FROM {SRC_RETAIL}
-        WHERE Date >= %s AND Date <= %s
-        ORDER BY Date, Ref_Key
-        LIMIT %s OFFSET %s
-    """
-    res = []
-    total = 0
-    for chunk in paged_fetch(conn, sql, (start, end)):
-        mapped = []
-        for r in chunk:
-            mapped.append({
-                "Ref_Key": r["Ref_Key"],
-                "DataVersion": r["DataVersion"],
-                "DeletionMark": r["DeletionMark"],
-                "Number": r["Number"],
-                "Date": r["Date"],
-                "Posted": r["Posted"],
-                "ВидДвижения": "Роздріб",
-                "ДенежныйСчет": r["ДенежныйСчет_Key"],
-                "ДенежныйСчетБезнал_Key": r["ДенежныйСчетБезнал_Key"],
-                "НаправлениеДвижения": map_vid_oper_to_napr(r["ВидОперации"]),
-                "Организация_Key": r["Организация_Key"],
-                "Ответственный_Key": r["Ответственный_Key"],
-                "Подразделение_Key": r["Подразделение_Key"],
-                "Сумма": r["СуммаОплатыНал"],
-                "СуммаБезнал": r["СуммаОплатыБезнал"],
-                "ФискальныйНомерЧека": r["ФискальныйНомерЧека"],
-                "Джерело": "РозничныйЧек",
-            })
-        res.extend(mapped)
-        total += len(mapped)
-    print(f"[INFO] Retail fetched: {total}")
-    return res
-
-def delete_range(conn, start, end):
-    with conn.cursor() as cur:
-        cur.execute(f"DELETE FROM {TARGET_TABLE} WHERE `Date` >= %s AND `Date` <= %s", (start, end))
-        print(f"[INFO] Deleted in window: {cur.rowcount}")
-
-def bulk_upsert(conn, rows):
+def union_sql(sources):
     """
-    ON DUPLICATE KEY UPDATE: оновлюємо бізнес-поля лише коли змінилась DataVersion.
-    updated_at змінюємо тільки при зміні DataVersion.
+    INSERT ... SELECT з похідної таблиці над UNION ALL (ON DUPLICATE KEY UPDATE не дозволяє
+    посилатись на колонки UNION напряму). Бізнес-поля та updated_at змінюються лише при зміні
+    DataVersion (odku_if_changed з version).
     """
-    if not rows:
-        return 0
-    sql = f"""
-        INSERT INTO {TARGET_TABLE} (
-          Ref_Key,DataVersion,DeletionMark,Number,Date,Posted,
-          ВидДвижения,ДенежныйСчет,ДенежныйСчетБезнал_Key,НаправлениеДвижения,
-          Организация_Key,Ответственный_Key,Подразделение_Key,
-          Сумма,СуммаБезнал,ФискальныйНомерЧека,
-          Джерело,created_at,updated_at
-        ) VALUES (
-          %(Ref_Key)s,%(DataVersion)s,%(DeletionMark)s,%(Number)s,%(Date)s,%(Posted)s,
-          %(ВидДвижения)s,%(ДенежныйСчет)s,%(ДенежныйСчетБезнал_Key)s,%(НаправлениеДвижения)s,
-          %(Организация_Key)s,%(Ответственный_Key)s,%(Подразделение_Key)s,
-          %(Сумма)s,%(СуммаБезнал)s,%(ФискальныйНомерЧека)s,
-          %(Джерело)s,NOW(),NOW()
-        )
+    cols = ", ".join(COLUMNS)
+    union = "\n        UNION ALL\n".join(SOURCES[s] for s in sources)
+    sets = odku_if_changed(TARGET_TABLE, [c for c in COLUMNS if c != "Ref_Key"], version="DataVersion")
+    return f"""
+        INSERT INTO {TARGET_TABLE} ({cols}, created_at, updated_at)
+        SELECT {cols}, NOW(), NOW() FROM (
+        {union}
+        ) AS u
         ON DUPLICATE KEY UPDATE
-          DataVersion = IF(VALUES(DataVersion)<>DataVersion, VALUES(DataVersion), DataVersion),
-          DeletionMark = IF(VALUES(DataVersion)<>DataVersion, VALUES(DeletionMark), DeletionMark),
-          Number = IF(VALUES(DataVersion)<>DataVersion, VALUES(Number), Number),
-          Date = IF(VALUES(DataVersion)<>DataVersion, VALUES(Date), Date),
-          Posted = IF(VALUES(DataVersion)<>DataVersion, VALUES(Posted), Posted),
-          ВидДвижения = IF(VALUES(DataVersion)<>DataVersion, VALUES(ВидДвижения), ВидДвижения),
-          ДенежныйСчет = IF(VALUES(DataVersion)<>DataVersion, VALUES(ДенежныйСчет), ДенежныйСчет),
-          ДенежныйСчетБезнал_Key = IF(VALUES(DataVersion)<>DataVersion, VALUES(ДенежныйСчетБезнал_Key), ДенежныйСчетБезнал_Key),
-          НаправлениеДвижения = IF(VALUES(DataVersion)<>DataVersion, VALUES(НаправлениеДвижения), НаправлениеДвижения),
-          Организация_Key = IF(VALUES(DataVersion)<>DataVersion, VALUES(Организация_Key), Организация_Key),
-          Ответственный_Key = IF(VALUES(DataVersion)<>DataVersion, VALUES(Ответственный_Key), Ответственный_Key),
-          Подразделение_Key = IF(VALUES(DataVersion)<>DataVersion, VALUES(Подразделение_Key), Подразделение_Key),
-          Сумма = IF(VALUES(DataVersion)<>DataVersion, VALUES(Сумма), Сумма),
-          СуммаБезнал = IF(VALUES(DataVersion)<>DataVersion, VALUES(СуммаБезнал), СуммаБезнал),
-          ФискальныйНомерЧека = IF(VALUES(DataVersion)<>DataVersion, VALUES(ФискальныйНомерЧека), ФискальныйНомерЧека),
-          Джерело = IF(VALUES(DataVersion)<>DataVersion, VALUES(Джерело), Джерело),
-          updated_at = IF(VALUES(DataVersion)<>DataVersion, NOW(), updated_at)
+          {sets}
     """
+
+def delete_missing(conn, start):
+    """Чеки вікна, яких уже немає в жодному джерелі (видалені/перезалиті в Єноті)."""
     with conn.cursor() as cur:
-        cur.executemany(sql, rows)
+        cur.execute(f"""
+            DELETE t FROM {TARGET_TABLE} t
+            LEFT JOIN {SRC_CASH} c ON c.Ref_Key = t.Ref_Key
+            LEFT JOIN {SRC_RETAIL} r ON r.Ref_Key = t.Ref_Key
+            WHERE t.Date >= %s AND c.Ref_Key IS NULL AND r.Ref_Key IS NULL
+        """, (start,))
         return cur.rowcount
 
 def run():
-    print(f"[START] Union ETL -> {TARGET_TABLE}")
+    print(f"[START] Union ETL -> {TARGET_TABLE} | mode={LOAD_MODE}")
     if RUN_CHILD_UPDATES:
         ok1 = run_child("et_Document_ДенежныйЧек.py")
         ok2 = run_child("et_Document_РозничныйЧек.py")
@@ -233,25 +164,54 @@ def run():
             print("[ERROR] Child updates failed — aborting union.")
             sys.exit(1)
 
-    start, end = get_window()
     conn = db()
-
+    t0 = time.monotonic()
     try:
-        cash = fetch_cash(conn, start, end)
-        retail = fetch_retail(conn, start, end)
-        all_rows = cash + retail
-        print(f"[INFO] Total rows to load: {len(all_rows)}")
-
-        conn.begin()
-        if LOAD_MODE == "rewrite_range":
-            delete_range(conn, start, end)
-            affected = bulk_upsert(conn, all_rows)  # перезапишемо "чисто" вікно
-            conn.commit()
-            print(f"[DONE] rewrite_range: affected={affected}")
+        ensure_watermarks(conn)
+        ensure_runs(conn)
+        # інкремент по updated_at дешевий лише з індексом
+        for src in SOURCES:
+            ensure_index(conn, src, "updated_at")
+        conn.commit()
+
+        # межі беремо до INSERT: що запишеться в джерела пізніше — потрапить у наступний запуск
+        since, marks = [], {}
+        for src in SOURCES:
+            mark = None if LOAD_MODE == "full" else get_watermark(conn, TARGET_TABLE, src)
+            since.append(mark - dt.timedelta(seconds=OVERLAP_SECONDS) if mark else dt.datetime(1970, 1, 1))
+            marks[src] = source_mark(conn, src)
+            print(f"[INFO] {src}: updated_at >= {since[-1]} (watermark={mark}, new={marks[src]})")
+
+        # вікно видалень: deep — старе MAX(Date) - DAYS_BACK; delta — лише те, що джерела
+        # переписали (rewrite_range) після старту попереднього успішного union
+        mx = get_target_max_date(conn)
+        deep_start = (mx - dt.timedelta(days=DAYS_BACK)) if mx else DEFAULT_START
+        win = plan_window(conn, TARGET_TABLE, deep_start, dt.timedelta(0), dt.timedelta(hours=DEEP_EVERY_HOURS))
+        if LOAD_MODE == "full" or win.mode == "deep":
+            mode, window_start = "deep", deep_start
         else:
-            affected = bulk_upsert(conn, all_rows)
+            mode = "delta"
+            window_start = changed_since(conn, tuple(SOURCES), last_success(conn, TARGET_TABLE).started_at)
+        run_id = begin_run(conn, TARGET_TABLE, mode, window_start)
+
+        try:
+            conn.begin()
+            with conn.cursor() as cur:
+                cur.execute(union_sql(SOURCES), since)
+                affected = cur.rowcount
+            deleted = delete_missing(conn, window_start) if window_start else 0
+            for src, mark in marks.items():
+                if mark:
+                    set_watermark(conn, TARGET_TABLE, src, mark)
+            high = max((m for m in marks.values() if m), default=None)
+            finish_run(conn, run_id, 0, affected + deleted, high, time.monotonic() - t0)
             conn.commit()
-            print(f"[DONE] upsert: affected={affected}")
+        except Exception as e:
+            conn.rollback()
+            fail_run(conn, run_id, e, time.monotonic() - t0)
+            raise
+        print(f"[DONE] union: affected={affected} deleted={deleted} "
+              f"({mode}, window from {window_start or '— (sources unchanged)'})")
 
     except Exception as e:
         conn.rollback()
@@ -495,7 +495,7 @@ async def list_owner_patients(message: Message):
     finally:
         conn.close()
 
-    cards = enote.odata_get_owner_cards(owner_ref)
+    cards = await enote.odata_get_owner_cards(owner_ref)
     if not cards:
         await message.answer("🐾 У власника не знайдено карток тварин.")
         return
@@ -541,7 +541,7 @@ async def auto_label_topic(message: Message, bot: Bot):
 
         # 2) тягнемо картки з Єнота
         try:
-            cards = enote.odata_get_owner_cards(owner_ref)
+            cards = await enote.odata_get_owner_cards(owner_ref)
         except Exception:
             log.exception("auto_label: enote cards failed owner_ref=%s", owner_ref)
             await message.answer("⚠️ Не вдалося отримати тварин з Єнота. Спробуйте пізніше.")
@@ -16,7 +16,7 @@ class CardInfo:
     name: str
 
 
-def fetch_cards_for_owner(owner_ref_key: str) -> List[CardInfo]:
+async def fetch_cards_for_owner(owner_ref_key: str) -> List[CardInfo]:
     """
     Тягне список карток (тварин) для owner_ref_key через існуючу інтеграцію Enote.
     Використовує enote.odata_get_owner_cards(), яка повертає список dict із полями:
@@ -24,7 +24,7 @@ def fetch_cards_for_owner(owner_ref_key: str) -> List[CardInfo]:
       - Description
       - (інші, але нас цікавлять ці дві)
     """
-    raw_cards = enote.odata_get_owner_cards(owner_ref_key) or []
+    raw_cards = await enote.odata_get_owner_cards(owner_ref_key) or []
 
     cards: List[CardInfo] = []
     for item in raw_cards:
@@ -80,7 +80,7 @@ async def select_card_for_ticket(
     High-level: отримати картки → якщо одна — повернути,
     якщо кілька — запустити ask_card_selection().
     """
-    cards = fetch_cards_for_owner(owner_ref_key)
+    cards = await fetch_cards_for_owner(owner_ref_key)
 
     if not cards:
         raise ValueError(f"У власника {owner_ref_key} не знайдено жодної картки")
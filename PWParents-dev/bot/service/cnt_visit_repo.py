@@ -15,7 +15,7 @@ CONTROL_EVENT_GUID = "445633dc-c3c7-11f0-846f-2ae983d8a0f0"
 EMPTY_GUID = "00000000-0000-0000-0000-000000000000"
 
 
-def find_recent_visit(card_ref: str) -> Optional[Dict[str, Any]]:
+async def find_recent_visit(card_ref: str) -> Optional[Dict[str, Any]]:
     """
     Пошук останнього контрольного Document_Посещение для цієї тварини (Карточки)
     за вікном settings.VISIT_MERGE_WINDOW_HOURS.
@@ -35,7 +35,7 @@ def find_recent_visit(card_ref: str) -> Optional[Dict[str, Any]]:
     )
 
     try:
-        data = enote_request("GET", url)
+        data = await enote_request("GET", url)
     except Exception:
         log.exception("Єнот не відповів при пошуку Document_Посещение")
         return None
@@ -46,7 +46,7 @@ def find_recent_visit(card_ref: str) -> Optional[Dict[str, Any]]:
     return data["value"][0]
 
 
-def create_new_visit(
+async def create_new_visit(
     card_ref: str,
     ticket_closed_dt: datetime,
     agent_ref_key: str
@@ -83,7 +83,7 @@ def create_new_visit(
     }
 
     try:
-        created = enote_request("POST", "Document_Посещение", json=payload)
+        created = await enote_request("POST", "Document_Посещение", json=payload)
     except Exception:
         log.exception("Помилка створення нового Document_Посещение")
         return None
@@ -95,7 +95,7 @@ def create_new_visit(
     return created["Ref_Key"]
 
 
-def update_visit_sostav(ref_key: str, sostav: list) -> bool:
+async def update_visit_sostav(ref_key: str, sostav: list) -> bool:
     """
     Оновлення масиву 'Состав' у Document_Посещение.
     """
@@ -103,7 +103,7 @@ def update_visit_sostav(ref_key: str, sostav: list) -> bool:
     payload = {"Состав": sostav}
 
     try:
-        enote_request("PATCH", f"Document_Посещение(guid'{ref_key}')", json=payload)
+        await enote_request("PATCH", f"Document_Посещение(guid'{ref_key}')", json=payload)
     except Exception:
         log.exception("Помилка PATCH (Состав) у Document_Посещение")
         return False
@@ -111,13 +111,13 @@ def update_visit_sostav(ref_key: str, sostav: list) -> bool:
     return True
 
 
-def post_visit(ref_key: str) -> bool:
+async def post_visit(ref_key: str) -> bool:
     """
     Проведення документа.
     """
 
     try:
-        enote_request("POST", f"Document_Посещение(guid'{ref_key}')/Post")
+        await enote_request("POST", f"Document_Посещение(guid'{ref_key}')/Post")
     except Exception:
         log.exception("Помилка проведення Document_Посещение")
         return False
@@ -68,7 +68,7 @@ async def process_ticket_to_visit(
     )
 
     # 2) Шукаємо існуючий візит за останні VISIT_MERGE_WINDOW_HOURS
-    existing = find_recent_visit(card_ref_key)
+    existing = await find_recent_visit(card_ref_key)
     reused_existing = False
 
     if existing and existing.get("Ref_Key"):
@@ -77,7 +77,7 @@ async def process_ticket_to_visit(
         log.info("Знайдено існуючий Document_Посещение Ref_Key=%s — будемо оновлювати", visit_ref)
     else:
         # 3) Створюємо новий візит
-        visit_ref = create_new_visit(
+        visit_ref = await create_new_visit(
             card_ref=card_ref_key,
             ticket_closed_dt=ticket_closed_dt,
             agent_ref_key=agent_ref_key,
@@ -99,12 +99,12 @@ async def process_ticket_to_visit(
     )
 
     # 5) PATCH Состава
-    ok = update_visit_sostav(visit_ref, sostav)
+    ok = await update_visit_sostav(visit_ref, sostav)
     if not ok:
         raise RuntimeError(f"Не вдалося оновити Состав для Document_Посещение {visit_ref}")
 
     # 6) Проведення документа
-    if not post_visit(visit_ref):
+    if not await post_visit(visit_ref):
         # Не кидаємо виключення, але логнемо помилку
         log.error("Не вдалося провести Document_Посещение Ref_Key=%s", visit_ref)
 
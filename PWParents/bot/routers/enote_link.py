@@ -62,7 +62,7 @@ async def process_contract_and_preview(message: Message, state: FSMContext, cont
     client_user_id = data.get("client_user_id")
 
     try:
-        card = enote.odata_get_card_by_contract(contract)
+        card = await enote.odata_get_card_by_contract(contract)
         if not card:
             await message.reply(
                 f"❌ Не знайдено договору <b>{contract}</b> у Єноті. Перевірте номер і спробуйте ще."
@@ -70,8 +70,8 @@ async def process_contract_and_preview(message: Message, state: FSMContext, cont
             return
 
         owner_ref = card.get("Хозяин_Key")
-        owner_cards = enote.odata_get_owner_cards(owner_ref)
-        client = enote.api_get_client(owner_ref)
+        owner_cards = await enote.odata_get_owner_cards(owner_ref)
+        client = await enote.api_get_client(owner_ref)
         owner_name = enote.extract_owner_name(client) if client else "—"
         owner_phone = enote.extract_owner_phone(client) if client else ""
 
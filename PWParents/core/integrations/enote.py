@@ -1,23 +1,33 @@
 # core/integrations/enote.py
 from __future__ import annotations
 import re
-import requests
+import httpx
 from typing import Any, Dict, List, Optional
-from requests.auth import HTTPBasicAuth
 from core.config import settings
+from enote_odata import AsyncEnoteClient, EnoteConfig, EnoteError
 
 ODATA_BASE = settings.ENOTE_ODATA_URL  # .../odata/standard.odata
 API_BASE = settings.ENOTE_API_URL  # .../hs/api/v2
-HEAD_ODATA = {"Accept": "application/json"}
 HEAD_API = {"Accept": "application/json", "apikey": settings.ENOTE_API_KEY}
-AUTH = HTTPBasicAuth(settings.ENOTE_ODATA_USER, settings.ENOTE_ODATA_PASS)
 
 CARDS = "Catalog_Карточки"
 GETCLIENT = f"{API_BASE}/GetClient"
 
 
-class EnoteError(Exception):
-    pass
+# async: хендлери aiogram не блокують event loop на запитах до Єнота
+_client: AsyncEnoteClient | None = None
+
+
+def _odata() -> AsyncEnoteClient:
+    global _client
+    if not ODATA_BASE:
+        raise EnoteError("ODATA base URL is not configured")
+    if _client is None:
+        _client = AsyncEnoteClient(EnoteConfig(
+            base_url=ODATA_BASE, user=settings.ENOTE_ODATA_USER, password=settings.ENOTE_ODATA_PASS,
+            timeout=25, max_retries=2,
+        ))
+    return _client
 
 
 def norm_phone_digits(raw: str) -> str:
@@ -33,44 +43,39 @@ def norm_phone_digits(raw: str) -> str:
     return d
 
 
-def _odata_raw_query(path_query: str) -> Dict[str, Any]:
+async def _odata_raw_query(path_query: str) -> Dict[str, Any]:
     """
     Приймає повністю сформований path+query (щоб уникати проблем з кирилицею).
     """
-    if not ODATA_BASE:
-        raise EnoteError("ODATA base URL is not configured")
-    url = f"{ODATA_BASE}/{path_query}"
-    r = requests.get(url, headers=HEAD_ODATA, auth=AUTH, timeout=25)
-    if not r.ok:
-        raise EnoteError(f"ODATA HTTP {r.status_code}: {r.text[:500]}")
-    return r.json()
+    return await _odata().get(path_query) or {}
 
 
-def odata_get_card_by_contract(contract: str) -> Optional[Dict[str, Any]]:
+async def odata_get_card_by_contract(contract: str) -> Optional[Dict[str, Any]]:
     """
     Повертає одну картку (dict) або None.
     Пробуємо числовий і рядковий фільтри.
     """
     q1 = f"{CARDS}?$format=json&$top=1&$select=Ref_Key,Description,Хозяин_Key,НомерДоговора&$filter=НомерДоговора eq {contract}"
-    data = _odata_raw_query(q1).get("value", [])
+    data = (await _odata_raw_query(q1)).get("value", [])
     if data:
         return data[0]
     q2 = f"{CARDS}?$format=json&$top=1&$select=Ref_Key,Description,Хозяин_Key,НомерДоговора&$filter=НомерДоговора eq '{contract}'"
-    data = _odata_raw_query(q2).get("value", [])
+    data = (await _odata_raw_query(q2)).get("value", [])
     return data[0] if data else None
 
 
-def odata_get_owner_cards(owner_ref: str) -> List[Dict[str, Any]]:
+async def odata_get_owner_cards(owner_ref: str) -> List[Dict[str, Any]]:
     q = f"{CARDS}?$format=json&$select=Ref_Key,Description,Хозяин_Key,НомерДоговора&$filter=Хозяин_Key eq guid'{owner_ref}'&$orderby=Description"
-    return _odata_raw_query(q).get("value", [])
+    return (await _odata_raw_query(q)).get("value", [])
 
 
-def api_get_client(owner_ref: str) -> Dict[str, Any]:
+async def api_get_client(owner_ref: str) -> Dict[str, Any]:
     if not API_BASE:
         return {}
-    r = requests.get(GETCLIENT, headers=HEAD_API, params={"id": owner_ref}, timeout=15)
+    async with httpx.AsyncClient(timeout=15) as http:
+        r = await http.get(GETCLIENT, headers=HEAD_API, params={"id": owner_ref})
     try:
-        return r.json() if r.ok else {}
+        return r.json() if r.is_success else {}
     except Exception:
         return {}
 
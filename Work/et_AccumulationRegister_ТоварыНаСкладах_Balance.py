@@ -2,10 +2,22 @@ import requests
 import pymysql
 import xml.etree.ElementTree as ET
 import os
+import sys
+import time
+import queue
 import datetime
+from pathlib import Path
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+_REPO_ROOT = str(Path(__file__).resolve().parents[1])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from enote_etl.db import odku_if_changed
+from enote_etl.runs import begin_run, ensure_runs, fail_run, finish_run, plan_window
+
 # Завантаження змінних з .env
 load_dotenv()
 
@@ -20,127 +32,234 @@ ODATA_USER = os.getenv("ODATA_USER")
 ODATA_PASSWORD = os.getenv("ODATA_PASSWORD")
 ODATA_URL = os.getenv("ODATA_URL") + "AccumulationRegister_ТоварыНаСкладах/Balance"
 
-# Кількість потоків
+# Кількість потоків (= розмір пулу з'єднань до БД)
 MAX_THREADS = 5  # Можна збільшити до 10
+DAYS_BACK = 15        # глибоке вікно: MAX(ДатаВремя) - DAYS_BACK
+# звичайне вікно — з журналу etl_runs: останній успішно завантажений день - OVERLAP_DAYS;
+# глибоке — раз на DEEP_EVERY_DAYS (або ETL_DEEP=1)
+OVERLAP_DAYS = 2
+DEEP_EVERY_DAYS = 7
+
+TABLE = "et_AccumulationRegister_ТоварыНаСкладах_Balance"
+STAGE = "stg_ТоварыНаСкладах_Balance"
+# Ідентичність рядка залишку: день + склад + номенклатура
+KEY = ("ДатаВремя", "Склад_Key", "Номенклатура_Key")
+COLUMNS = ("ДатаВремя", "Организация_Key", "Склад_Key", "Номенклатура_Key",
+           "СерияНоменклатуры_Key", "КоличествоBalance", "СтоимостьBalance")
+VALUE_COLUMNS = ("Организация_Key", "СерияНоменклатуры_Key", "КоличествоBalance", "СтоимостьBalance")
+
+NS_D = "{http://schemas.microsoft.com/ado/2007/08/dataservices}"
+
+session = requests.Session()
+session.auth = (ODATA_USER, ODATA_PASSWORD)
+
+
+# ---------- пул з'єднань ----------
+
+def connect():
+    return pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_DATABASE,
+                           charset="utf8mb4", autocommit=False)
+
+
+class ConnectionPool:
+    """Фіксований набір з'єднань на потоки; у кожному — свій TEMPORARY-стейдж, створюється один раз."""
+
+    def __init__(self, size):
+        self._q = queue.Queue()
+        for _ in range(size):
+            conn = connect()
+            create_stage(conn)
+            self._q.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._q.get()
+        try:
+            yield conn
+        finally:
+            self._q.put(conn)
+
+    def close(self):
+        while not self._q.empty():
+            self._q.get().close()
+
 
 # Функція отримання останньої дати з БД
-def get_last_balance_date():
-    connection = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_DATABASE)
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT MAX(ДатаВремя) FROM et_AccumulationRegister_ТоварыНаСкладах_Balance")
+def get_last_balance_date(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT MAX(ДатаВремя) FROM {TABLE}")
         last_date = cursor.fetchone()[0]
-    connection.close()
-    
+
     if last_date:
-        return last_date - datetime.timedelta(days=15)
+        return last_date - datetime.timedelta(days=DAYS_BACK)
     else:
         return datetime.datetime(2024, 7, 30)
 
+
+def ensure_unique_key(conn):
+    """ON DUPLICATE KEY потребує унікального індексу на KEY; додаємо один раз, якщо його ще немає."""
+    with conn.cursor() as cursor:
+        cursor.execute(f"SHOW INDEX FROM {TABLE} WHERE Non_unique = 0")
+        indexes = {}
+        for row in cursor.fetchall():
+            indexes.setdefault(row[2], []).append(row[4])
+        if any(set(cols) <= set(KEY) for cols in indexes.values()):
+            return
+        print(f"🔧 Додаю UNIQUE ({', '.join(KEY)}) у {TABLE}")
+        try:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD UNIQUE KEY ux_balance_day ({', '.join(KEY)})")
+        except pymysql.err.IntegrityError as e:
+            raise RuntimeError(f"У {TABLE} є дублікати по ({', '.join(KEY)}) — прибери їх перед запуском") from e
+
+
+def create_stage(conn):
+    """
+    Стейдж з типами колонок цілі (SHOW COLUMNS), а не власними: інакше значення округлились би
+    в стейджі, і <=> у odku_if_changed щоразу бачив би «зміну» там, де її немає.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f"SHOW COLUMNS FROM {TABLE}")
+        types = {row[0]: row[1].decode() if isinstance(row[1], bytes) else row[1] for row in cursor.fetchall()}
+        missing = [c for c in COLUMNS if c not in types]
+        if missing:
+            raise RuntimeError(f"У {TABLE} немає колонок: {', '.join(missing)}")
+        columns = ",\n".join(f"{c} {types[c]} {'NOT NULL' if c in KEY else 'NULL'}" for c in COLUMNS)
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE IF NOT EXISTS {STAGE} (
+                {columns},
+                PRIMARY KEY ({', '.join(KEY)})
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+
+
 # Функція запиту до OData
 def fetch_balance_data(date):
-    """Запит до OData та парсинг XML у JSON"""
+    """Запит до OData; XML розбираємо потоково, не тримаючи все дерево в пам'яті"""
     formatted_date = date.strftime("%Y-%m-%dT00:00:00")
     url = f"{ODATA_URL}(Period=datetime'{formatted_date}')"
 
+    response = session.get(url, timeout=60, stream=True)
+    response.raise_for_status()  # Викличе помилку, якщо статус-код 4xx або 5xx
+    response.raw.decode_content = True
     try:
-        response = requests.get(url, auth=(ODATA_USER, ODATA_PASSWORD), timeout=10)
-        response.raise_for_status()  # Викличе помилку, якщо статус-код 4xx або 5xx
-        data = parse_xml(response.text, date)  # Парсимо XML у список словників
+        return list(parse_xml(response.raw, date))
+    finally:
+        response.close()
 
-        # Виводимо тільки підсумковий рядок
-        print(f"✔ Отримано {len(data)} записів за {date.strftime('%Y-%m-%d')}")
 
-        return data
+# Функція потокового парсингу XML
+def parse_xml(stream, period_date):
+    """iterparse по <d:element>: рядок віддаємо, щойно елемент закрився, і одразу його очищаємо"""
+    for _event, element in ET.iterparse(stream, events=("end",)):
+        if element.tag != NS_D + "element":
+            continue
+        values = {child.tag[len(NS_D):]: child.text for child in element}
+        yield (
+            period_date,  # Використовуємо дату із запиту
+            values.get("Организация_Key"),
+            values.get("Склад_Key"),
+            values.get("Номенклатура_Key"),
+            values.get("СерияНоменклатуры_Key"),
+            values.get("КоличествоBalance"),
+            values.get("СтоимостьBalance"),
+        )
+        element.clear()
 
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Помилка запиту {date.strftime('%Y-%m-%d')}: {e}")
-        return []
-
-# Функція парсингу XML у список JSON
-def parse_xml(xml_data, period_date):
-    """Перетворення XML-відповіді у список JSON"""
-    try:
-        root = ET.fromstring(xml_data)
-        namespace = {"d": "http://schemas.microsoft.com/ado/2007/08/dataservices"}
-        results = []
-
-        for element in root.findall(".//d:element", namespace):
-            data = {
-                "ДатаВремя": period_date,  # Використовуємо дату із запиту
-                "Организация_Key": element.find("d:Организация_Key", namespace).text,
-                "Склад_Key": element.find("d:Склад_Key", namespace).text,
-                "Номенклатура_Key": element.find("d:Номенклатура_Key", namespace).text,
-                "СерияНоменклатуры_Key": element.find("d:СерияНоменклатуры_Key", namespace).text,
-                "КоличествоBalance": float(element.find("d:КоличествоBalance", namespace).text),
-                "СтоимостьBalance": float(element.find("d:СтоимостьBalance", namespace).text)
-            }
-            results.append(data)
-        
-        return results
-    except ET.ParseError:
-        print(f"❌ Помилка парсингу XML за {period_date.strftime('%Y-%m-%d')}")
-        return []
 
 # Функція оновлення БД
-def update_database(data):
-    """Оновлення БД"""
-    if not data:
-        return
-
-    connection = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_DATABASE)
-    with connection.cursor() as cursor:
-        for entry in data:
-            cursor.execute("""
-                SELECT КоличествоBalance, СтоимостьBalance FROM et_AccumulationRegister_ТоварыНаСкладах_Balance 
-                WHERE ДатаВремя=%s AND Склад_Key=%s AND Номенклатура_Key=%s
-            """, (entry["ДатаВремя"], entry["Склад_Key"], entry["Номенклатура_Key"]))
-            
-            existing = cursor.fetchone()
-            
-            if existing:
-                if (float(existing[0]) != entry["КоличествоBalance"]) or (float(existing[1]) != entry["СтоимостьBalance"]):
-                    cursor.execute("""
-                        UPDATE et_AccumulationRegister_ТоварыНаСкладах_Balance 
-                        SET КоличествоBalance=%s, СтоимостьBalance=%s, updated_at=NOW()
-                        WHERE ДатаВремя=%s AND Склад_Key=%s AND Номенклатура_Key=%s
-                    """, (entry["КоличествоBalance"], entry["СтоимостьBalance"], entry["ДатаВремя"], entry["Склад_Key"], entry["Номенклатура_Key"]))
-            else:
-                cursor.execute("""
-                    INSERT INTO et_AccumulationRegister_ТоварыНаСкладах_Balance 
-                    (ДатаВремя, Организация_Key, Склад_Key, Номенклатура_Key, СерияНоменклатуры_Key, КоличествоBalance, СтоимостьBalance, created_at, updated_at) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-                """, (entry["ДатаВремя"], entry["Организация_Key"], entry["Склад_Key"], entry["Номенклатура_Key"], entry["СерияНоменклатуры_Key"], entry["КоличествоBalance"], entry["СтоимостьBalance"]))
-    
-    connection.commit()
-    connection.close()
+def update_database(conn, rows):
+    """
+    День → стейдж одним executemany → один INSERT ... SELECT ... ON DUPLICATE KEY UPDATE у ціль.
+    Незмінні рядки не чіпаємо (odku_if_changed): ні запису, ні updated_at.
+    Рядки дня, яких немає в залишках, не видаляємо — як і раніше.
+    """
+    cols = ", ".join(COLUMNS)
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(f"DELETE FROM {STAGE}")
+            # дублікати ключа в одній відповіді: перемагає останній, як у старому SELECT/UPDATE
+            cursor.executemany(
+                f"INSERT INTO {STAGE} ({cols}) VALUES ({', '.join(['%s'] * len(COLUMNS))}) "
+                f"ON DUPLICATE KEY UPDATE {', '.join(f'{c}=VALUES({c})' for c in VALUE_COLUMNS)}",
+                rows,
+            )
+            cursor.execute(f"""
+                INSERT INTO {TABLE} ({cols}, created_at, updated_at)
+                SELECT {cols}, NOW(), NOW() FROM {STAGE}
+                ON DUPLICATE KEY UPDATE {odku_if_changed(TABLE, VALUE_COLUMNS)}
+            """)
+            affected = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return affected
+
 
 # Функція обробки дати в потоці
-def process_date(date):
-    """Обробка конкретного дня (отримання + запис у БД)"""
-    data = fetch_balance_data(date)
-    if data:
-        update_database(data)
+def process_date(pool, date):
+    """Обробка конкретного дня (отримання + запис у БД) на з'єднанні з пулу"""
+    rows = fetch_balance_data(date)
+    if not rows:
+        print(f"✔ {date.strftime('%Y-%m-%d')}: 0 записів")
+        return 0, 0
+    with pool.connection() as conn:
+        affected = update_database(conn, rows)
+    print(f"✔ {date.strftime('%Y-%m-%d')}: {len(rows)} записів, змінено рядків (affected)={affected}")
+    return len(rows), affected
+
 
 # Основний процес (з багатопотоковістю)
 def main():
     """Головна функція"""
-    start_date = get_last_balance_date()
-    end_date = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    print(f"🚀 Отримуємо дані з {start_date.strftime('%Y-%m-%d')} по {end_date.strftime('%Y-%m-%d')}, потоки: {MAX_THREADS}")
-
-    dates = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
-
-    # Запускаємо потоки
-    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-        future_to_date = {executor.submit(process_date, date): date for date in dates}
-        
-        for future in as_completed(future_to_date):
-            date = future_to_date[future]
-            try:
-                future.result()  # Отримуємо результат виконання
-            except Exception as e:
-                print(f"❌ Помилка обробки {date.strftime('%Y-%m-%d')}: {e}")
+    started = datetime.datetime.now()
+    t0 = time.monotonic()
+    conn = connect()
+    try:
+        ensure_unique_key(conn)
+        ensure_runs(conn)
+        win = plan_window(conn, TABLE, get_last_balance_date(conn),
+                          datetime.timedelta(days=OVERLAP_DAYS), datetime.timedelta(days=DEEP_EVERY_DAYS))
+        start_date = win.start
+        end_date = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        run_id = begin_run(conn, TABLE, win.mode, start_date)
+
+        print(f"🚀 Отримуємо дані з {start_date.strftime('%Y-%m-%d')} по {end_date.strftime('%Y-%m-%d')} "
+              f"({win.mode}), потоки: {MAX_THREADS}")
+
+        dates = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+        fetched = written = 0
+        failed = []
+        pool = ConnectionPool(min(MAX_THREADS, len(dates)) or 1)
+        try:
+            # Запускаємо потоки
+            with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+                future_to_date = {executor.submit(process_date, pool, date): date for date in dates}
+
+                for future in as_completed(future_to_date):
+                    date = future_to_date[future]
+                    try:
+                        n, affected = future.result()  # Отримуємо результат виконання
+                        fetched += n
+                        written += affected
+                    except Exception as e:
+                        failed.append(date)
+                        print(f"❌ Помилка обробки {date.strftime('%Y-%m-%d')}: {e}")
+        finally:
+            pool.close()
+
+        # із пропущеними днями прогін не успішний: наступний почне з того ж high_water
+        if failed:
+            fail_run(conn, run_id, f"{len(failed)} day(s) failed: "
+                     + ", ".join(d.strftime('%Y-%m-%d') for d in sorted(failed)), time.monotonic() - t0)
+        else:
+            finish_run(conn, run_id, fetched, written, end_date, time.monotonic() - t0)
+            conn.commit()
+    finally:
+        conn.close()
+
+    print(f"🏁 Готово за {(datetime.datetime.now() - started).total_seconds():.1f} с")
 
 if __name__ == "__main__":
     main()
@@ -1,103 +1,38 @@
-import os
-import requests
-import mysql.connector
-from dotenv import load_dotenv
-import time
+import sys
+from pathlib import Path
 
-load_dotenv()
+_REPO_ROOT = str(Path(__file__).resolve().parents[1])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
 
-# Авторизація
-ODATA_URL = os.getenv("ODATA_URL").rstrip("/")
-ODATA_USER = os.getenv("ODATA_USER")
-ODATA_PASSWORD = os.getenv("ODATA_PASSWORD")
-
-DB_HOST = os.getenv("DB_HOST")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_DATABASE = os.getenv("DB_DATABASE")
+from enote_etl import EntitySpec, sync
+from enote_etl.db import connect, load_env, qi
 
 ODATA_ENTITY = "Catalog_Породы"
 MYSQL_TABLE = "et_Catalog_Породы"
 
-# Підключення до БД
-conn = mysql.connector.connect(
-    host=DB_HOST,
-    user=DB_USER,
-    password=DB_PASSWORD,
-    database=DB_DATABASE
-)
-cursor = conn.cursor(dictionary=True)
-
-# Отримуємо список полів з БД (без created_at, updated_at)
-cursor.execute(f"SHOW COLUMNS FROM {MYSQL_TABLE}")
-columns = [row['Field'] for row in cursor.fetchall() if row['Field'] not in ('created_at', 'updated_at')]
-odata_select = ",".join(columns)
-
-print("📥 Починаємо завантаження даних з OData...")
-skip = 0
-inserted = updated = skipped = 0
-total_fetched = 0
-
-while True:
-    url = (
-        f"{ODATA_URL}/{ODATA_ENTITY}"
-        f"?$format=json&$orderby=Ref_Key&$top=1000&$skip={skip}"
-        f"&$select={odata_select}"
-    )
-    response = requests.get(url, auth=(ODATA_USER, ODATA_PASSWORD))
-    response.raise_for_status()
-    data = response.json().get("value", [])
-
-    if not data:
-        break
-
-    total_fetched += len(data)
-
-    for record in data:
-        ref_key = record["Ref_Key"]
-        data_version = record.get("DataVersion")
 
-        cursor.execute(
-            f"SELECT DataVersion FROM {MYSQL_TABLE} WHERE Ref_Key = %s",
-            (ref_key,)
-        )
-        existing = cursor.fetchone()
+def table_spec(conn) -> EntitySpec:
+    """Поля й типи — з самої таблиці (без created_at, updated_at), як і раніше."""
+    cur = conn.cursor()
+    cur.execute(f"SHOW COLUMNS FROM {qi(MYSQL_TABLE)}")
+    fields = {}
+    for field, sql_type, *_ in cur.fetchall():
+        if field not in ("created_at", "updated_at"):
+            fields[field] = sql_type.decode() if isinstance(sql_type, bytes) else sql_type
+    cur.close()
+    # Малий довідник: probe (Ref_Key + DataVersion), повні записи — лише для змінених
+    return EntitySpec(entity=ODATA_ENTITY, table=MYSQL_TABLE, probe=True, fields=fields)
 
-        if existing:
-            if existing["DataVersion"] == data_version:
-                skipped += 1
-                continue
-            else:
-                set_clause = ", ".join(f"`{col}` = %s" for col in columns if col != "Ref_Key")
-                values = [record.get(col) for col in columns if col != "Ref_Key"]
-                values.append(ref_key)
-                cursor.execute(
-                    f"UPDATE {MYSQL_TABLE} SET {set_clause} WHERE Ref_Key = %s",
-                    values
-                )
-                updated += 1
-        else:
-            placeholders = ", ".join(["%s"] * len(columns))
-            col_names = ", ".join(f"`{col}`" for col in columns)
-            values = [record.get(col) for col in columns]
-            cursor.execute(
-                f"INSERT INTO {MYSQL_TABLE} ({col_names}) VALUES ({placeholders})",
-                values
-            )
-            inserted += 1
 
-    conn.commit()
-    print(f"✅ Пачка {skip//1000+1}: отримано {len(data)} | 🆕 {inserted}, 🔄 {updated}, ⏭️ {skipped}")
-    skip += 1000
-    time.sleep(1)
+def main():
+    load_env()
+    conn = connect()
+    try:
+        sync(table_spec(conn), conn=conn)
+    finally:
+        conn.close()
 
-cursor.close()
-conn.close()
 
-# Підсумки
-print("\n📊 Підсумки:")
-print(f"🔢 Отримано всього записів: {total_fetched}")
-print(f"🆕 Додано нових: {inserted}")
-print(f"🔄 Замінено (оновлено): {updated}")
-print(f"⏭️ Пропущено без змін: {skipped}")
-print("🏁 Завантаження завершено.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# enote_etl — спільний рушій ETL OData Єнота → MySQL для скриптів E-Note/ і Work/
+from enote_etl.engine import SyncResult, main, run_script, sync
+from enote_etl.spec import EntitySpec
+
+__all__ = ["EntitySpec", "SyncResult", "main", "run_script", "sync"]
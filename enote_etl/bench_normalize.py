@@ -0,0 +1,194 @@
+# enote_etl/bench_normalize.py
+"""
+Мікробенчмарк нормалізації сторінки OData: compile_row (кортеж, конвертер на колонку
+обраний один раз) проти двох шляхів, які він замінив. Обидва скопійовані з історії
+без змін (до коміту compile_row), щоб порівняння не залежало від нинішнього normalize.py:
+
+  engine normalize_row — enote_etl.engine: dict на рядок через normalize_row,
+                         потім кортеж під executemany; результат має збігатись з compile_row;
+  ДенежныйЧек coerce   — et_Document_ДенежныйЧек.py: filter_to_db_cols/coerce_value і кортеж;
+                         лише час — значення навмисно інші (Decimal замість float, 0/1 замість bool).
+
+Синтетична сторінка повторює et_Document_РозничныйЧек: GUID-и, дати, bool, суми.
+
+    python -m enote_etl.bench_normalize --rows 100000
+"""
+from __future__ import annotations
+
+import json
+import time
+import uuid
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Mapping
+
+from enote_etl.normalize import compile_row
+
+FIELDS = {
+    "Ref_Key": "CHAR(36)",
+    "DataVersion": "VARCHAR(50)",
+    "DeletionMark": "TINYINT(1)",
+    "Number": "VARCHAR(20)",
+    "Date": "DATETIME NOT NULL",
+    "Posted": "TINYINT(1)",
+    "Организация_Key": "CHAR(36)",
+    "Подразделение_Key": "CHAR(36)",
+    "Контрагент_Key": "CHAR(36)",
+    "Карточка_Key": "CHAR(36)",
+    "Ответственный_Key": "CHAR(36)",
+    "ДенежныйСчет_Key": "CHAR(36)",
+    "ВидОперации": "VARCHAR(50)",
+    "Комментарий": "TEXT",
+    "СуммаДокумента": "DECIMAL(18,2)",
+    "СуммаОплатыНал": "DECIMAL(18,2)",
+    "СуммаОплатыБезнал": "DECIMAL(18,2)",
+    "СуммаСкидки": "DECIMAL(18,2)",
+    "КоличествоПозиций": "INT",
+    "ДатаОплаты": "DATETIME",
+}
+
+
+def _page(n: int) -> list[dict]:
+    rnd = random.Random(42)
+    t0 = datetime(2024, 7, 1)
+    guid = lambda: str(uuid.UUID(int=rnd.getrandbits(128)))
+    out = []
+    for i in range(n):
+        d = t0 + timedelta(seconds=rnd.randrange(0, 400 * 86400))
+        out.append({
+            "Ref_Key": guid(), "DataVersion": f"AAAAA{i:07d}=", "DeletionMark": False,
+            "Number": f"PW-{i:08d}", "Date": d.strftime("%Y-%m-%dT%H:%M:%S"), "Posted": True,
+            "Организация_Key": guid(), "Подразделение_Key": guid(), "Контрагент_Key": guid(),
+            "Карточка_Key": guid(), "Ответственный_Key": guid(), "ДенежныйСчет_Key": guid(),
+            "ВидОперации": "Продажа", "Комментарий": "",
+            "СуммаДокумента": rnd.randrange(1, 10 ** 6) / 100, "СуммаОплатыНал": 0,
+            "СуммаОплатыБезнал": rnd.randrange(1, 10 ** 6) / 100, "СуммаСкидки": 0,
+            "КоличествоПозиций": rnd.randrange(1, 20),
+            "ДатаОплаты": "0001-01-01T00:00:00" if i % 3 else d.strftime("%Y-%m-%dT%H:%M:%S"),
+            "Проведено_лишнє_поле": "ignored",
+        })
+    return out
+
+
+# ───────────── базові шляхи (як у історії, до compile_row) ─────────────
+
+def _base_type(sql_type: str) -> str:
+    t = sql_type.strip().upper()
+    if t.startswith(("TINYINT(1)", "BOOL")):
+        return "bool"
+    if t.startswith(("DATETIME", "TIMESTAMP", "DATE")):
+        return "datetime"
+    if t.startswith(("DECIMAL", "NUMERIC", "FLOAT", "DOUBLE")):
+        return "decimal"
+    if t.startswith(("INT", "BIGINT", "SMALLINT", "MEDIUMINT", "TINYINT")):
+        return "int"
+    return "str"
+
+
+def _normalize_value(kind: str, v: Any) -> Any:
+    if v is None:
+        return None
+    if kind == "bool":
+        return int(bool(v))
+    if kind == "datetime":
+        if not isinstance(v, str) or not v or v.startswith("0001-01-01"):
+            return None
+        return v.replace("T", " ")
+    if kind == "decimal":
+        if v == "":
+            return None
+        try:
+            return Decimal(str(v))
+        except (InvalidOperation, ValueError):
+            return None
+    if kind == "int":
+        try:
+            return int(v)
+        except (TypeError, ValueError):
+            return None
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False)
+    return v if isinstance(v, str) else str(v)
+
+
+def _normalize_row(fields: Mapping[str, str], raw: Mapping[str, Any]) -> dict[str, Any]:
+    return {c: _normalize_value(_base_type(t), raw.get(c)) for c, t in fields.items()}
+
+
+def _coerce_value(v):
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return int(v)
+    if isinstance(v, str):
+        if len(v) >= 19 and "T" in v[:19]:
+            return v.replace("T", " ")
+        return v
+    return v
+
+
+def _filter_to_db_cols(row, cols_db):
+    out = {}
+    for c in cols_db:
+        val = row.get(c, None)
+        try:
+            out[c] = _coerce_value(val)
+        except Exception:
+            out[c] = str(val) if val is not None else None
+    return out
+
+
+def engine_legacy(page: list[dict]) -> list[tuple]:
+    """engine до compile_row: normalize_row на рядок, кортеж збирав write_page."""
+    cols = list(FIELDS)
+    rows = [_normalize_row(FIELDS, r) for r in page]
+    return [tuple(r[c] for c in cols) for r in rows]
+
+
+def coerce_legacy(page: list[dict]) -> list[tuple]:
+    """ДенежныйЧек до compile_row: filter_to_db_cols на рядок, кортеж — в insert_update."""
+    cols = list(FIELDS)
+    rows = [_filter_to_db_cols(r, cols) for r in page]
+    return [tuple(r.get(c) for c in cols) for r in rows]
+
+
+def compiled(page: list[dict]) -> list[tuple]:
+    to_row = compile_row(FIELDS)
+    return [to_row(r) for r in page]
+
+
+def _time(fn, page, repeat: int) -> list[float]:
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(page)
+        runs.append(time.perf_counter() - t0)
+    return runs
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    page = _page(args.rows)
+    assert engine_legacy(page[:2000]) == compiled(page[:2000]), "compile_row differs from engine normalize_row"
+
+    print(f"rows={args.rows} columns={len(FIELDS)} repeat={args.repeat}")
+    res = {}
+    for name, fn in (("engine normalize_row", engine_legacy), ("ДенежныйЧек coerce", coerce_legacy),
+                     ("compile_row", compiled)):
+        runs = _time(fn, page, args.repeat)
+        res[name] = statistics.median(runs)
+        print(f"  {name:<21} median={res[name] * 1000:8.1f} ms  "
+              f"({args.rows / res[name] / 1000:7.1f}k rows/s)")
+    for name in ("engine normalize_row", "ДенежныйЧек coerce"):
+        print(f"  speedup vs {name}: x{res[name] / res['compile_row']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
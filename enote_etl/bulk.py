@@ -0,0 +1,130 @@
+# enote_etl/bulk.py
+from __future__ import annotations
+
+import os
+import tempfile
+import datetime as dt
+from decimal import Decimal
+from typing import Any, Sequence
+
+from enote_etl.db import log, qi
+
+CHUNK_ROWS = int(os.getenv("ETL_BULK_CHUNK_ROWS", "50000"))
+
+# ER_NOT_ALLOWED_COMMAND, ER_CLIENT_LOCAL_FILES_DISABLED, CR_LOAD_DATA_LOCAL_INFILE_REJECTED,
+# ER_LOAD_INFILE_CAPABILITY_DISABLED — LOCAL INFILE вимкнено на сервері чи в конекторі
+_LOCAL_DISABLED = (1148, 2068, 3948, 3950)
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+
+
+def tsv_value(v: Any) -> str:
+    """
+    Значення compile_row → поле TSV під LOAD DATA (FIELDS ESCAPED BY '\\'):
+    None — \\N, bool — 1/0, службові символи рядка екрануються. Кирилиця йде як є —
+    файл у UTF-8, LOAD DATA з CHARACTER SET utf8mb4.
+    """
+    if v is None:
+        return "\\N"
+    if v.__class__ is str:
+        return v.translate(_ESCAPES)
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    if isinstance(v, (int, Decimal, float)):
+        return str(v)
+    # datetime — підклас date, тож перевіряємо першим
+    if isinstance(v, dt.datetime):
+        return v.isoformat(" ")
+    if isinstance(v, dt.date):
+        return v.isoformat()
+    return str(v).translate(_ESCAPES)
+
+
+def _errno(e: Exception) -> int | None:
+    code = getattr(e, "errno", None)
+    if code is None and e.args and isinstance(e.args[0], int):
+        code = e.args[0]
+    return code
+
+
+class BulkLoader:
+    """
+    Кортежі → тимчасовий TSV → LOAD DATA LOCAL INFILE ... REPLACE у стейдж, пачками по CHUNK_ROWS
+    (REPLACE — дублікат ключа в одній вибірці: перемагає останній, як у ON DUPLICATE KEY).
+    Якщо LOCAL INFILE вимкнено (сервер local_infile=OFF або конектор без allow_local_infile) —
+    пачка і все далі йдуть звичайним executemany, прогін не падає.
+
+    Кожна пачка завершується commit на тому ж з'єднанні, що й запис у ціль: у режимах upsert
+    фіксуються і сторінки, записані в ціль до перемикання на стейдж. Після падіння посеред
+    вибірки rollback їх уже не відкотить — це безпечно, бо upsert ідемпотентний, а невдалий
+    прогін не стає high_water і наступний бере те саме вікно. rewrite_range ціль до merge не чіпає.
+    """
+
+    def __init__(self, conn, table: str, columns: Sequence[str], chunk_rows: int = CHUNK_ROWS):
+        self.conn = conn
+        self.table = table
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.enabled = True
+        self.loaded = 0
+        self._rows: list[tuple] = []
+        self._file = None
+
+    def add(self, rows: Sequence[tuple]) -> None:
+        if self._file is None:
+            self._file = tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="\n", suffix=".tsv",
+                                                     prefix="enote_bulk_", dir=os.getenv("ETL_BULK_DIR"),
+                                                     delete=False)
+        write = self._file.write
+        for r in rows:
+            write("\t".join(map(tsv_value, r)) + "\n")
+        self._rows.extend(rows)
+        if len(self._rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Пачку — в стейдж і commit (див. примітку класу про цільові записи в режимах upsert)."""
+        if not self._rows:
+            return
+        self._file.close()
+        cur = self.conn.cursor()
+        try:
+            if self.enabled:
+                try:
+                    cur.execute(f"""
+                        LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE {qi(self.table)}
+                        CHARACTER SET utf8mb4
+                        FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                        LINES TERMINATED BY '\\n'
+                        ({", ".join(qi(c) for c in self.columns)})
+                    """, (self._file.name,))
+                except Exception as e:
+                    if _errno(e) not in _LOCAL_DISABLED:
+                        raise
+                    self.enabled = False
+                    log(f"{self.table}: LOAD DATA LOCAL INFILE unavailable ({e}), falling back to executemany")
+            if not self.enabled:
+                sql = (f"REPLACE INTO {qi(self.table)} ({', '.join(qi(c) for c in self.columns)}) "
+                       f"VALUES ({', '.join(['%s'] * len(self.columns))})")
+                for i in range(0, len(self._rows), 1000):
+                    cur.executemany(sql, self._rows[i:i + 1000])
+            self.conn.commit()
+        finally:
+            cur.close()
+            os.unlink(self._file.name)
+            self._file = None
+        self.loaded += len(self._rows)
+        self._rows = []
+
+    def close(self) -> None:
+        """Дописати залишок у стейдж."""
+        self.flush()
+        self.discard()
+
+    def discard(self) -> None:
+        """Після помилки прогону: нічого не вантажимо, тимчасовий файл прибираємо."""
+        self._rows = []
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self._file.name)
+            self._file = None
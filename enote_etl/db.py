@@ -0,0 +1,84 @@
+# enote_etl/db.py
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from typing import Sequence
+
+import mysql.connector
+from dotenv import load_dotenv
+
+ENV_PATH = os.getenv("ENV_PATH", "/root/Python/.env")
+
+
+def log(msg: str) -> None:
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+
+def load_env(path: str | None = None) -> None:
+    load_dotenv(path or ENV_PATH)
+
+
+def connect(autocommit: bool = False, local_infile: bool = False):
+    """local_infile — дозволити LOAD DATA LOCAL INFILE (bulk-шлях; на сервері ще потрібен local_infile=ON)."""
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", "3306")),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_DATABASE"),
+        charset="utf8mb4",
+        use_unicode=True,
+        autocommit=autocommit,
+        allow_local_infile=local_infile,
+    )
+
+
+def qi(name: str) -> str:
+    """Ідентифікатор MySQL у бектиках (кирилиця в назвах колонок — норма)."""
+    return "`" + name.replace("`", "``") + "`"
+
+
+def ensure_index(conn, table: str, *columns: str) -> bool:
+    """Індекс із префіксом columns, якщо такого ще немає (інкременти по updated_at, join'и агрегатів)."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX)
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        GROUP BY INDEX_NAME
+    """, (table,))
+    want = ",".join(columns)
+    rows = [tuple(r.values()) if isinstance(r, dict) else tuple(r) for r in cur.fetchall()]
+    if any(cols == want or cols.startswith(want + ",") for _, cols in rows):
+        cur.close()
+        return False
+    name = ("ix_" + "_".join(columns))[:64]
+    log(f"{table}: adding index {name} ({want})")
+    cur.execute(f"ALTER TABLE {qi(table)} ADD INDEX {qi(name)} ({', '.join(qi(c) for c in columns)})")
+    cur.close()
+    return True
+
+
+def odku_if_changed(table: str, columns: Sequence[str], version: str | None = None) -> str:
+    """
+    SET-частина ON DUPLICATE KEY UPDATE, що не чіпає незмінні рядки: updated_at — NOW() лише
+    тоді, коли щось реально змінилось, інакше лишається старим.
+
+    updated_at — першим: присвоєння виконуються зліва направо, тож умова ще бачить старі
+    значення колонок. Присвоєння тих самих значень MySQL не рахує змінами — незмінний рядок
+    не переписується, і rowcount такого INSERT: 1 — вставка, 2 — оновлення, 0 — без змін.
+
+    version — зміну видно лише з цієї колонки (DataVersion): решта колонок оновлюється теж
+    лише при зміні версії, а сама версія — останньою, щоб попередні IF бачили стару.
+    Без version — зміна будь-якої з columns.
+    """
+    t = qi(table)
+    if version:
+        changed = f"NOT ({t}.{qi(version)} <=> VALUES({qi(version)}))"
+        sets = [f"{t}.{qi(c)} = IF({changed}, VALUES({qi(c)}), {t}.{qi(c)})" for c in columns if c != version]
+        sets.append(f"{t}.{qi(version)} = VALUES({qi(version)})")
+    else:
+        changed = " OR ".join(f"NOT ({t}.{qi(c)} <=> VALUES({qi(c)}))" for c in columns)
+        sets = [f"{t}.{qi(c)} = VALUES({qi(c)})" for c in columns]
+    return ",\n    ".join([f"{t}.`updated_at` = IF({changed}, NOW(), {t}.`updated_at`)", *sets])
@@ -0,0 +1,369 @@
+# enote_etl/engine.py
+from __future__ import annotations
+
+import os
+import time
+import datetime as dt
+import importlib.util
+from pathlib import Path
+from dataclasses import dataclass, replace
+
+from enote_odata import EnoteClient, EnoteConfig, PageCache, Query, content_hash, guid_in
+
+from enote_etl.bulk import BulkLoader
+from enote_etl.db import connect, load_env, log, qi
+from enote_etl.normalize import compile_row
+from enote_etl.pipeline import queue_pages, stream
+from enote_etl.reconcile import reconcile, reconcile_due
+from enote_etl.runs import Window, begin_run, ensure_runs, fail_run, finish_run, moment, plan_window
+from enote_etl.schema import ensure_schema
+from enote_etl.spec import EntitySpec
+from enote_etl.stage import create_stage, drop_stage, merge_stage
+from enote_etl.versions import fetch_versions
+from enote_etl.windows import WindowedFetcher
+
+
+@dataclass
+class SyncResult:
+    fetched: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+    high_water: dt.datetime | None = None   # найпізніше значення incremental серед отриманих рядків
+
+    def __str__(self) -> str:
+        return (f"fetched={self.fetched} inserted={self.inserted} updated={self.updated} "
+                f"skipped={self.skipped} deleted={self.deleted} in {self.seconds:.1f}s")
+
+
+# ───────────── схема ─────────────
+
+def ensure_table(conn, spec: EntitySpec) -> dict[str, str]:
+    """
+    CREATE TABLE IF NOT EXISTS за spec.fields + добудова відсутніх колонок — лише коли змінилась специфікація.
+    Повертає {колонка: тип} таблиці.
+    """
+    cols = []
+    for c, t in spec.fields.items():
+        # тип може сам нести NOT NULL (поля, зняті з існуючої таблиці — schema.table_columns)
+        null = "" if "NOT NULL" in t.upper() else (" NOT NULL" if c in spec.key else " NULL")
+        cols.append(f"{qi(c)} {t}{null}")
+    keys = [f"PRIMARY KEY ({', '.join(qi(k) for k in spec.key)})"]
+    for ix in ((spec.incremental,) if spec.incremental else ()) + spec.indexes:
+        keys.append(f"KEY {qi('ix_' + ix)} ({qi(ix)})")
+
+    return ensure_schema(conn, spec.table, f"""
+        CREATE TABLE IF NOT EXISTS {qi(spec.table)} (
+          {', '.join(cols)},
+          `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          {', '.join(keys)}
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """, spec.fields)
+
+
+# ───────────── вікно / запит ─────────────
+
+def start_date(conn, spec: EntitySpec) -> dt.datetime | None:
+    if not spec.incremental:
+        return None
+    cur = conn.cursor()
+    cur.execute(f"SELECT MAX({qi(spec.incremental)}) FROM {qi(spec.table)}")
+    (max_dt,) = cur.fetchone()
+    cur.close()
+    if max_dt:
+        return (max_dt - dt.timedelta(days=spec.days_back)).replace(microsecond=0)
+    return dt.datetime.fromisoformat(spec.start_if_empty + "T00:00:00")
+
+
+def plan(conn, spec: EntitySpec) -> Window:
+    """Вікно прогону за журналом etl_runs: delta від high_water або періодично глибоке; довідники — повністю."""
+    if not spec.incremental:
+        return Window(None, "probe" if spec.probe else "full")
+    return plan_window(conn, spec.table, start_date(conn, spec), dt.timedelta(hours=spec.overlap_hours),
+                       dt.timedelta(hours=spec.deep_every_hours))
+
+
+def build_query(spec: EntitySpec, start: dt.datetime | None) -> Query:
+    """$select + вікно; порядок і пагінацію задає iter_keyset за spec.order_keys."""
+    q = Query(spec.entity).select(*spec.fields)
+    if spec.incremental:
+        q = q.filter(f"{spec.incremental} ge datetime'{start:%Y-%m-%dT%H:%M:%S}'")
+    return q
+
+
+def iter_source(spec: EntitySpec, client: EnoteClient, start: dt.datetime | None):
+    """Сторінки вікна по spec.order_keys: один keyset-курсор або паралельні піддіапазони дат."""
+    if spec.workers > 1:
+        return WindowedFetcher(client, Query(spec.entity).select(*spec.fields), spec.incremental, spec.key,
+                               start, page_size=spec.page_size, workers=spec.workers,
+                               window_days=spec.window_days)
+    return client.iter_keyset(build_query(spec, start), spec.order_keys, spec.page_size)
+
+
+# ───────────── запис ─────────────
+
+def upsert_sql(spec: EntitySpec, table: str | None = None) -> str:
+    cols = spec.columns
+    upd = ", ".join(f"{qi(c)}=VALUES({qi(c)})" for c in cols if c not in spec.key)
+    return (f"INSERT INTO {qi(table or spec.table)} ({', '.join(qi(c) for c in cols)}) "
+            f"VALUES ({', '.join(['%s'] * len(cols))}) ON DUPLICATE KEY UPDATE {upd}")
+
+
+def write_page(conn, spec: EntitySpec, rows: list[tuple], detect: bool,
+               table: str | None = None) -> tuple[int, int, int]:
+    """
+    Один executemany на сторінку + commit; rows — кортежі compile_row(spec.fields), готові до bind.
+    detect=False — пишемо все (стейдж rewrite_range / upsert);
+    інакше версії беремо лише для ключів сторінки і пропускаємо незмінні DataVersion.
+    Повертає (inserted, updated, skipped).
+    """
+    kpos = [spec.position(k) for k in spec.key]
+    vpos = spec.position(spec.version) if spec.version else None
+    keyed = [(tuple(r[i] for i in kpos), r) for r in rows]
+    keyed = [(k, r) for k, r in keyed if None not in k]
+    existing = fetch_versions(conn, spec.table, spec.key, spec.version, (k for k, _ in keyed)) if detect else None
+    ins = upd = skip = 0
+    batch = []
+    for k, r in keyed:
+        if existing is not None:
+            if k in existing:
+                if vpos is not None and existing[k] == r[vpos]:
+                    skip += 1
+                    continue
+                upd += 1
+            else:
+                ins += 1
+            existing[k] = r[vpos] if vpos is not None else None
+        else:
+            ins += 1
+        batch.append(r)
+    if batch:
+        cur = conn.cursor()
+        cur.executemany(upsert_sql(spec, table), batch)
+        cur.close()
+    conn.commit()
+    return ins, upd, skip
+
+
+# ───────────── probe: версії → лише змінені записи ─────────────
+
+PROBE_PAGE = 5000   # Ref_Key + DataVersion — ~100 байт на рядок, сторінка може бути більшою
+PROBE_BATCH = 40    # guid'..' в одному $filter: довжина URL для 1С
+
+def probe_query(spec: EntitySpec) -> Query:
+    return Query(spec.entity).select(*spec.key, spec.version)
+
+
+def table_rows(conn, spec: EntitySpec) -> int:
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM {qi(spec.table)}")
+    (n,) = cur.fetchone()
+    cur.close()
+    return n
+
+
+def changed_keys(conn, spec: EntitySpec, snapshot: dict[str, str], cached: dict | None,
+                 db_rows: int) -> list[str]:
+    """
+    Ключі, що треба дотягнути. Якщо кеш відповідає таблиці (та сама кількість рядків) —
+    діф probe з кешем без жодного запиту версій; інакше — порівняння з БД посторінково.
+    """
+    prev = (cached or {}).get("data")
+    if isinstance(prev, dict) and len(prev) == db_rows:
+        return [k for k, v in snapshot.items() if prev.get(k) != v]
+    out = []
+    refs = list(snapshot)
+    for i in range(0, len(refs), PROBE_PAGE):
+        part = refs[i:i + PROBE_PAGE]
+        existing = fetch_versions(conn, spec.table, spec.key, spec.version, ((r,) for r in part))
+        out += [r for r in part if existing.get((r,), object()) != snapshot[r]]
+    return out
+
+
+def probe_sync(conn, client: EnoteClient, spec: EntitySpec, res: SyncResult,
+               cache: PageCache | None = None) -> None:
+    """
+    1) легкий прохід Ref_Key + DataVersion; хеш збігся з кешем — довідник не змінювався;
+    2) повні записи лише для змінених ключів, пачками `Ref_Key eq guid'..' or ...`;
+    3) кеш оновлюється тільки після успішного запису.
+    """
+    cache = cache or PageCache()
+    pq = probe_query(spec)
+    snapshot = {}
+    for page in client.iter_keyset(pq, spec.key, PROBE_PAGE):
+        for r in page:
+            if r.get("Ref_Key"):
+                snapshot[r["Ref_Key"]] = r.get(spec.version)
+    digest = content_hash(snapshot)
+    cached = cache.load(pq)
+    db_rows = table_rows(conn, spec)
+    if cached and cached["hash"] == digest and db_rows == len(snapshot):
+        res.skipped = len(snapshot)
+        log(f"[PROBE] {spec.entity}: {len(snapshot)} keys, unchanged since last run")
+        return
+
+    todo = changed_keys(conn, spec, snapshot, cached, db_rows)
+    log(f"[PROBE] {spec.entity}: {len(snapshot)} keys, changed={len(todo)}")
+    full = Query(spec.entity).select(*spec.fields)
+    to_row = compile_row(spec.fields)
+    for i in range(0, len(todo), PROBE_BATCH):
+        part = todo[i:i + PROBE_BATCH]
+        raw = (client.get(full.filter(guid_in("Ref_Key", part))) or {}).get("value", [])
+        rows = [to_row(r) for r in raw]
+        ins, upd, skip = write_page(conn, spec, rows, detect=True)
+        res.fetched += len(rows)
+        res.inserted += ins
+        res.updated += upd
+        res.skipped += skip
+    res.skipped += len(snapshot) - len(todo)
+    cache.store(pq, snapshot, digest)
+
+
+# ───────────── прогін ─────────────
+
+def bulk_threshold(spec: EntitySpec) -> int | None:
+    """Поріг bulk-шляху: spec.bulk_rows, ETL_BULK_ROWS перекриває (0 — вимкнути)."""
+    env = os.getenv("ETL_BULK_ROWS")
+    if env is not None and env.strip():
+        return int(env) or None
+    return spec.bulk_rows
+
+
+def stream_sync(conn, client: EnoteClient, spec: EntitySpec, start: dt.datetime | None,
+                res: SyncResult) -> None:
+    """
+    Усе вікно/довідник сторінками: upsert / upsert_by_dataversion / rewrite_range через стейдж.
+    Щойно прогін перевалив за bulk_threshold рядків — решта сторінок іде у стейдж через
+    LOAD DATA LOCAL INFILE (BulkLoader), а в ціль — одним merge наприкінці.
+    """
+    # rewrite_range: вікно вантажимо у TEMPORARY-стейдж, ціль не чіпаємо до merge
+    stage = create_stage(conn, spec.table) if spec.load_mode == "rewrite_range" else None
+    detect = spec.load_mode == "upsert_by_dataversion"
+    threshold = bulk_threshold(spec)
+    bulk: BulkLoader | None = None
+    staged = 0
+
+    to_row = compile_row(spec.fields)
+
+    def prepare(page: list[dict]) -> tuple[list[tuple], tuple]:
+        last = tuple(page[-1].get(k) for k in spec.order_keys)
+        return [to_row(r) for r in page], last
+
+    # HTTP → нормалізація → запис: три потоки, між ними обмежені черги;
+    # у пам'яті одночасно лише кілька сторінок, а не все вікно
+    pages = iter_source(spec, client, start)
+    try:
+        for n, (rows, last) in enumerate(stream(pages, prepare, maxsize=queue_pages()), 1):
+            if bulk is None and threshold and res.fetched + len(rows) > threshold:
+                # upsert-режими: уже записані сторінки лишаються в цілі, решта — через стейдж
+                stage = stage or create_stage(conn, spec.table)
+                bulk = BulkLoader(conn, stage, spec.columns)
+                log(f"[BULK] {spec.table}: over {threshold} rows, switching to LOAD DATA LOCAL INFILE")
+            res.fetched += len(rows)
+            if spec.incremental and (m := moment(last[0])) and (res.high_water is None or m > res.high_water):
+                res.high_water = m
+            if bulk:
+                bulk.add(rows)
+                staged += len(rows)
+                log(f"[BATCH {n}] fetched={len(rows)} | bulk={staged} (loaded={bulk.loaded}) | last={last}")
+                continue
+            ins, upd, skip = write_page(conn, spec, rows, detect, stage)
+            if stage:
+                staged += ins
+                log(f"[BATCH {n}] fetched={len(rows)} | staged={ins} | last={last}")
+                continue
+            res.inserted += ins
+            res.updated += upd
+            res.skipped += skip
+            log(f"[BATCH {n}] fetched={len(rows)} | insert={ins} update={upd} skip={skip} | last={last}")
+    except Exception:
+        if bulk:
+            bulk.discard()
+        raise
+    if bulk:
+        bulk.close()
+
+    if stage:
+        # вікно видалень — лише для rewrite_range; upsert-режими зливаються без DELETE
+        window = (spec.incremental, start, None) if spec.load_mode == "rewrite_range" else None
+        m = merge_stage(conn, spec.table, stage, spec.columns, spec.key, window=window, version=spec.version)
+        res.inserted += m.inserted
+        res.updated += m.updated
+        res.deleted += m.deleted
+        res.skipped += max(staged - m.inserted - m.updated, 0)
+        drop_stage(conn, stage)
+
+
+def sync(spec: EntitySpec, client: EnoteClient | None = None, conn=None, **overrides) -> SyncResult:
+    """
+    Повний цикл для однієї сутності: схема → вікно → сторінки OData → нормалізація → upsert
+    (→ щотижнева звірка видалень, якщо spec.reconcile). Кожен прогін — рядок у etl_runs.
+    overrides — разові заміни полів spec (load_mode=..., days_back=..., page_size=...).
+    """
+    if overrides:
+        spec = replace(spec, **overrides)
+    t0 = time.monotonic()
+    own_client, own_conn = client is None, conn is None
+    client = client or EnoteClient(EnoteConfig.from_env(timeout=120))
+    conn = conn or connect(local_infile=bulk_threshold(spec) is not None)
+    res = SyncResult()
+    try:
+        columns = ensure_table(conn, spec)
+        ensure_runs(conn)
+        win = plan(conn, spec)
+        start = win.start
+        log(f"Start ETL: {spec.entity} -> {spec.table} | mode={spec.load_mode} "
+            f"page={spec.page_size} workers={spec.workers}" + (" probe" if spec.probe else "")
+            + (f" | {win.mode}: {spec.incremental} >= {start}" if start else ""))
+        run_id = begin_run(conn, spec.table, win.mode, start)
+        started = dt.datetime.now().replace(microsecond=0)
+        try:
+            if spec.probe:
+                probe_sync(conn, client, spec, res)
+            else:
+                stream_sync(conn, client, spec, start, res)
+            if spec.reconcile and reconcile_due(conn, spec):
+                res.deleted += reconcile(conn, client, spec, guard_created="created_at" in columns)
+        except Exception as e:
+            conn.rollback()
+            try:
+                fail_run(conn, run_id, e, time.monotonic() - t0)
+            except Exception as ledger_error:
+                log(f"{spec.table}: could not record failed run: {ledger_error!r}")
+            raise
+        res.seconds = time.monotonic() - t0
+        # дати «з майбутнього» (1С дозволяє) не мають зсунути наступне вікно за сьогодні
+        high = min(res.high_water, started) if res.high_water else win.high_water
+        finish_run(conn, run_id, res.fetched, res.inserted + res.updated + res.deleted, high, res.seconds)
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+        if own_client:
+            client.close()
+    log(f"Done {spec.table}: {res}")
+    return res
+
+
+def main(spec: EntitySpec, env_path: str | None = None) -> SyncResult:
+    """Точка входу для тонких et_*.py: `if __name__ == "__main__": main(SPEC)`."""
+    load_env(env_path)
+    return sync(spec)
+
+
+def run_script(path: str | Path) -> SyncResult | None:
+    """
+    Завантажувач-сусід у цьому ж процесі замість subprocess (для агрегатів et_x_*):
+    скрипт із SPEC — через sync(), інший — через його main(). Помилка піднімається як є.
+    """
+    path = Path(path)
+    mod_spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(mod_spec)
+    mod_spec.loader.exec_module(module)
+    if isinstance(getattr(module, "SPEC", None), EntitySpec):
+        return sync(module.SPEC)
+    module.main()
+    return None
@@ -0,0 +1,133 @@
+# enote_etl/normalize.py
+from __future__ import annotations
+
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Mapping
+
+Converter = Callable[[Any], Any]
+RowConverter = Callable[[Mapping[str, Any]], tuple]
+
+# порожня дата 1С, як її писали старі скрипти в колонки DATETIME NOT NULL
+EMPTY_DATE = "0001-01-01 00:00:00"
+
+
+def base_type(sql_type: str) -> str:
+    t = sql_type.strip().upper()
+    if t.startswith(("TINYINT(1)", "BOOL")):
+        return "bool"
+    if t.startswith(("DATETIME", "TIMESTAMP", "DATE")):
+        return "datetime"
+    if t.startswith(("DECIMAL", "NUMERIC", "FLOAT", "DOUBLE")):
+        return "decimal"
+    if t.startswith(("INT", "BIGINT", "SMALLINT", "MEDIUMINT", "TINYINT")):
+        return "int"
+    return "str"
+
+
+def normalize_value(kind: str, v: Any) -> Any:
+    """Еталонне перетворення одного значення; compile_row дає те саме, але без розбору типу на кожне поле."""
+    if v is None:
+        return None
+    if kind == "bool":
+        return int(bool(v))
+    if kind == "datetime":
+        if not isinstance(v, str) or not v or v.startswith("0001-01-01"):
+            return None
+        return v.replace("T", " ")
+    if kind == "decimal":
+        if v == "":
+            return None
+        try:
+            return Decimal(str(v))
+        except (InvalidOperation, ValueError):
+            return None
+    if kind == "int":
+        try:
+            return int(v)
+        except (TypeError, ValueError):
+            return None
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False)
+    return v if isinstance(v, str) else str(v)
+
+
+# ───────────── конвертери колонок ─────────────
+
+def _to_bool(v: Any) -> Any:
+    if v is None:
+        return None
+    return 1 if v else 0
+
+
+def _to_datetime(v: Any) -> Any:
+    if v.__class__ is not str or not v or v.startswith("0001-01-01"):
+        return None
+    return v.replace("T", " ")
+
+
+def _to_datetime_not_null(v: Any) -> Any:
+    """DATETIME NOT NULL: порожня дата 1С лишається EMPTY_DATE — NULL таку колонку не пройде."""
+    if v.__class__ is str and v.startswith("0001-01-01"):
+        return EMPTY_DATE
+    return _to_datetime(v)
+
+
+def _to_decimal(v: Any) -> Any:
+    if v is None or v == "":
+        return None
+    try:
+        return Decimal(v) if v.__class__ is str else Decimal(str(v))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _to_int(v: Any) -> Any:
+    if v is None or v.__class__ is int:
+        return v
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_str(v: Any) -> Any:
+    if v is None or v.__class__ is str:
+        return v
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False)
+    return str(v)
+
+
+_CONVERTERS: dict[str, Converter] = {
+    "bool": _to_bool,
+    "datetime": _to_datetime,
+    "decimal": _to_decimal,
+    "int": _to_int,
+    "str": _to_str,
+}
+
+
+def converter(sql_type: str) -> Converter:
+    """
+    Один конвертер на колонку — тип розбираємо раз при компіляції, а не на кожне значення.
+    Тип з реєстру схем несе " NOT NULL" (schema.table_columns) — для дат це важливо.
+    """
+    kind = base_type(sql_type)
+    if kind == "datetime" and "NOT NULL" in sql_type.upper():
+        return _to_datetime_not_null
+    return _CONVERTERS[kind]
+
+
+def compile_row(fields: Mapping[str, str]) -> RowConverter:
+    """
+    Рядок OData → кортеж під executemany у порядку fields, без проміжного dict.
+    Тіло функції генерується один раз: `(c0(get('Ref_Key')), c1(get('Date')), ...)` —
+    без циклу по колонках і без пошуку типу на кожне значення.
+    """
+    names = list(fields)
+    env = {f"c{i}": converter(fields[c]) for i, c in enumerate(names)}
+    body = ", ".join(f"c{i}(get({c!r}))" for i, c in enumerate(names))
+    src = f"def row(raw):\n    get = raw.get\n    return ({body}{',' if len(names) == 1 else ''})\n"
+    exec(compile(src, "<enote_etl.normalize.compile_row>", "exec"), env)
+    return env["row"]
@@ -0,0 +1,89 @@
+# enote_etl/pipeline.py
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def queue_pages() -> int:
+    """ETL_QUEUE_PAGES — скільки сторінок може чекати між етапами (пам'ять ≈ сторінка × (2·N + 3))."""
+    try:
+        return max(1, int(os.getenv("ETL_QUEUE_PAGES", "2")))
+    except ValueError:
+        return 2
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(source: Iterable, q_out: queue.Queue, stop: threading.Event) -> None:
+    try:
+        for item in source:
+            if not _put(q_out, item, stop):
+                return
+        _put(q_out, _DONE, stop)
+    except BaseException as e:
+        _put(q_out, _Failure(e), stop)
+
+
+def _transform(fn: Callable, q_in: queue.Queue, q_out: queue.Queue, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            item = q_in.get(timeout=0.2)
+        except queue.Empty:
+            continue
+        if item is _DONE or isinstance(item, _Failure):
+            _put(q_out, item, stop)
+            return
+        try:
+            out = fn(item)
+        except BaseException as e:
+            _put(q_out, _Failure(e), stop)
+            return
+        if not _put(q_out, out, stop):
+            return
+
+
+def stream(source: Iterable, *stages: Callable, maxsize: int | None = None) -> Iterator:
+    """
+    source → stage1 → stage2 → ... → споживач (потік, що ітерує результат).
+    Кожен етап — окремий потік, між етапами — queue.Queue(maxsize): повільний запис у БД
+    пригальмовує завантаження, а не накопичує сторінки в пам'яті. Порядок зберігається.
+    Виняток у будь-якому етапі піднімається у споживача; вихід споживача зупиняє потоки.
+    """
+    maxsize = maxsize or queue_pages()
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize) for _ in range(len(stages) + 1)]
+    threads = [threading.Thread(target=_produce, args=(source, queues[0], stop), daemon=True)]
+    for i, fn in enumerate(stages):
+        threads.append(threading.Thread(target=_transform, args=(fn, queues[i], queues[i + 1], stop), daemon=True))
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=5)
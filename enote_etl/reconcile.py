@@ -0,0 +1,107 @@
+# enote_etl/reconcile.py
+from __future__ import annotations
+
+import os
+import datetime as dt
+
+from enote_odata import EnoteClient, Query
+
+from enote_etl.db import log, qi
+from enote_etl.spec import EntitySpec
+from enote_etl.watermarks import ensure_watermarks, get_watermark, set_watermark
+
+KEYS_PAGE = 5000
+WATERMARK_SOURCE = "reconcile"
+# звірку відхилив поріг RECONCILE_MAX_SHARE: наступна спроба — теж через reconcile_days
+SKIPPED_SOURCE = "reconcile_skipped"
+
+
+def keys_name(table: str) -> str:
+    return ("rk_" + table)[:64]
+
+
+def reconcile_due(conn, spec: EntitySpec) -> bool:
+    """
+    Раз на spec.reconcile_days від останньої спроби — виконаної чи відхиленої порогом
+    (обидві позначки в etl_watermarks); ETL_RECONCILE=1 — примусово, 0 — ніколи.
+    Позначки пише NOW() сервера БД, тож і «зараз» беремо звідти, як runs.plan_window.
+    """
+    force = os.getenv("ETL_RECONCILE", "").strip()
+    if force in ("0", "1"):
+        return force == "1"
+    ensure_watermarks(conn)
+    marks = [m for m in (get_watermark(conn, spec.table, WATERMARK_SOURCE),
+                         get_watermark(conn, spec.table, SKIPPED_SOURCE)) if m]
+    if not marks:
+        return True
+    cur = conn.cursor()
+    cur.execute("SELECT NOW()")
+    (now,) = cur.fetchone()
+    cur.close()
+    return now - max(marks) >= dt.timedelta(days=spec.reconcile_days)
+
+
+def reconcile(conn, client: EnoteClient, spec: EntitySpec, guard_created: bool = True) -> int:
+    """
+    Звірка видалень довідника без повних записів:
+      1) з OData — лише Ref_Key (keyset-сторінки по KEYS_PAGE) у TEMPORARY-таблицю ключів;
+      2) anti-join цілі з ключами: рядки, яких в Єноті вже немає, — DELETE (reconcile="delete")
+         або DeletionMark = 1 (reconcile="flag": історичні документи далі джойняться).
+    guard_created — не чіпати рядки, створені після початку проходу (created_at): їхнього
+    ключа могло не бути в уже пройдених сторінках.
+    Якщо «зниклих» більше за RECONCILE_MAX_SHARE (частка таблиці, 0.1) — нічого не змінюємо:
+    порожня чи обрізана відповідь OData не має спорожнити таблицю; спроба позначається
+    (SKIPPED_SOURCE), щоб ключі не тягнулись повторно на кожному прогоні до reconcile_days.
+    Повертає кількість видалених/позначених рядків.
+    """
+    keys = keys_name(spec.table)
+    cur = conn.cursor()
+    cur.execute("SELECT NOW()")
+    (started,) = cur.fetchone()
+    cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {qi(keys)}")
+    cur.execute(f"CREATE TEMPORARY TABLE {qi(keys)} (`Ref_Key` CHAR(36) NOT NULL PRIMARY KEY) ENGINE=InnoDB")
+
+    seen = 0
+    for page in client.iter_keyset(Query(spec.entity).select("Ref_Key"), ("Ref_Key",), KEYS_PAGE):
+        batch = [(r["Ref_Key"],) for r in page if r.get("Ref_Key")]
+        if batch:
+            cur.executemany(f"INSERT IGNORE INTO {qi(keys)} (`Ref_Key`) VALUES (%s)", batch)
+        seen += len(batch)
+
+    # уже позначені в попередніх звірках не рахуємо — інакше вони щотижня «зникали» б знову
+    join = f"{qi(spec.table)} t LEFT JOIN {qi(keys)} k ON k.`Ref_Key` = t.`Ref_Key`"
+    cond = "k.`Ref_Key` IS NULL"
+    if spec.reconcile == "flag":
+        cond += " AND NOT (t.`DeletionMark` <=> 1)"
+    if guard_created:
+        cond += " AND t.`created_at` < %s"
+    params = (started,) if guard_created else ()
+    cur.execute(f"SELECT COUNT(*), (SELECT COUNT(*) FROM {qi(spec.table)}) FROM {join} WHERE {cond}", params)
+    missing, total = cur.fetchone()
+
+    affected = 0
+    max_share = float(os.getenv("RECONCILE_MAX_SHARE", "0.1"))
+    if missing and (not seen or missing > total * max_share):
+        log(f"[RECONCILE] {spec.table}: {missing} of {total} rows missing in OData ({seen} keys) — "
+            f"above RECONCILE_MAX_SHARE={max_share}, nothing changed; next attempt in {spec.reconcile_days} days")
+        set_watermark(conn, spec.table, SKIPPED_SOURCE, started)
+        conn.commit()
+    else:
+        try:
+            cur.execute("START TRANSACTION")
+            if missing and spec.reconcile == "delete":
+                cur.execute(f"DELETE t FROM {join} WHERE {cond}", params)
+                affected = cur.rowcount
+            elif missing:
+                cur.execute(f"UPDATE {join} SET t.`DeletionMark` = 1 WHERE {cond}", params)
+                affected = cur.rowcount
+            set_watermark(conn, spec.table, WATERMARK_SOURCE, started)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        log(f"[RECONCILE] {spec.table}: {seen} keys in OData, {missing} missing in source, "
+            f"{'deleted' if spec.reconcile == 'delete' else 'flagged'}={affected}")
+    cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {qi(keys)}")
+    cur.close()
+    return affected
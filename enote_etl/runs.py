@@ -0,0 +1,158 @@
+# enote_etl/runs.py
+from __future__ import annotations
+
+import os
+import datetime as dt
+from dataclasses import dataclass
+from typing import Sequence
+
+from enote_etl.db import qi
+from enote_etl.schema import ensure_schema
+
+TABLE = "etl_runs"
+COLUMNS = ("id", "job", "mode", "status", "started_at", "finished_at", "window_start", "window_end",
+           "high_water", "rows_fetched", "rows_written", "seconds")
+
+
+@dataclass
+class Run:
+    id: int
+    job: str
+    mode: str
+    status: str
+    started_at: dt.datetime
+    finished_at: dt.datetime | None
+    window_start: dt.datetime | None
+    window_end: dt.datetime | None
+    high_water: dt.datetime | None
+    rows_fetched: int
+    rows_written: int
+    seconds: float | None
+
+
+@dataclass
+class Window:
+    """Межа завантаження: start — звідки тягнемо, mode — deep | delta, high_water — з останнього успіху."""
+    start: dt.datetime | None
+    mode: str
+    high_water: dt.datetime | None = None
+
+
+def moment(value) -> dt.datetime | None:
+    """Дата OData ('2025-01-31T10:00:00') → datetime; порожня дата 1С — None."""
+    if not isinstance(value, str) or not value or value.startswith("0001-01-01"):
+        return None
+    return dt.datetime.fromisoformat(value[:19])
+
+
+def _row(cur) -> tuple | None:
+    r = cur.fetchone()
+    if r is None:
+        return None
+    return tuple(r.values()) if isinstance(r, dict) else tuple(r)
+
+
+def ensure_runs(conn) -> None:
+    """Через реєстр схем: на звичайному прогоні — один SELECT з etl_schema_state."""
+    ensure_schema(conn, TABLE, f"""
+        CREATE TABLE IF NOT EXISTS {qi(TABLE)} (
+          `id` BIGINT NOT NULL AUTO_INCREMENT,
+          `job` VARCHAR(100) NOT NULL,
+          `mode` VARCHAR(20) NOT NULL,
+          `status` VARCHAR(10) NOT NULL DEFAULT 'running',
+          `started_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          `finished_at` DATETIME NULL,
+          `window_start` DATETIME NULL,
+          `window_end` DATETIME NULL,
+          `high_water` DATETIME NULL,
+          `rows_fetched` INT NOT NULL DEFAULT 0,
+          `rows_written` INT NOT NULL DEFAULT 0,
+          `seconds` DECIMAL(10,1) NULL,
+          `error` TEXT NULL,
+          PRIMARY KEY (`id`),
+          KEY `ix_job_status` (`job`, `status`, `started_at`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+
+def last_success(conn, job: str, mode: str | None = None) -> Run | None:
+    cur = conn.cursor()
+    cur.execute(f"SELECT {', '.join(qi(c) for c in COLUMNS)} FROM {qi(TABLE)} "
+                f"WHERE `job` = %s AND `status` = 'ok'" + (" AND `mode` = %s" if mode else "")
+                + " ORDER BY `started_at` DESC, `id` DESC LIMIT 1", (job, mode) if mode else (job,))
+    r = _row(cur)
+    cur.close()
+    return Run(*r) if r else None
+
+
+def begin_run(conn, job: str, mode: str, window_start: dt.datetime | None) -> int:
+    """Рядок 'running' з commit: перерваний прогін лишається в журналі, але не стає «останнім успіхом»."""
+    cur = conn.cursor()
+    cur.execute(f"INSERT INTO {qi(TABLE)} (`job`, `mode`, `window_start`) VALUES (%s, %s, %s)",
+                (job, mode, window_start))
+    run_id = cur.lastrowid
+    cur.close()
+    conn.commit()
+    return run_id
+
+
+def finish_run(conn, run_id: int, fetched: int, written: int, high_water: dt.datetime | None,
+               seconds: float) -> None:
+    """
+    Без commit: де можна — у тій самій транзакції, що й дані.
+    window_end = started_at: усе, що існувало в джерелі на старт прогону, покрито.
+    """
+    cur = conn.cursor()
+    cur.execute(f"""
+        UPDATE {qi(TABLE)}
+        SET `status` = 'ok', `finished_at` = NOW(), `window_end` = `started_at`, `high_water` = %s,
+            `rows_fetched` = %s, `rows_written` = %s, `seconds` = %s
+        WHERE `id` = %s
+    """, (high_water, fetched, written, round(seconds, 1), run_id))
+    cur.close()
+
+
+def fail_run(conn, run_id: int, error: BaseException | str, seconds: float | None = None) -> None:
+    """Після rollback даних: статус failed + текст помилки, окремим commit."""
+    cur = conn.cursor()
+    cur.execute(f"UPDATE {qi(TABLE)} SET `status` = 'failed', `finished_at` = NOW(), `seconds` = %s, "
+                f"`error` = %s WHERE `id` = %s",
+                (round(seconds, 1) if seconds is not None else None, repr(error)[:2000], run_id))
+    cur.close()
+    conn.commit()
+
+
+def plan_window(conn, job: str, deep_start: dt.datetime | None, overlap: dt.timedelta,
+                deep_every: dt.timedelta) -> Window:
+    """
+    Вікно замість MAX(дата) - DAYS_BACK на кожному запуску:
+      delta — від high_water останнього успішного прогону мінус overlap (пізні правки, годинник);
+      deep  — старе широке вікно deep_start: коли журналу ще немає, останній deep старший
+              за deep_every або ETL_DEEP=1. Ловить правки старих документів, які delta пропускає.
+    """
+    last = last_success(conn, job)
+    if os.getenv("ETL_DEEP", "0") == "1" or last is None or last.high_water is None:
+        return Window(deep_start, "deep", last.high_water if last else None)
+    last_deep = last if last.mode == "deep" else last_success(conn, job, "deep")
+    # started_at — час сервера БД, тож і «зараз» беремо звідти
+    cur = conn.cursor()
+    cur.execute("SELECT NOW()")
+    (now,) = _row(cur)
+    cur.close()
+    if last_deep is None or now - last_deep.started_at >= deep_every:
+        return Window(deep_start, "deep", last.high_water)
+    return Window((last.high_water - overlap).replace(microsecond=0), "delta", last.high_water)
+
+
+def changed_since(conn, jobs: Sequence[str], since: dt.datetime) -> dt.datetime | None:
+    """
+    Найраніший window_start успішних прогонів jobs, що завершились після since:
+    нижче за нього джерела з того часу не переписувались. None — прогонів не було.
+    """
+    cur = conn.cursor()
+    cur.execute(f"SELECT MIN(`window_start`) FROM {qi(TABLE)} "
+                f"WHERE `job` IN ({', '.join(['%s'] * len(jobs))}) AND `status` = 'ok' AND `finished_at` >= %s",
+                (*jobs, since))
+    r = _row(cur)
+    cur.close()
+    return r[0] if r else None
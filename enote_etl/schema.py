@@ -0,0 +1,135 @@
+# enote_etl/schema.py
+from __future__ import annotations
+
+import json
+import os
+from typing import Mapping
+
+from enote_etl.db import log, qi
+from enote_odata import content_hash
+
+TABLE = "etl_schema_state"
+
+# ER_NO_SUCH_TABLE; ER_ALTER_OPERATION_NOT_SUPPORTED(_REASON) — сервер не вміє ADD COLUMN онлайн
+_NO_SUCH_TABLE = 1146
+_NOT_INPLACE = (1845, 1846)
+
+# формат збережених колонок; 2 — типи з " NOT NULL". Входить у відбиток: старі записи перечитуються
+_STATE_FORMAT = 2
+
+
+def _errno(e: Exception) -> int | None:
+    """mysql.connector кладе код у .errno, pymysql — першим аргументом."""
+    code = getattr(e, "errno", None)
+    if code is None and e.args and isinstance(e.args[0], int):
+        code = e.args[0]
+    return code
+
+
+def _tuples(cur) -> list[tuple]:
+    return [tuple(r.values()) if isinstance(r, dict) else tuple(r) for r in cur.fetchall()]
+
+
+def ensure_state(conn) -> None:
+    cur = conn.cursor()
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {qi(TABLE)} (
+          `table_name` VARCHAR(64) NOT NULL,
+          `fingerprint` CHAR(64) NOT NULL,
+          `columns` JSON NULL,
+          `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          PRIMARY KEY (`table_name`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    cur.close()
+
+
+def _load_state(conn, table: str) -> tuple[str, dict[str, str]] | None:
+    """(fingerprint, {колонка: тип}) з реєстру; None — таблицю ще не реєстрували (або немає самого реєстру)."""
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT `fingerprint`, `columns` FROM {qi(TABLE)} WHERE `table_name` = %s", (table,))
+        rows = _tuples(cur)
+    except Exception as e:
+        if _errno(e) != _NO_SUCH_TABLE:
+            raise
+        ensure_state(conn)
+        return None
+    finally:
+        cur.close()
+    if not rows:
+        return None
+    fp, cols = rows[0]
+    try:
+        cols = json.loads(cols) if isinstance(cols, (str, bytes)) else cols
+    except ValueError:
+        return None
+    return (fp, cols) if isinstance(cols, dict) else None
+
+
+def _save_state(conn, table: str, fingerprint: str, columns: Mapping[str, str]) -> None:
+    cur = conn.cursor()
+    cur.execute(f"INSERT INTO {qi(TABLE)} (`table_name`, `fingerprint`, `columns`) VALUES (%s, %s, %s) "
+                f"ON DUPLICATE KEY UPDATE `fingerprint` = VALUES(`fingerprint`), `columns` = VALUES(`columns`)",
+                (table, fingerprint, json.dumps(dict(columns), ensure_ascii=False)))
+    cur.close()
+
+
+def table_columns(conn, table: str) -> dict[str, str]:
+    """{колонка: SQL-тип} у порядку таблиці (SHOW COLUMNS); для Null = NO — тип з " NOT NULL"."""
+    cur = conn.cursor()
+    cur.execute(f"SHOW COLUMNS FROM {qi(table)}")
+    cols = {}
+    for r in _tuples(cur):
+        sql_type = r[1].decode() if isinstance(r[1], (bytes, bytearray)) else r[1]
+        cols[r[0]] = sql_type + (" NOT NULL" if len(r) > 2 and r[2] == "NO" else "")
+    cur.close()
+    return cols
+
+
+def add_columns(conn, table: str, columns: Mapping[str, str]) -> None:
+    """Усі відсутні колонки — одним ALTER, онлайн (INPLACE); якщо сервер не вміє — звичайним."""
+    adds = ", ".join(f"ADD COLUMN {qi(c)} {t}{'' if 'NOT NULL' in t.upper() else ' NULL'}"
+                     for c, t in columns.items())
+    cur = conn.cursor()
+    try:
+        cur.execute(f"ALTER TABLE {qi(table)} {adds}, ALGORITHM=INPLACE, LOCK=NONE")
+    except Exception as e:
+        if _errno(e) not in _NOT_INPLACE:
+            raise
+        log(f"{table}: online ALTER not supported ({e}), falling back to default algorithm")
+        cur.execute(f"ALTER TABLE {qi(table)} {adds}")
+    finally:
+        cur.close()
+
+
+def ensure_schema(conn, table: str, ddl: str, fields: Mapping[str, str] | None = None) -> dict[str, str]:
+    """
+    Таблиця table у стані, описаному ddl (CREATE TABLE IF NOT EXISTS) + fields (колонки, які мають бути).
+    Відбиток (ddl, fields) зберігається в etl_schema_state разом зі списком колонок таблиці:
+    поки специфікація не змінилась — один SELECT замість CREATE + SHOW COLUMNS + ALTER.
+    Змінилась — CREATE, diff і всі відсутні колонки одним ALTER.
+
+    Колонки, додані в таблицю вручну, реєстр побачить лише після зміни специфікації
+    або з ETL_SCHEMA_CHECK=1 (повна перевірка без огляду на відбиток).
+
+    Повертає {колонка: SQL-тип} таблиці.
+    """
+    fingerprint = content_hash({"ddl": " ".join(ddl.split()), "fields": dict(fields or {}),
+                                "format": _STATE_FORMAT})
+    state = _load_state(conn, table)
+    if state and state[0] == fingerprint and os.getenv("ETL_SCHEMA_CHECK", "0") != "1":
+        return state[1]
+
+    cur = conn.cursor()
+    cur.execute(ddl)
+    cur.close()
+    existing = table_columns(conn, table)
+    missing = {c: t for c, t in (fields or {}).items() if c not in existing}
+    if missing:
+        add_columns(conn, table, missing)
+        existing.update(missing)
+        log(f"{table}: schema auto-migrated, added {len(missing)} columns ({', '.join(missing)})")
+    _save_state(conn, table, fingerprint, existing)
+    conn.commit()
+    return existing
@@ -0,0 +1,88 @@
+# enote_etl/spec.py
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Mapping
+
+LOAD_MODES = ("upsert_by_dataversion", "upsert", "rewrite_range")
+RECONCILE_ACTIONS = ("delete", "flag")
+
+
+@dataclass(frozen=True)
+class EntitySpec:
+    """
+    Опис однієї сутності OData → таблиця MySQL. Усе, що раніше копіювалось між et_*.py.
+
+      entity       — EntitySet в OData (Catalog_Карточки, Document_РозничныйЧек, ...)
+      table        — цільова таблиця
+      fields       — поле → SQL-тип, у порядку колонок; ці ж поля йдуть у $select
+      key          — первинний ключ (Ref_Key або (Recorder, LineNumber) для регістрів)
+      version      — поле версії; None — регістри без DataVersion
+      incremental  — поле дати для вікна (Date / Period); None — повний прохід довідника
+      load_mode    — upsert_by_dataversion | upsert | rewrite_range
+      days_back    — глибоке вікно: MAX(incremental) - days_back; порожня таблиця — start_if_empty
+      overlap_hours    — звичайне (delta) вікно: high_water останнього успіху (etl_runs) мінус overlap
+      deep_every_hours — як часто все ж проходити глибоке вікно (правки старих документів)
+      bulk_rows    — коли прогін перевалив за стільки рядків, решта йде у стейдж через
+                     LOAD DATA LOCAL INFILE і один merge (бекфіли); None — лише executemany
+      workers      — >1: вікно тягнемо паралельно піддіапазонами по incremental (WindowedFetcher)
+      window_days  — стартовий розмір піддіапазону; далі підлаштовується під щільність
+      probe        — довідник: спершу лише Ref_Key + DataVersion, повні записи — тільки для змінених
+      reconcile    — довідник: раз на reconcile_days звірити Ref_Key з OData і рядки, видалені в Єноті,
+                     видалити ("delete") або позначити DeletionMark = 1 ("flag"); None — не звіряти
+    """
+    entity: str
+    table: str
+    fields: Mapping[str, str]
+    key: tuple[str, ...] = ("Ref_Key",)
+    version: str | None = "DataVersion"
+    incremental: str | None = None
+    load_mode: str = "upsert_by_dataversion"
+    days_back: int = 45
+    start_if_empty: str = "2024-07-01"
+    page_size: int = 1000
+    indexes: tuple[str, ...] = field(default=())
+    workers: int = 1
+    window_days: float = 7
+    probe: bool = False
+    reconcile: str | None = None
+    reconcile_days: int = 7
+    overlap_hours: float = 48
+    deep_every_hours: float = 168
+    bulk_rows: int | None = None
+
+    def __post_init__(self):
+        if self.load_mode not in LOAD_MODES:
+            raise ValueError(f"{self.entity}: unknown load_mode {self.load_mode!r}")
+        missing = [c for c in (*self.key, self.version, self.incremental) if c and c not in self.fields]
+        if missing:
+            raise ValueError(f"{self.entity}: fields {missing} are not declared")
+        if self.load_mode == "rewrite_range" and not self.incremental:
+            raise ValueError(f"{self.entity}: rewrite_range needs an incremental column")
+        if self.workers > 1 and not self.incremental:
+            raise ValueError(f"{self.entity}: parallel windows need an incremental column")
+        if self.probe and (self.incremental or not self.version or self.key != ("Ref_Key",)):
+            raise ValueError(f"{self.entity}: probe needs a Ref_Key catalog with a version field")
+        if self.reconcile is not None:
+            if self.reconcile not in RECONCILE_ACTIONS:
+                raise ValueError(f"{self.entity}: unknown reconcile {self.reconcile!r}")
+            if self.incremental or self.key != ("Ref_Key",):
+                raise ValueError(f"{self.entity}: reconcile needs a Ref_Key catalog without a date window")
+            if self.reconcile == "flag" and "DeletionMark" not in self.fields:
+                raise ValueError(f"{self.entity}: reconcile='flag' needs a DeletionMark field")
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self.fields)
+
+    @property
+    def order_keys(self) -> tuple[str, ...]:
+        """Ключ keyset-пагінації: (Date, Ref_Key) для документів/регістрів, Ref_Key — для довідників."""
+        return ((self.incremental,) if self.incremental else ()) + self.key
+
+    def key_of(self, row: Mapping) -> tuple:
+        return tuple(row.get(k) for k in self.key)
+
+    def position(self, column: str) -> int:
+        """Індекс колонки в кортежі compile_row(fields)."""
+        return self.columns.index(column)
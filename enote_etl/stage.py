@@ -0,0 +1,94 @@
+# enote_etl/stage.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+from enote_etl.db import qi
+
+
+@dataclass
+class MergeResult:
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+
+def stage_name(table: str) -> str:
+    return ("stg_" + table)[:64]
+
+
+def create_stage(conn, table: str) -> str:
+    """TEMPORARY-копія структури цілі: живе в межах з'єднання, інші сесії її не бачать."""
+    stage = stage_name(table)
+    cur = conn.cursor()
+    cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {qi(stage)}")
+    cur.execute(f"CREATE TEMPORARY TABLE {qi(stage)} LIKE {qi(table)}")
+    cur.close()
+    return stage
+
+
+def drop_stage(conn, stage: str) -> None:
+    cur = conn.cursor()
+    cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {qi(stage)}")
+    cur.close()
+
+
+def merge_stage(conn, table: str, stage: str, columns: Sequence[str], key: Sequence[str],
+                window: tuple[str, object, object] | None = None, version: str | None = None) -> MergeResult:
+    """
+    Стейдж → ціль однією короткою транзакцією, замість DELETE вікна до завантаження:
+      DELETE — рядки вікна цілі, яких немає у стейджі (видалені в джерелі);
+      UPDATE — лише змінені (DataVersion або, без версії, будь-яка колонка);
+      INSERT — нові ключі.
+    window = (колонка, від, до|None) — межі, в яких відсутність у стейджі означає видалення.
+    Таблиця ні на мить не порожня; при збої — rollback, ціль без змін.
+    """
+    on = " AND ".join(f"t.{qi(k)} = s.{qi(k)}" for k in key)
+    k0 = qi(key[0])
+    cols = ", ".join(qi(c) for c in columns)
+    data_cols = [c for c in columns if c not in key]
+    if version:
+        changed = f"NOT (t.{qi(version)} <=> s.{qi(version)})"
+    else:
+        changed = " OR ".join(f"NOT (t.{qi(c)} <=> s.{qi(c)})" for c in data_cols) or "FALSE"
+
+    res = MergeResult()
+    cur = conn.cursor()
+    try:
+        cur.execute("START TRANSACTION")
+        if window:
+            col, start, end = window
+            cond, params = f"t.{qi(col)} >= %s", [start]
+            if end is not None:
+                cond += f" AND t.{qi(col)} < %s"
+                params.append(end)
+            cur.execute(f"""
+                DELETE t FROM {qi(table)} t
+                LEFT JOIN {qi(stage)} s ON {on}
+                WHERE {cond} AND s.{k0} IS NULL
+            """, params)
+            res.deleted = cur.rowcount
+        if data_cols:
+            cur.execute(f"""
+                UPDATE {qi(table)} t
+                JOIN {qi(stage)} s ON {on}
+                SET {", ".join(f"t.{qi(c)} = s.{qi(c)}" for c in data_cols)}, t.`updated_at` = NOW()
+                WHERE {changed}
+            """)
+            res.updated = cur.rowcount
+        cur.execute(f"""
+            INSERT INTO {qi(table)} ({cols})
+            SELECT {", ".join(f"s.{qi(c)}" for c in columns)}
+            FROM {qi(stage)} s
+            LEFT JOIN {qi(table)} t ON {on}
+            WHERE t.{k0} IS NULL
+        """)
+        res.inserted = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return res
@@ -0,0 +1,37 @@
+# enote_etl/versions.py
+from __future__ import annotations
+
+from typing import Iterable, Sequence
+
+from enote_etl.db import qi
+
+
+def fetch_versions(conn, table: str, key: Sequence[str], version: str | None,
+                   keys: Iterable[tuple], chunk: int = 1000) -> dict[tuple, str | None]:
+    """
+    Версії лише для ключів поточної сторінки: `WHERE Ref_Key IN (...)`
+    (композитний ключ — `(Recorder, LineNumber) IN ((..), ..)`), по первинному ключу.
+    Замість SELECT усієї таблиці в dict на старті: пам'ять і час не ростуть з довідником.
+    Без поля версії повертає {ключ: None} — лише факт існування.
+    """
+    keys = list(dict.fromkeys(keys))
+    out: dict[tuple, str | None] = {}
+    if not keys:
+        return out
+    cols = [*key, version] if version else list(key)
+    n = len(key)
+    lhs = qi(key[0]) if n == 1 else "(" + ", ".join(qi(k) for k in key) + ")"
+    one = "%s" if n == 1 else "(" + ", ".join(["%s"] * n) + ")"
+    cur = conn.cursor()
+    try:
+        for i in range(0, len(keys), chunk):
+            part = keys[i:i + chunk]
+            params = [v for k in part for v in k]
+            cur.execute(f"SELECT {', '.join(qi(c) for c in cols)} FROM {qi(table)} "
+                        f"WHERE {lhs} IN ({', '.join([one] * len(part))})", params)
+            for r in cur.fetchall():
+                r = tuple(r.values()) if isinstance(r, dict) else tuple(r)
+                out[r[:n]] = r[n] if version else None
+    finally:
+        cur.close()
+    return out
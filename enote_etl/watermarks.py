@@ -0,0 +1,54 @@
+# enote_etl/watermarks.py
+from __future__ import annotations
+
+import datetime as dt
+
+from enote_etl.db import qi
+
+TABLE = "etl_watermarks"
+
+
+def _one(cur):
+    r = cur.fetchone()
+    if r is None:
+        return None
+    return next(iter(r.values())) if isinstance(r, dict) else r[0]
+
+
+def ensure_watermarks(conn) -> None:
+    cur = conn.cursor()
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {qi(TABLE)} (
+          `job` VARCHAR(100) NOT NULL,
+          `source` VARCHAR(100) NOT NULL,
+          `mark` DATETIME NULL,
+          `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          PRIMARY KEY (`job`, `source`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    cur.close()
+
+
+def get_watermark(conn, job: str, source: str) -> dt.datetime | None:
+    """Останній оброблений updated_at джерела для job; None — ще не запускався (повний прохід)."""
+    cur = conn.cursor()
+    cur.execute(f"SELECT `mark` FROM {qi(TABLE)} WHERE `job` = %s AND `source` = %s", (job, source))
+    mark = _one(cur)
+    cur.close()
+    return mark
+
+
+def set_watermark(conn, job: str, source: str, mark: dt.datetime | None) -> None:
+    """Без commit: пишемо в тій самій транзакції, що й дані, — або обидва, або нічого."""
+    cur = conn.cursor()
+    cur.execute(f"INSERT INTO {qi(TABLE)} (`job`, `source`, `mark`) VALUES (%s, %s, %s) "
+                f"ON DUPLICATE KEY UPDATE `mark` = VALUES(`mark`)", (job, source, mark))
+    cur.close()
+
+
+def source_mark(conn, table: str, column: str = "updated_at") -> dt.datetime | None:
+    cur = conn.cursor()
+    cur.execute(f"SELECT MAX({qi(column)}) FROM {qi(table)}")
+    mark = _one(cur)
+    cur.close()
+    return mark
@@ -0,0 +1,200 @@
+# enote_etl/windows.py
+from __future__ import annotations
+
+import os
+import heapq
+import time
+import threading
+import datetime as dt
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Iterator, Sequence
+
+from enote_odata import EnoteClient, Query, keyset_after
+
+from enote_etl.db import log
+
+
+def _env_num(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+class RateLimiter:
+    """Не частіше ніж rps запитів/сек на процес (рівномірно, без сплесків); rps <= 0 — без обмеження."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+# Спільні на процес: скільки запитів до 1С одночасно і як часто, незалежно від кількості fetcher'ів
+ENOTE_MAX_CONCURRENCY = max(1, int(_env_num("ENOTE_MAX_CONCURRENCY", 4)))
+_SLOTS = threading.BoundedSemaphore(ENOTE_MAX_CONCURRENCY)
+_LIMITER = RateLimiter(_env_num("ENOTE_RPS", 4))
+
+
+@dataclass(order=True)
+class _Piece:
+    """
+    Шматок діапазону [start, end) по time_field; after — продовжити після цього ключа в межах start.
+    end = None — останній шматок без верхньої межі (дати «з майбутнього» теж потрапляють).
+    """
+    sort_key: tuple
+    start: dt.datetime = field(compare=False)
+    end: dt.datetime | None = field(compare=False)
+    after: tuple | None = field(default=None, compare=False)
+
+
+def _piece(start: dt.datetime, end: dt.datetime | None, after: tuple | None = None) -> _Piece:
+    return _Piece((start, after or ()), start, end, after)
+
+
+def _parse(v) -> dt.datetime:
+    return v if isinstance(v, dt.datetime) else dt.datetime.fromisoformat(str(v)[:19])
+
+
+class WindowedFetcher:
+    """
+    Паралельне завантаження часового ряду (документи/регістри) вікнами по даті.
+
+      - вікна стартують з window_days; далі розмір підлаштовується під щільність:
+        рідкі ділянки — ширші вікна (менше запитів), щільні — вужчі;
+      - вікно, що перевищило split_rows, зупиняється на межі сторінки,
+        а залишок ділиться навпіл і йде в роботу як два нових вікна;
+      - не більше workers вікон одночасно, а всі запити процесу — під спільним
+        ENOTE_MAX_CONCURRENCY і ENOTE_RPS, щоб бекфіл не поклав Єнот;
+      - сторінки віддаються споживачу впорядковано за (time_field, keys),
+        у пам'яті — не більше ~workers × split_rows рядків.
+
+    end=None — діапазон відкритий: вікна плануються до «зараз», а останнє йде без `lt`,
+    тож документи й записи регістрів, датовані майбутнім, не випадають (rewrite_range
+    видаляє все, чого немає у вибірці, від start і вище).
+    """
+
+    def __init__(self, client: EnoteClient, query: Query, time_field: str, keys: Sequence[str],
+                 start: dt.datetime, end: dt.datetime | None = None, page_size: int = 1000,
+                 workers: int = 4, window_days: float = 7, split_rows: int | None = None):
+        self.client = client
+        self.query = query
+        self.time_field = time_field
+        self.keys = (time_field, *keys)
+        self.start = start
+        self.end = end
+        # межа планування: до неї ріжемо на вікна; без end останнє вікно далі відкрите
+        self.horizon = end or dt.datetime.now().replace(microsecond=0) + dt.timedelta(seconds=1)
+        self.page_size = page_size
+        self.workers = max(1, workers)
+        self.window = dt.timedelta(days=window_days)
+        self.split_rows = split_rows or int(_env_num("ETL_SPLIT_ROWS", 20 * page_size))
+        self.min_window = dt.timedelta(hours=1)
+        self.max_window = dt.timedelta(days=max(window_days * 8, 31))
+
+    # ───────────── одне вікно ─────────────
+
+    def _get(self, q: Query) -> list[dict]:
+        with _SLOTS:
+            _LIMITER.wait()
+            return (self.client.get(q) or {}).get("value", []) or []
+
+    def _fetch(self, p: _Piece) -> tuple[list[dict], _Piece | None]:
+        """Рядки шматка (до split_rows) + залишок, якщо шматок виявився задовгим."""
+        base = self.query.filter(f"{self.time_field} ge datetime'{p.start:%Y-%m-%dT%H:%M:%S}'")
+        if p.end is not None:
+            base = base.filter(f"{self.time_field} lt datetime'{p.end:%Y-%m-%dT%H:%M:%S}'")
+        rows: list[dict] = []
+        last = p.after
+        while True:
+            q = base.orderby(*self.keys).top(self.page_size)
+            if last:
+                q = q.filter(keyset_after(self.keys, last))
+            batch = self._get(q)
+            rows.extend(batch)
+            if len(batch) < self.page_size:
+                return rows, None
+            last = tuple(batch[-1].get(k) for k in self.keys)
+            if len(rows) >= self.split_rows:
+                return rows, _piece(_parse(last[0]), p.end, last)
+
+    # ───────────── планування ─────────────
+
+    def _next_window(self, cursor: dt.datetime | None, density: float | None) -> _Piece | None:
+        if cursor is None or cursor >= self.horizon:
+            return None
+        size = self.window
+        if density:
+            # ціль — ~половина split_rows на вікно
+            days = (self.split_rows / 2) / density
+            size = min(max(dt.timedelta(days=days), self.min_window), self.max_window)
+        if cursor + size >= self.horizon:
+            return _piece(cursor, self.end)   # останнє: до end або без верхньої межі
+        return _piece(cursor, cursor + size)
+
+    def __iter__(self) -> Iterator[list[dict]]:
+        cursor, density = self.start, None
+        pending: dict = {}
+        done_heap: list[tuple[_Piece, list[dict]]] = []
+        stats = {"windows": 0, "splits": 0, "rows": 0}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            def submit(p: _Piece) -> None:
+                pending[pool.submit(self._fetch, p)] = p
+                stats["windows"] += 1
+
+            def fill() -> None:
+                nonlocal cursor
+                while len(pending) < self.workers:
+                    p = self._next_window(cursor, density)
+                    if p is None:
+                        return
+                    cursor = p.end
+                    submit(p)
+
+            fill()
+            try:
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        p = pending.pop(fut)
+                        rows, rest = fut.result()
+                        if rest is not None:
+                            # задовге вікно: залишок навпіл, обидві половини — в роботу
+                            upper = rest.end or max(self.horizon, rest.start)
+                            mid = rest.start + (upper - rest.start) / 2
+                            if mid - rest.start >= self.min_window:
+                                submit(_piece(rest.start, mid, rest.after))
+                                submit(_piece(mid, rest.end))
+                            else:
+                                submit(rest)
+                            stats["splits"] += 1
+                        else:
+                            span = ((p.end or self.horizon) - p.start).total_seconds() / 86400
+                            if span > 0 and p.after is None:
+                                d = max(len(rows), 1) / span
+                                density = d if density is None else (density + d) / 2
+                        heapq.heappush(done_heap, (p, rows))
+                    # впорядкована передача: віддаємо готові шматки, перед якими немає незавершених
+                    floor = min((q.sort_key for q in pending.values()), default=None)
+                    while done_heap and (floor is None or done_heap[0][0].sort_key < floor):
+                        _, rows = heapq.heappop(done_heap)
+                        stats["rows"] += len(rows)
+                        for i in range(0, len(rows), self.page_size):
+                            yield rows[i:i + self.page_size]
+                    fill()
+            finally:
+                for f in pending:
+                    f.cancel()
+        log(f"Windows: {stats['windows']} (splits={stats['splits']}), rows={stats['rows']}, workers={self.workers}")
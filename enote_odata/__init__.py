@@ -0,0 +1,12 @@
+# enote_odata — спільний клієнт OData Єнота (BankToEnote, PWParents, vetassist-bot, E-Note ETL)
+from enote_odata.cache import PageCache, content_hash
+from enote_odata.client import AsyncEnoteClient, EnoteClient, EnoteConfig, EnoteError
+from enote_odata.metrics import ODataMetrics
+from enote_odata.query import Guid, Query, and_, eq, guid_in, key_literal, keyset_after, literal
+
+__all__ = [
+    "AsyncEnoteClient", "EnoteClient", "EnoteConfig", "EnoteError",
+    "ODataMetrics",
+    "PageCache", "content_hash",
+    "Guid", "Query", "and_", "eq", "guid_in", "key_literal", "keyset_after", "literal",
+]
@@ -0,0 +1,128 @@
+# enote_odata/bench_pagination.py
+"""
+Бенчмарк: латентність сторінки при $top/$skip проти keyset (`Ref_Key gt guid'..'`)
+на синтетичній локальній заглушці OData.
+
+Заглушка моделює сервер 1С: для $skip він будує впорядковану вибірку до skip+top
+і відкидає перші skip рядків (ціна росте з глибиною), для keyset — позиціонується
+за ключем (індекс) і читає лише top рядків.
+
+    python -m enote_odata.bench_pagination --rows 200000 --page 1000
+    python -m enote_odata.bench_pagination --mode document
+"""
+from __future__ import annotations
+
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import statistics
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from enote_odata.client import EnoteClient, EnoteConfig
+from enote_odata.query import Query
+
+_GUID = re.compile(r"guid'([0-9a-fA-F-]{36})'")
+_DT = re.compile(r"datetime'([0-9T:-]{19})'")
+
+
+def _dataset(n: int) -> dict[str, tuple[list[dict], list[tuple]]]:
+    rnd = random.Random(42)
+    t0 = datetime(2024, 7, 1)
+    rows = [{
+        "Ref_Key": str(uuid.UUID(int=rnd.getrandbits(128))),
+        "DataVersion": f"AAAA{i:08d}",
+        "Date": (t0 + timedelta(seconds=rnd.randrange(0, 400 * 86400))).strftime("%Y-%m-%dT%H:%M:%S"),
+        "Description": f"Синтетичний рядок {i}",
+        "Сумма": round(rnd.uniform(10, 5000), 2),
+    } for i in range(n)]
+    catalog = sorted(rows, key=lambda r: r["Ref_Key"])
+    document = sorted(rows, key=lambda r: (r["Date"], r["Ref_Key"]))
+    return {
+        "Catalog_Bench": (catalog, [(r["Ref_Key"],) for r in catalog]),
+        "Document_Bench": (document, [(r["Date"], r["Ref_Key"]) for r in document]),
+    }
+
+
+def _handler(data):
+    class H(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def do_GET(self):
+            u = urlsplit(self.path)
+            entity = unquote(u.path.rsplit("/", 1)[-1])
+            rows, keys = data[entity]
+            qs = {k: v[0] for k, v in parse_qs(u.query).items()}
+            top, skip = int(qs.get("$top", 1000)), int(qs.get("$skip", 0))
+            flt = qs.get("$filter", "")
+            if flt:
+                after = tuple(_DT.findall(flt)[:1] + _GUID.findall(flt)[:1])
+                start = bisect_right(keys, after)
+                page = rows[start:start + top]
+            else:
+                page = [dict(r) for r in islice(rows, skip + top)][skip:]
+            body = json.dumps({"value": page}, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return H
+
+
+def _timed_pages(pages) -> tuple[list[float], int, set]:
+    lat, total, seen = [], 0, set()
+    while True:
+        t = time.perf_counter()
+        try:
+            page = next(pages)
+        except StopIteration:
+            return lat, total, seen
+        lat.append(time.perf_counter() - t)
+        total += len(page)
+        seen.update(r["Ref_Key"] for r in page)
+
+
+def _report(name: str, lat: list[float], total: int, seen: set) -> None:
+    k = max(1, len(lat) // 10)
+    print(f"{name:<8} pages={len(lat):>4} rows={total:>7} unique={len(seen):>7} | "
+          f"total={sum(lat):6.2f}s  p50={statistics.median(lat) * 1000:6.1f}ms  "
+          f"first10%={statistics.mean(lat[:k]) * 1000:6.1f}ms  last10%={statistics.mean(lat[-k:]) * 1000:6.1f}ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--page", type=int, default=1000)
+    ap.add_argument("--mode", choices=("catalog", "document", "both"), default="both")
+    args = ap.parse_args()
+
+    data = _dataset(args.rows)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _handler(data))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    cfg = EnoteConfig(base_url=f"http://127.0.0.1:{srv.server_port}/odata/", user="", password="")
+
+    modes = {"catalog": ("Catalog_Bench", ("Ref_Key",)), "document": ("Document_Bench", ("Date", "Ref_Key"))}
+    try:
+        with EnoteClient(cfg) as client:
+            for mode in (("catalog", "document") if args.mode == "both" else (args.mode,)):
+                entity, keys = modes[mode]
+                q = Query(entity).orderby(*keys)
+                print(f"── {mode}: {entity}, rows={args.rows}, page={args.page}, keys={keys}")
+                _report("$skip", *_timed_pages(client.iter_pages(q, args.page)))
+                _report("keyset", *_timed_pages(client.iter_keyset(Query(entity), keys, args.page)))
+    finally:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# enote_odata/cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from enote_odata.query import Query
+
+
+def content_hash(data: Any) -> str:
+    """Стабільний sha256 від JSON-вмісту (ключі відсортовані — порядок dict не впливає)."""
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """
+    Дисковий кеш відповідей OData: файл на (сутність + запит), поруч — хеш вмісту.
+    1С не віддає ETag/Last-Modified, тож «умовний запит» — порівняння хешу свіжої
+    легкої відповіді (probe: Ref_Key + DataVersion) з попередньою.
+
+    ENOTE_CACHE_DIR — каталог (за замовчуванням ~/.cache/enote_odata).
+    """
+
+    def __init__(self, root: str | Path | None = None):
+        self.root = Path(root or os.getenv("ENOTE_CACHE_DIR") or Path.home() / ".cache" / "enote_odata")
+
+    def _file(self, query: Query | str) -> Path:
+        key = query.path() if isinstance(query, Query) else str(query)
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        entity = query.entity if isinstance(query, Query) else "raw"
+        return self.root / entity / f"{name}.json"
+
+    def load(self, query: Query | str) -> dict | None:
+        """{"hash", "saved_at", "data"} або None (немає / битий файл)."""
+        try:
+            with open(self._file(query), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) and "hash" in entry else None
+
+    def store(self, query: Query | str, data: Any, digest: str | None = None) -> str:
+        """Атомарний запис (tmp + replace): перерваний прогін не лишає напівфайлу."""
+        digest = digest or content_hash(data)
+        path = self._file(query)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"hash": digest, "saved_at": time.time(), "data": data}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return digest
+
+    def drop(self, query: Query | str) -> None:
+        try:
+            self._file(query).unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,312 @@
+# enote_odata/client.py
+from __future__ import annotations
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Sequence
+
+import httpx
+
+from enote_odata.metrics import ODataMetrics, endpoint_of
+from enote_odata.query import Query, keyset_after
+from enote_odata.retry import RETRY_STATUSES, backoff_delay, retry_after
+
+log = logging.getLogger("enote_odata")
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+OnResponse = Callable[[str, float, Optional[int]], None]
+
+
+class EnoteError(Exception):
+    def __init__(self, message: str, status: int | None = None, body: str = ""):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+@dataclass(frozen=True)
+class EnoteConfig:
+    base_url: str
+    user: str
+    password: str
+    timeout: float = 60.0
+    max_retries: int = 4
+    backoff_base: float = 0.5
+    backoff_cap: float = 20.0
+    pool_size: int = 8
+
+    @classmethod
+    def from_env(cls, **overrides) -> "EnoteConfig":
+        """ODATA_URL / ODATA_URL_COPY (за ENOTE_ENV), ODATA_USER, ODATA_PASSWORD, ENOTE_HTTP_*."""
+        env = (os.getenv("ENOTE_ENV", "prod") or "prod").strip().lower()
+        base = os.getenv("ODATA_URL_COPY") if env == "copy" else os.getenv("ODATA_URL")
+        cfg = dict(
+            base_url=base or "",
+            user=os.getenv("ODATA_USER", ""),
+            password=os.getenv("ODATA_PASSWORD", ""),
+            timeout=float(os.getenv("ENOTE_HTTP_TIMEOUT", "60")),
+            max_retries=int(os.getenv("ENOTE_HTTP_RETRIES", "4")),
+            pool_size=int(os.getenv("ENOTE_HTTP_POOL", "8")),
+        )
+        cfg.update(overrides)
+        if not cfg["base_url"]:
+            raise EnoteError("ODATA base URL is not configured")
+        return cls(**cfg)
+
+
+def _next_link(data: dict) -> str | None:
+    return data.get("odata.nextLink") or data.get("@odata.nextLink") or (data.get("d") or {}).get("__next")
+
+
+class _Base:
+    def __init__(self, config: EnoteConfig, on_response: OnResponse | None = None,
+                 metrics: ODataMetrics | None = None):
+        self.config = config
+        self.base = config.base_url.rstrip("/") + "/"
+        self.metrics = metrics or ODataMetrics()
+        self.on_response = on_response
+
+    def _client_kwargs(self) -> dict:
+        c = self.config
+        return dict(
+            auth=(c.user, c.password),
+            headers={"Accept": "application/json", "Accept-Encoding": "gzip"},
+            timeout=c.timeout,
+            limits=httpx.Limits(max_connections=c.pool_size, max_keepalive_connections=c.pool_size),
+        )
+
+    def _url(self, path: str | Query) -> str:
+        p = str(path)
+        return p if p.startswith(("http://", "https://")) else self.base + p.lstrip("/")
+
+    def _observe(self, endpoint: str, t0: float, status: int | None, attempt: int) -> None:
+        dt = time.monotonic() - t0
+        self.metrics.observe(endpoint, dt, status, retried=attempt > 0)
+        if self.on_response:
+            try:
+                self.on_response(endpoint, dt, status)
+            except Exception:
+                log.debug("on_response hook failed", exc_info=True)
+
+    def _retry_wait(self, method: str, attempt: int, status: int | None,
+                    headers: httpx.Headers | None) -> float | None:
+        """Секунди до наступної спроби або None (не повторюємо)."""
+        if attempt >= self.config.max_retries:
+            return None
+        if status is None:
+            # мережевий збій: для POST/PATCH не знаємо, чи сервер його обробив
+            if method not in SAFE_METHODS:
+                return None
+        elif status not in RETRY_STATUSES:
+            return None
+        elif method not in SAFE_METHODS and status != 429:
+            return None
+        ra = retry_after(headers.get("Retry-After")) if headers is not None else None
+        return ra if ra is not None else backoff_delay(attempt, self.config.backoff_base, self.config.backoff_cap)
+
+    @staticmethod
+    def _keyset_query(query: Query, keys: Sequence[str], last: tuple | None, page_size: int) -> Query:
+        q = replace(query, _orderby=tuple(keys), _skip=None).top(page_size)
+        return q.filter(keyset_after(keys, last)) if last else q
+
+    @staticmethod
+    def _last_key(batch: list[dict], keys: Sequence[str]) -> tuple:
+        last = tuple(batch[-1].get(k) for k in keys)
+        if None in last:
+            raise EnoteError(f"keyset: fields {tuple(keys)} must be present in every row ($select)")
+        return last
+
+    @staticmethod
+    def _check(r: httpx.Response) -> httpx.Response:
+        if r.status_code >= 400:
+            raise EnoteError(f"ODATA HTTP {r.status_code}: {r.text[:500]}", r.status_code, r.text)
+        return r
+
+    @staticmethod
+    def _json(r: httpx.Response) -> Any:
+        if not r.content:
+            return None
+        try:
+            return r.json()
+        except ValueError:
+            return None
+
+
+class EnoteClient(_Base):
+    """
+    Синхронний клієнт OData Єнота: keep-alive пул, gzip, повтори з jitter на 429/5xx,
+    пагінація keyset, $top/$skip і за nextLink. Потокобезпечний (httpx.Client).
+        with EnoteClient(EnoteConfig.from_env()) as en:
+            for row in en.iter_rows(Query("Catalog_Карточки").select("Ref_Key")):
+                ...
+    """
+
+    def __init__(self, config: EnoteConfig, **kw):
+        super().__init__(config, **kw)
+        self.http = httpx.Client(**self._client_kwargs())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self.http.close()
+
+    def request(self, method: str, path: str | Query, *, check: bool = True, **kw) -> httpx.Response:
+        method = method.upper()
+        url, ep = self._url(path), endpoint_of(str(path).replace(self.base, ""))
+        attempt = 0
+        while True:
+            t0 = time.monotonic()
+            try:
+                r = self.http.request(method, url, **kw)
+            except httpx.TransportError as e:
+                self._observe(ep, t0, None, attempt)
+                wait = self._retry_wait(method, attempt, None, None)
+                if wait is None:
+                    raise EnoteError(f"ODATA {type(e).__name__}: {e}") from e
+            else:
+                self._observe(ep, t0, r.status_code, attempt)
+                wait = self._retry_wait(method, attempt, r.status_code, r.headers)
+                if wait is None:
+                    return self._check(r) if check else r
+            log.warning("ODATA %s %s: retry %s in %.1fs", method, ep, attempt + 1, wait)
+            time.sleep(wait)
+            attempt += 1
+
+    def get(self, path: str | Query, **kw) -> Any:
+        return self._json(self.request("GET", path, **kw))
+
+    def post(self, path: str | Query, json: Any = None, **kw) -> Any:
+        return self._json(self.request("POST", path, json=json, **kw))
+
+    def patch(self, path: str | Query, json: Any = None, **kw) -> Any:
+        return self._json(self.request("PATCH", path, json=json, **kw))
+
+    def iter_pages(self, query: Query, page_size: int = 1000) -> Iterator[list[dict]]:
+        """$top/$skip — для сутностей, де сервер не віддає nextLink."""
+        skip = 0
+        while True:
+            batch = (self.get(query.top(page_size).skip(skip)) or {}).get("value", []) or []
+            if batch:
+                yield batch
+            if len(batch) < page_size:
+                return
+            skip += page_size
+
+    def iter_keyset(self, query: Query, keys: Sequence[str] = ("Ref_Key",), page_size: int = 1000,
+                    after: Sequence | None = None) -> Iterator[list[dict]]:
+        """
+        Keyset-пагінація: $orderby=keys і фільтр «після останнього ключа сторінки» замість $skip.
+        Кожна сторінка коштує серверу однаково, а зміни даних під час проходу не зсувають вікно.
+          каталоги:         keys=("Ref_Key",)
+          документи:        keys=("Date", "Ref_Key")
+          регістри:         keys=("Period", "Recorder", "LineNumber")
+        after — останній оброблений ключ, щоб продовжити перерваний прохід.
+        """
+        last = tuple(after) if after else None
+        while True:
+            batch = (self.get(self._keyset_query(query, keys, last, page_size)) or {}).get("value", []) or []
+            if batch:
+                yield batch
+            if len(batch) < page_size:
+                return
+            last = self._last_key(batch, keys)
+
+    def iter_next_links(self, query: Query | str) -> Iterator[list[dict]]:
+        """Серверна пагінація: йдемо за odata.nextLink, поки він є."""
+        path: str | Query | None = query
+        while path:
+            data = self.get(path) or {}
+            batch = data.get("value", []) or []
+            if batch:
+                yield batch
+            path = _next_link(data)
+
+    def iter_rows(self, query: Query, page_size: int = 1000) -> Iterator[dict]:
+        for page in self.iter_pages(query, page_size):
+            yield from page
+
+
+class AsyncEnoteClient(_Base):
+    """Те саме на httpx.AsyncClient — для aiogram-ботів."""
+
+    def __init__(self, config: EnoteConfig, **kw):
+        super().__init__(config, **kw)
+        self.http = httpx.AsyncClient(**self._client_kwargs())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    async def request(self, method: str, path: str | Query, *, check: bool = True, **kw) -> httpx.Response:
+        method = method.upper()
+        url, ep = self._url(path), endpoint_of(str(path).replace(self.base, ""))
+        attempt = 0
+        while True:
+            t0 = time.monotonic()
+            try:
+                r = await self.http.request(method, url, **kw)
+            except httpx.TransportError as e:
+                self._observe(ep, t0, None, attempt)
+                wait = self._retry_wait(method, attempt, None, None)
+                if wait is None:
+                    raise EnoteError(f"ODATA {type(e).__name__}: {e}") from e
+            else:
+                self._observe(ep, t0, r.status_code, attempt)
+                wait = self._retry_wait(method, attempt, r.status_code, r.headers)
+                if wait is None:
+                    return self._check(r) if check else r
+            log.warning("ODATA %s %s: retry %s in %.1fs", method, ep, attempt + 1, wait)
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    async def get(self, path: str | Query, **kw) -> Any:
+        return self._json(await self.request("GET", path, **kw))
+
+    async def post(self, path: str | Query, json: Any = None, **kw) -> Any:
+        return self._json(await self.request("POST", path, json=json, **kw))
+
+    async def patch(self, path: str | Query, json: Any = None, **kw) -> Any:
+        return self._json(await self.request("PATCH", path, json=json, **kw))
+
+    async def iter_pages(self, query: Query, page_size: int = 1000) -> AsyncIterator[list[dict]]:
+        skip = 0
+        while True:
+            batch = ((await self.get(query.top(page_size).skip(skip))) or {}).get("value", []) or []
+            if batch:
+                yield batch
+            if len(batch) < page_size:
+                return
+            skip += page_size
+
+    async def iter_keyset(self, query: Query, keys: Sequence[str] = ("Ref_Key",), page_size: int = 1000,
+                          after: Sequence | None = None) -> AsyncIterator[list[dict]]:
+        last = tuple(after) if after else None
+        while True:
+            data = await self.get(self._keyset_query(query, keys, last, page_size))
+            batch = (data or {}).get("value", []) or []
+            if batch:
+                yield batch
+            if len(batch) < page_size:
+                return
+            last = self._last_key(batch, keys)
+
+    async def iter_next_links(self, query: Query | str) -> AsyncIterator[list[dict]]:
+        path: str | Query | None = query
+        while path:
+            data = (await self.get(path)) or {}
+            batch = data.get("value", []) or []
+            if batch:
+                yield batch
+            path = _next_link(data)
@@ -0,0 +1,50 @@
+# enote_odata/metrics.py
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+
+
+def endpoint_of(path: str) -> str:
+    """`Catalog_Карточки(guid'..')/Post?$top=1` → `Catalog_Карточки`."""
+    p = path.split("?", 1)[0].lstrip("/")
+    return p.split("(", 1)[0].split("/", 1)[0] or "/"
+
+
+@dataclass
+class EndpointStats:
+    count: int = 0
+    errors: int = 0
+    retries: int = 0
+    seconds_sum: float = 0.0
+    seconds_max: float = 0.0
+
+    @property
+    def avg(self) -> float:
+        return self.seconds_sum / self.count if self.count else 0.0
+
+
+class ODataMetrics:
+    """Латентність і помилки по сутностях (endpoint = ім'я EntitySet)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints: dict[str, EndpointStats] = defaultdict(EndpointStats)
+
+    def observe(self, endpoint: str, seconds: float, status: int | None, retried: bool = False) -> None:
+        with self._lock:
+            st = self.endpoints[endpoint]
+            st.count += 1
+            st.seconds_sum += seconds
+            st.seconds_max = max(st.seconds_max, seconds)
+            if retried:
+                st.retries += 1
+            if status is None or status >= 400:
+                st.errors += 1
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {k: {"count": v.count, "errors": v.errors, "retries": v.retries,
+                        "avg": round(v.avg, 4), "max": round(v.seconds_max, 4)}
+                    for k, v in self.endpoints.items()}
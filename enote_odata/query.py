@@ -0,0 +1,136 @@
+# enote_odata/query.py
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+from urllib.parse import quote
+
+# Що лишаємо як є в path/query OData 1С; решта (включно з кирилицею) — percent-encoding UTF-8
+_SAFE_PATH = "/()',=_"
+_SAFE_VALUE = "()',:_-."
+
+_GUID_RE = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+_ISO_DT_RE = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$")
+
+
+def literal(value: Any) -> str:
+    """Python-значення → літерал OData v3 (формат 1С)."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return f"datetime'{value.strftime('%Y-%m-%dT%H:%M:%S')}'"
+    if isinstance(value, date):
+        return f"datetime'{value.strftime('%Y-%m-%dT00:00:00')}'"
+    if isinstance(value, Guid):
+        return f"guid'{value}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class Guid(str):
+    """Рядок-GUID: literal() дає guid'...'."""
+
+
+def eq(field_name: str, value: Any) -> str:
+    return f"{field_name} eq {literal(value)}"
+
+
+def guid_in(field_name: str, keys: Iterable[str]) -> str:
+    """`Ref_Key eq guid'a' or Ref_Key eq guid'b' ...` — 1С не підтримує `in`."""
+    parts = [f"{field_name} eq guid'{k}'" for k in keys]
+    return " or ".join(parts) if parts else "false"
+
+
+def key_literal(value: Any) -> str:
+    """Як literal(), але рядки з JSON-відповіді розпізнає: GUID → guid'..', ISO-дата → datetime'..'."""
+    if isinstance(value, str) and not isinstance(value, Guid):
+        if _GUID_RE.match(value):
+            return f"guid'{value}'"
+        if _ISO_DT_RE.match(value):
+            return f"datetime'{value}'"
+    return literal(value)
+
+
+def keyset_after(keys: Sequence[str], values: Sequence[Any]) -> str:
+    """
+    Умова «строго після (v1, v2, ...)» у порядку $orderby=k1,k2,...:
+        (k1 gt v1) or (k1 eq v1 and k2 gt v2) or ...
+    """
+    terms = []
+    for i, k in enumerate(keys):
+        parts = [f"{keys[j]} eq {key_literal(values[j])}" for j in range(i)]
+        parts.append(f"{k} gt {key_literal(values[i])}")
+        terms.append(" and ".join(parts))
+    return " or ".join(f"({t})" if " and " in t else t for t in terms)
+
+
+def and_(*conds: str) -> str:
+    conds = tuple(c for c in conds if c)
+    return " and ".join(f"({c})" if " or " in c else c for c in conds)
+
+
+@dataclass(frozen=True)
+class Query:
+    """
+    Незмінний будівник запиту до сутності OData:
+        Query("Catalog_Карточки").select("Ref_Key", "Description").filter(eq("НомерДоговора", 885)).top(10)
+    str(query) / query.path() — готовий path+query з коректно закодованою кирилицею.
+    """
+    entity: str
+    _select: tuple[str, ...] = ()
+    _filter: tuple[str, ...] = ()
+    _orderby: tuple[str, ...] = ()
+    _expand: tuple[str, ...] = ()
+    _top: int | None = None
+    _skip: int | None = None
+    _extra: tuple[tuple[str, str], ...] = field(default=())
+
+    def select(self, *fields: str) -> "Query":
+        return replace(self, _select=self._select + fields)
+
+    def filter(self, *conds: str) -> "Query":
+        return replace(self, _filter=self._filter + tuple(c for c in conds if c))
+
+    def orderby(self, *fields: str) -> "Query":
+        return replace(self, _orderby=self._orderby + fields)
+
+    def expand(self, *fields: str) -> "Query":
+        return replace(self, _expand=self._expand + fields)
+
+    def top(self, n: int | None) -> "Query":
+        return replace(self, _top=n)
+
+    def skip(self, n: int | None) -> "Query":
+        return replace(self, _skip=n)
+
+    def param(self, key: str, value: str) -> "Query":
+        return replace(self, _extra=self._extra + ((key, value),))
+
+    def params(self) -> list[tuple[str, str]]:
+        out: list[tuple[str, str]] = [("$format", "json")]
+        if self._select:
+            out.append(("$select", ",".join(self._select)))
+        if self._filter:
+            out.append(("$filter", and_(*self._filter)))
+        if self._orderby:
+            out.append(("$orderby", ",".join(self._orderby)))
+        if self._expand:
+            out.append(("$expand", ",".join(self._expand)))
+        if self._top is not None:
+            out.append(("$top", str(int(self._top))))
+        if self._skip:
+            out.append(("$skip", str(int(self._skip))))
+        out.extend(self._extra)
+        return out
+
+    def path(self) -> str:
+        qs = "&".join(f"{k}={quote(v, safe=_SAFE_VALUE)}" for k, v in self.params())
+        return f"{quote(self.entity, safe=_SAFE_PATH)}?{qs}"
+
+    __str__ = path
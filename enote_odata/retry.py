@@ -0,0 +1,28 @@
+# enote_odata/retry.py
+from __future__ import annotations
+
+import random
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full jitter: random(0, min(cap, base * 2^attempt)). attempt рахується з 0."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after(header: str | None) -> float | None:
+    """Retry-After у секундах або HTTP-даті → секунди; None, якщо заголовка немає/він кривий."""
+    if not header:
+        return None
+    try:
+        return max(float(header), 0.0)
+    except ValueError:
+        pass
+    try:
+        dt = parsedate_to_datetime(header)
+        return max((dt - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except Exception:
+        return None
@@ -0,0 +1,8 @@
+# tests/conftest.py
+# enote_etl / enote_odata — пакети в корені репозиторію; тести запускаються без pip install
+import sys
+from pathlib import Path
+
+_ROOT = str(Path(__file__).resolve().parents[1])
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
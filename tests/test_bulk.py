@@ -0,0 +1,76 @@
+# tests/test_bulk.py
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+
+from enote_etl.bulk import BulkLoader, tsv_value
+
+_UNESCAPE = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r", "0": "\0"}
+
+
+def load_data_field(s: str):
+    """Як MySQL читає поле з FIELDS ESCAPED BY '\\': \\N — NULL, \\x — службовий символ."""
+    if s == "\\N":
+        return None
+    out, i = [], 0
+    while i < len(s):
+        if s[i] == "\\":
+            out.append(_UNESCAPE[s[i + 1]])
+            i += 2
+        else:
+            out.append(s[i])
+            i += 1
+    return "".join(out)
+
+
+@pytest.mark.parametrize("v, want", [
+    (None, "\\N"),
+    (True, "1"),
+    (False, "0"),
+    (0, "0"),
+    (42, "42"),
+    (Decimal("12.50"), "12.50"),
+    (1.5, "1.5"),
+    (dt.datetime(2024, 7, 1, 10, 20, 30), "2024-07-01 10:20:30"),
+    (dt.date(2024, 7, 1), "2024-07-01"),
+    ("0001-01-01 00:00:00", "0001-01-01 00:00:00"),
+    ("", ""),
+    ("Кирилиця ї є", "Кирилиця ї є"),
+])
+def test_scalars(v, want):
+    assert tsv_value(v) == want
+
+
+@pytest.mark.parametrize("s", ["a\tb", "line1\nline2\r\n", "C:\\temp\\new", "nul\0byte", "\\N", "\\", "кінець\\"])
+def test_string_escaping_round_trips(s):
+    field = tsv_value(s)
+    assert "\t" not in field and "\n" not in field and "\r" not in field
+    assert load_data_field(field) == s
+
+
+def test_literal_backslash_n_is_not_null():
+    # рядок "\N" — не NULL після LOAD DATA
+    assert tsv_value("\\N") != tsv_value(None)
+    assert load_data_field(tsv_value("\\N")) == "\\N"
+
+
+def test_other_types_are_escaped():
+    class Odd:
+        def __str__(self):
+            return "x\ty"
+    assert tsv_value(Odd()) == "x\\ty"
+
+
+def test_loader_file_layout(tmp_path, monkeypatch):
+    monkeypatch.setenv("ETL_BULK_DIR", str(tmp_path))
+    loader = BulkLoader(conn=None, table="stage", columns=("a", "b", "c"), chunk_rows=100)
+    loader.add([("x\ty", None, 1), ("multi\nline", dt.date(2024, 1, 2), True)])
+    loader._file.flush()
+    with open(loader._file.name, encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    assert lines[-1] == ""
+    assert [[load_data_field(v) for v in line.split("\t")] for line in lines[:-1]] == [
+        ["x\ty", None, "1"], ["multi\nline", "2024-01-02", "1"]]
+    loader.discard()
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,31 @@
+# tests/test_db.py
+from enote_etl.db import odku_if_changed, qi
+
+
+def _sets(sql: str) -> list[str]:
+    return [s.strip() for s in sql.split(",\n")]
+
+
+def test_updated_at_first_then_values():
+    sets = _sets(odku_if_changed("t", ("a", "б")))
+    assert sets == [
+        "`t`.`updated_at` = IF(NOT (`t`.`a` <=> VALUES(`a`)) OR NOT (`t`.`б` <=> VALUES(`б`)), "
+        "NOW(), `t`.`updated_at`)",
+        "`t`.`a` = VALUES(`a`)",
+        "`t`.`б` = VALUES(`б`)",
+    ]
+
+
+def test_version_gates_columns_and_goes_last():
+    sets = _sets(odku_if_changed("t", ("DataVersion", "Sum"), version="DataVersion"))
+    changed = "NOT (`t`.`DataVersion` <=> VALUES(`DataVersion`))"
+    assert sets == [
+        f"`t`.`updated_at` = IF({changed}, NOW(), `t`.`updated_at`)",
+        f"`t`.`Sum` = IF({changed}, VALUES(`Sum`), `t`.`Sum`)",
+        "`t`.`DataVersion` = VALUES(`DataVersion`)",
+    ]
+
+
+def test_names_are_quoted():
+    assert qi("et+_a`b") == "`et+_a``b`"
+    assert odku_if_changed("et+_x", ("c",)).startswith("`et+_x`.`updated_at`")
@@ -0,0 +1,60 @@
+# tests/test_normalize.py
+from decimal import Decimal
+
+import pytest
+
+from enote_etl import bench_normalize as baseline
+from enote_etl.normalize import EMPTY_DATE, compile_row, converter, normalize_value, base_type
+
+# значення, на яких старі шляхи і compile_row могли б розійтись
+EDGE = {
+    "bool": [None, True, False, 0, 1, "", "x"],
+    "datetime": [None, "", "0001-01-01T00:00:00", "2024-07-01T10:20:30", "2024-07-01", 5],
+    "decimal": [None, "", "12.50", "abc", 3, 0.1, 1e20, Decimal("7.25"), True],
+    "int": [None, "", "12", "1.5", 7, 3.9, "x", True],
+    "str": [None, "", "Кирилиця", 12, 1.5, {"a": "б"}, [1, "в"], True],
+}
+TYPES = {"bool": "TINYINT(1)", "datetime": "DATETIME", "decimal": "DECIMAL(18,2)", "int": "INT", "str": "TEXT"}
+
+
+def test_page_matches_engine_baseline():
+    page = baseline._page(3000)
+    assert baseline.compiled(page) == baseline.engine_legacy(page)
+
+
+@pytest.mark.parametrize("kind", EDGE)
+def test_converters_match_baseline_values(kind):
+    conv = converter(TYPES[kind])
+    for v in EDGE[kind]:
+        want = baseline._normalize_value(baseline._base_type(TYPES[kind]), v)
+        got = conv(v)
+        assert got == want and type(got) is type(want), (kind, v, got, want)
+        # еталон у normalize.py теж не розійшовся з історією
+        assert normalize_value(base_type(TYPES[kind]), v) == want
+
+
+@pytest.mark.parametrize("sql_type", ["DATETIME NOT NULL", "datetime not null", "TIMESTAMP NOT NULL"])
+def test_not_null_date_keeps_empty_1c_date(sql_type):
+    conv = converter(sql_type)
+    assert conv("0001-01-01T00:00:00") == EMPTY_DATE
+    assert conv("2024-07-01T10:20:30") == "2024-07-01 10:20:30"
+
+
+def test_nullable_date_still_null():
+    assert converter("DATETIME")("0001-01-01T00:00:00") is None
+
+
+def test_compile_row_order_missing_and_extra_fields():
+    to_row = compile_row({"Ref_Key": "CHAR(36)", "Date": "DATETIME NOT NULL", "Posted": "TINYINT(1)",
+                          "Sum": "DECIMAL(18,2)"})
+    raw = {"Sum": 10.5, "Posted": True, "Date": "0001-01-01T00:00:00", "Зайве": "x"}
+    assert to_row(raw) == (None, EMPTY_DATE, 1, Decimal("10.5"))
+
+
+def test_compile_row_single_column_is_tuple():
+    assert compile_row({"Ref_Key": "CHAR(36)"})({"Ref_Key": "k"}) == ("k",)
+
+
+def test_compile_row_quotes_column_names():
+    to_row = compile_row({"it's": "VARCHAR(10)", 'a"b': "INT"})
+    assert to_row({"it's": "x", 'a"b': "3"}) == ("x", 3)
@@ -0,0 +1,123 @@
+# tests/test_reconcile.py
+import datetime as dt
+
+import pytest
+
+from enote_etl import reconcile as rc
+from enote_etl.spec import EntitySpec
+
+DB_NOW = dt.datetime(2025, 3, 10, 12, 0, 0)
+
+
+class FakeConn:
+    """etl_watermarks у dict, NOW() — годинник «сервера»; цільова таблиця: total рядків, missing зниклих."""
+
+    def __init__(self, marks=None, total=100, missing=0):
+        self.marks = dict(marks or {})
+        self.total, self.missing = total, missing
+        self.commits = 0
+        self.deleted = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.row = None
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        q = " ".join(sql.split())
+        self.row = None
+        if q == "SELECT NOW()":
+            self.row = (DB_NOW,)
+        elif q.startswith("SELECT `mark`"):
+            mark = self.conn.marks.get(params)
+            self.row = (mark,) if mark else None
+        elif q.startswith("INSERT INTO `etl_watermarks`"):
+            self.conn.marks[params[:2]] = params[2]
+        elif q.startswith("SELECT COUNT(*)"):
+            self.row = (self.conn.missing, self.conn.total)
+        elif q.startswith("DELETE t"):
+            self.conn.deleted = True
+            self.rowcount = self.conn.missing
+
+    def executemany(self, sql, rows):
+        pass
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, keys):
+        self.keys = keys
+
+    def iter_keyset(self, query, keys, page):
+        yield [{"Ref_Key": k} for k in self.keys]
+
+
+SPEC = EntitySpec(entity="Catalog_X", table="et_Catalog_X", fields={"Ref_Key": "CHAR(36)", "DataVersion": "VARCHAR(50)"},
+                  reconcile="delete", reconcile_days=7)
+
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.delenv("ETL_RECONCILE", raising=False)
+    monkeypatch.setattr(rc, "log", lambda msg: None)
+
+
+def test_due_when_never_reconciled():
+    assert rc.reconcile_due(FakeConn(), SPEC)
+
+
+@pytest.mark.parametrize("age, due", [(dt.timedelta(days=6, hours=23), False), (dt.timedelta(days=7), True)])
+def test_due_uses_db_clock(age, due, monkeypatch):
+    # локальний годинник на рік попереду — рішення все одно за NOW() сервера
+    class Skewed(dt.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return DB_NOW + dt.timedelta(days=365)
+    monkeypatch.setattr(rc.dt, "datetime", Skewed)
+    conn = FakeConn({(SPEC.table, rc.WATERMARK_SOURCE): DB_NOW - age})
+    assert rc.reconcile_due(conn, SPEC) is due
+
+
+def test_skip_marker_backs_off():
+    conn = FakeConn({(SPEC.table, rc.WATERMARK_SOURCE): DB_NOW - dt.timedelta(days=30),
+                     (SPEC.table, rc.SKIPPED_SOURCE): DB_NOW - dt.timedelta(days=1)})
+    assert not rc.reconcile_due(conn, SPEC)
+
+
+@pytest.mark.parametrize("force, due", [("1", True), ("0", False)])
+def test_env_override(force, due, monkeypatch):
+    monkeypatch.setenv("ETL_RECONCILE", force)
+    conn = FakeConn({(SPEC.table, rc.WATERMARK_SOURCE): DB_NOW})
+    assert rc.reconcile_due(conn, SPEC) is due
+
+
+def test_share_guard_records_skip():
+    conn = FakeConn(total=100, missing=50)
+    assert rc.reconcile(conn, FakeClient(["k"] * 50), SPEC) == 0
+    assert not conn.deleted
+    assert conn.marks == {(SPEC.table, rc.SKIPPED_SOURCE): DB_NOW}
+    assert conn.commits == 1
+    assert not rc.reconcile_due(conn, SPEC)
+
+
+def test_within_share_deletes_and_marks_done():
+    conn = FakeConn(total=100, missing=3)
+    assert rc.reconcile(conn, FakeClient(["k"] * 97), SPEC) == 3
+    assert conn.deleted
+    assert conn.marks == {(SPEC.table, rc.WATERMARK_SOURCE): DB_NOW}
@@ -0,0 +1,122 @@
+# tests/test_windows.py
+import re
+import uuid
+import random
+import threading
+import datetime as dt
+
+import pytest
+
+from enote_odata import Query
+from enote_etl import windows
+from enote_etl.windows import RateLimiter, WindowedFetcher
+
+T0 = dt.datetime(2024, 1, 1)
+
+
+class FakeClient:
+    """Мінімальний OData: ge/lt по Date, keyset після (Date, Ref_Key), $top. Запити — в self.filters."""
+
+    def __init__(self, rows: list[dict]):
+        self.rows = sorted(rows, key=lambda r: (r["Date"], r["Ref_Key"]))
+        self.filters: list[tuple[str, ...]] = []
+        self.lock = threading.Lock()
+
+    def get(self, q: Query) -> dict:
+        with self.lock:
+            self.filters.append(q._filter)
+        flt = " ".join(q._filter)
+        ge = re.search(r"Date ge datetime'([^']+)'", flt).group(1)
+        lt = re.search(r"Date lt datetime'([^']+)'", flt)
+        out = [r for r in self.rows if ge <= r["Date"] and (lt is None or r["Date"] < lt.group(1))]
+        after = re.search(r"\(Date eq datetime'([^']+)' and Ref_Key gt guid'([^']+)'\)", flt)
+        if after:
+            out = [r for r in out if (r["Date"], r["Ref_Key"]) > after.groups()]
+        return {"value": out[:q._top]}
+
+
+def _rows(dates: list[dt.datetime], seed: int = 1) -> list[dict]:
+    rnd = random.Random(seed)
+    return [{"Date": d.strftime("%Y-%m-%dT%H:%M:%S"), "Ref_Key": str(uuid.UUID(int=rnd.getrandbits(128)))}
+            for d in dates]
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(windows, "_LIMITER", RateLimiter(0))
+
+
+@pytest.fixture
+def stats(monkeypatch) -> list[str]:
+    lines: list[str] = []
+    monkeypatch.setattr(windows, "log", lines.append)
+    return lines
+
+
+def fetch(client: FakeClient, end: dt.datetime | None = None, **kw) -> list[list[dict]]:
+    opts = dict(page_size=50, workers=4, window_days=7, split_rows=200)
+    opts.update(kw)
+    return list(WindowedFetcher(client, Query("X"), "Date", ("Ref_Key",), T0, end, **opts))
+
+
+def _splits(stats: list[str]) -> int:
+    return int(re.search(r"splits=(\d+)", stats[-1]).group(1))
+
+
+def test_dense_window_splits_and_merges_in_order(stats):
+    rnd = random.Random(7)
+    # щільний кластер у березні (далеко за split_rows на вікно) + рідкий фон на рік
+    dates = ([T0 + dt.timedelta(days=60, seconds=rnd.randrange(0, 3 * 86400)) for _ in range(1500)]
+             + [T0 + dt.timedelta(seconds=rnd.randrange(0, 300 * 86400)) for _ in range(500)])
+    client = FakeClient(_rows(dates))
+    pages = fetch(client, end=dt.datetime(2025, 1, 1))
+    assert [r for p in pages for r in p] == client.rows
+    assert all(0 < len(p) <= 50 for p in pages)
+    assert _splits(stats) > 0
+
+
+def test_same_timestamp_beyond_split_rows(stats):
+    # вікно не ріжеться за часом нижче min_window — залишок дочитується keyset'ом
+    client = FakeClient(_rows([T0 + dt.timedelta(days=3)] * 700 + [T0 + dt.timedelta(days=10)] * 5))
+    pages = fetch(client, end=T0 + dt.timedelta(days=30))
+    assert [r for p in pages for r in p] == client.rows
+    assert _splits(stats) > 0
+
+
+def test_open_end_keeps_future_rows():
+    now = dt.datetime.now().replace(microsecond=0)
+    client = FakeClient(_rows([T0 + dt.timedelta(days=5), now - dt.timedelta(days=1),
+                               dt.datetime(2099, 1, 1), dt.datetime(2099, 6, 1)]))
+    got = [r for p in fetch(client) for r in p]
+    assert got == client.rows
+    # останнє вікно — без верхньої межі
+    assert any(not any(" lt " in f for f in flt) for flt in client.filters)
+
+
+def test_closed_end_excludes_rows_at_and_after_end():
+    end = T0 + dt.timedelta(days=20)
+    client = FakeClient(_rows([T0, T0 + dt.timedelta(days=19, hours=23), end, end + dt.timedelta(days=1)]))
+    got = [r for p in fetch(client, end=end) for r in p]
+    assert [r["Date"] for r in got] == [r["Date"] for r in client.rows[:2]]
+    assert all(any(" lt " in f for f in flt) for flt in client.filters)
+
+
+def test_empty_range():
+    client = FakeClient([])
+    assert fetch(client, end=T0 + dt.timedelta(days=30)) == []
+
+
+def test_next_window_adapts_to_density():
+    f = WindowedFetcher(FakeClient([]), Query("X"), "Date", ("Ref_Key",), T0, T0 + dt.timedelta(days=365),
+                        page_size=50, window_days=7, split_rows=200)
+    first = f._next_window(T0, None)
+    assert (first.start, first.end) == (T0, T0 + dt.timedelta(days=7))
+    # 100 рядків/день → ~split_rows/2 на вікно = 1 день
+    assert f._next_window(T0, 100).end == T0 + dt.timedelta(days=1)
+    # дуже щільно — не вужче за min_window, дуже рідко — не ширше за max_window
+    assert f._next_window(T0, 10 ** 9).end == T0 + f.min_window
+    assert f._next_window(T0, 0.001).end == T0 + f.max_window
+    # хвіст діапазону — останнє вікно до end
+    tail = f._next_window(T0 + dt.timedelta(days=362), None)
+    assert tail.end == T0 + dt.timedelta(days=365)
+    assert f._next_window(T0 + dt.timedelta(days=365), None) is None
@@ -76,7 +76,7 @@ async def kontrol_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if len(nums) == 1:
         chosen = nums[0]
         try:
-            info = get_patient_by_number(chosen)
+            info = await get_patient_by_number(chosen)
             print(f"[/kontrol] lookup {chosen} → {info}", file=sys.stderr)
         except Exception:
             print("[/kontrol] ERROR get_patient_by_number:", file=sys.stderr)
@@ -106,7 +106,7 @@ async def kontrol_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["awaiting_pick"] = True
 
     try:
-        name_map: Dict[str, str] = get_patient_names_by_numbers(nums)  # {"1472": "Барні", ...} або ""
+        name_map: Dict[str, str] = await get_patient_names_by_numbers(nums)  # {"1472": "Барні", ...} або ""
         print(f"[/kontrol] name_map: {name_map}", file=sys.stderr)
     except Exception:
         print("[/kontrol] ERROR get_patient_names_by_numbers:", file=sys.stderr)
@@ -188,7 +188,7 @@ async def number_pick_fallback(update: Update, context: ContextTypes.DEFAULT_TYP
 
         # одразу тягнемо GUID/кличку/власника
         try:
-            info = get_patient_by_number(chosen)
+            info = await get_patient_by_number(chosen)
         except Exception:
             traceback.print_exc()
             await update.message.reply_text(f"Обрано {chosen}, але сталася помилка під час звернення до Єнота.")
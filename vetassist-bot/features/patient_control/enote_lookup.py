@@ -1,34 +1,36 @@
 # enote_lookup.py
 # Завдання: отримати з Єнота GUID (Ref_Key) і кличку (Description) за номером карти (НомерДоговора, число)
 
+import asyncio
 from typing import Dict, List, Optional
-import requests
-from requests.auth import HTTPBasicAuth
 from modules.config import settings
+from enote_odata import AsyncEnoteClient, EnoteConfig, Query, eq
 
-def _auth():
-    return HTTPBasicAuth(settings.odata_user, settings.odata_password)
+# async: хендлери бота не блокують event loop на запитах до Єнота
+_client: Optional[AsyncEnoteClient] = None
 
-def _base() -> str:
+def _odata() -> AsyncEnoteClient:
+    global _client
     if not settings.odata_url:
         raise RuntimeError("ODATA_URL не налаштовано в .env")
-    return settings.odata_url.rstrip("/")
+    if _client is None:
+        _client = AsyncEnoteClient(EnoteConfig(
+            base_url=settings.odata_url, user=settings.odata_user, password=settings.odata_password,
+            timeout=20, max_retries=2,
+        ))
+    return _client
 
-def get_patient_by_number(number_str: str) -> Optional[dict]:
+async def get_patient_by_number(number_str: str) -> Optional[dict]:
     """
     Вхід: "885" (рядок, але фільтр як ЧИСЛО)
     Вихід: {"ref_key": "...", "name": "Кличка", "owner": "Власник", "raw": {...}} або None
     """
     # фільтр БЕЗ лапок, бо поле числове
-    url = (
-        f"{_base()}/{settings.patient_entity}"
-        f"?$format=json&$top=10"
-        f"&$filter=НомерДоговора eq {int(number_str)}"
-        f"&$select=Ref_Key,Description,Code"
-    )
-    r = requests.get(url, auth=_auth(), timeout=20)
-    r.raise_for_status()
-    data = r.json()
+    q = (Query(settings.patient_entity)
+         .filter(eq("НомерДоговора", int(number_str)))
+         .select("Ref_Key", "Description", "Code")
+         .top(10))
+    data = await _odata().get(q) or {}
     items = data.get("value", [])
     if not items:
         return None
@@ -40,16 +42,11 @@ def get_patient_by_number(number_str: str) -> Optional[dict]:
         "raw": item,
     }
 
-def get_patient_names_by_numbers(numbers: List[str]) -> Dict[str, str]:
+async def get_patient_names_by_numbers(numbers: List[str]) -> Dict[str, str]:
     """
-    Пакетно дістає клички за списком номерів.
+    Пакетно дістає клички за списком номерів (запити йдуть паралельно).
     Повертає { "1472": "Барні", ... } (порожній рядок, якщо не знайдено)
     """
-    out: Dict[str, str] = {}
-    for n in numbers:
-        try:
-            info = get_patient_by_number(n)
-            out[n] = info["name"] if info else ""
-        except Exception:
-            out[n] = ""
-    return out
+    infos = await asyncio.gather(*(get_patient_by_number(n) for n in numbers), return_exceptions=True)
+    return {n: (info["name"] if info and not isinstance(info, BaseException) else "")
+            for n, info in zip(numbers, infos)}